@@ -0,0 +1,47 @@
+"""add_ingestion_queue
+
+Revision ID: 0d8b3f6a2c91
+Revises: f2b6c8e0a4d7
+Create Date: 2026-10-17 16:40:12.904113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0d8b3f6a2c91'
+down_revision: Union[str, Sequence[str], None] = 'f2b6c8e0a4d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Gmail notifications acknowledged by the webhook and awaiting a worker
+    op.create_table('ingestion_queue',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('mailbox', sa.String(), nullable=False),
+        sa.Column('history_id', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('enqueued_at', sa.DateTime(), nullable=False),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('claim_token', sa.String(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_ingestion_queue_mailbox_history', 'ingestion_queue', ['mailbox', 'history_id'], unique=True)
+    op.create_index('idx_ingestion_queue_status_available', 'ingestion_queue', ['status', 'available_at'], unique=False)
+    op.create_index('idx_ingestion_queue_claim_token', 'ingestion_queue', ['claim_token'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_ingestion_queue_claim_token', table_name='ingestion_queue')
+    op.drop_index('idx_ingestion_queue_status_available', table_name='ingestion_queue')
+    op.drop_index('uq_ingestion_queue_mailbox_history', table_name='ingestion_queue')
+    op.drop_table('ingestion_queue')
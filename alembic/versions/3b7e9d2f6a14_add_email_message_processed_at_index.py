@@ -0,0 +1,29 @@
+"""add_email_message_processed_at_index
+
+Revision ID: 3b7e9d2f6a14
+Revises: 8a4d6e1c5f27
+Create Date: 2026-10-17 19:41:06.382117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e9d2f6a14'
+down_revision: Union[str, Sequence[str], None] = '8a4d6e1c5f27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination of the email log in time order, for replay trace exports
+    op.create_index('idx_email_message_processed_at', 'email_messages', ['processed_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_email_message_processed_at', table_name='email_messages')
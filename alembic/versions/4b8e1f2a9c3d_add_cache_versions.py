@@ -0,0 +1,33 @@
+"""add_cache_versions
+
+Revision ID: 4b8e1f2a9c3d
+Revises: dcf2b3ef62c5
+Create Date: 2026-10-17 09:12:40.104512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b8e1f2a9c3d'
+down_revision: Union[str, Sequence[str], None] = 'dcf2b3ef62c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Per-table change counters polled by workers to invalidate lookup caches
+    op.create_table('cache_versions',
+        sa.Column('table_name', sa.String(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('table_name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('cache_versions')
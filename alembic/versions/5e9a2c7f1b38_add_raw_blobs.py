@@ -0,0 +1,40 @@
+"""add_raw_blobs
+
+Revision ID: 5e9a2c7f1b38
+Revises: 0d8b3f6a2c91
+Create Date: 2026-10-17 17:52:31.207645
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e9a2c7f1b38'
+down_revision: Union[str, Sequence[str], None] = '0d8b3f6a2c91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Raw MIME objects in the content-addressed blob store, for size/ratio reporting
+    op.create_table('raw_blobs',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('stored_size', sa.Integer(), nullable=False),
+        sa.Column('compression', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.add_column('email_messages', sa.Column('raw_blob_key', sa.String(), nullable=True))
+    op.create_index('idx_email_message_raw_blob_key', 'email_messages', ['raw_blob_key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_email_message_raw_blob_key', table_name='email_messages')
+    op.drop_column('email_messages', 'raw_blob_key')
+    op.drop_table('raw_blobs')
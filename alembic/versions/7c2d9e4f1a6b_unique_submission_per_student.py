@@ -0,0 +1,60 @@
+"""unique_submission_per_student
+
+Revision ID: 7c2d9e4f1a6b
+Revises: 4b8e1f2a9c3d
+Create Date: 2026-10-17 10:03:17.552031
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2d9e4f1a6b'
+down_revision: Union[str, Sequence[str], None] = '4b8e1f2a9c3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SUBMISSION_COLUMNS = "id, assignment_id, student_id, received_at, on_time, status"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Duplicates left by concurrent deliveries are moved to an archive table, keeping
+    # the earliest receipt, so downgrade() can restore them. Grades reference
+    # (assignment_id, student_id), not submission ids, so nothing dangles.
+    op.create_table('submissions_duplicates',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('assignment_id', sa.String(), nullable=False),
+        sa.Column('student_id', sa.String(), nullable=False),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('on_time', sa.Boolean(), nullable=False),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(f"""
+        INSERT INTO submissions_duplicates ({SUBMISSION_COLUMNS})
+        SELECT {SUBMISSION_COLUMNS} FROM submissions WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY assignment_id, student_id ORDER BY received_at, id
+                ) AS rn
+                FROM submissions
+            ) ranked
+            WHERE rn > 1
+        )
+    """)
+    op.execute("DELETE FROM submissions WHERE id IN (SELECT id FROM submissions_duplicates)")
+    op.create_index('uq_submission_assignment_student', 'submissions', ['assignment_id', 'student_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_submission_assignment_student', table_name='submissions')
+    # Restore the archived duplicates
+    op.execute(f"INSERT INTO submissions ({SUBMISSION_COLUMNS}) "
+               f"SELECT {SUBMISSION_COLUMNS} FROM submissions_duplicates")
+    op.drop_table('submissions_duplicates')
@@ -0,0 +1,51 @@
+"""add_outbox
+
+Revision ID: 8a4d6e1c5f27
+Revises: 5e9a2c7f1b38
+Create Date: 2026-10-17 18:34:49.615032
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4d6e1c5f27'
+down_revision: Union[str, Sequence[str], None] = '5e9a2c7f1b38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Outbound replies queued by email handlers and drained by the outbox sender
+    op.create_table('outbox',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('to_email', sa.String(), nullable=False),
+        sa.Column('subject', sa.String(), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('in_reply_to', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('claim_token', sa.String(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('gmail_message_id', sa.String(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_outbox_in_reply_to', 'outbox', ['in_reply_to'], unique=True)
+    op.create_index('idx_outbox_status_available', 'outbox', ['status', 'available_at'], unique=False)
+    op.create_index('idx_outbox_claim_token', 'outbox', ['claim_token'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_outbox_claim_token', table_name='outbox')
+    op.drop_index('idx_outbox_status_available', table_name='outbox')
+    op.drop_index('uq_outbox_in_reply_to', table_name='outbox')
+    op.drop_table('outbox')
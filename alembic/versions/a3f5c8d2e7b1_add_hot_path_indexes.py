@@ -0,0 +1,34 @@
+"""add_hot_path_indexes
+
+Revision ID: a3f5c8d2e7b1
+Revises: 7c2d9e4f1a6b
+Create Date: 2026-10-17 11:26:05.318840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f5c8d2e7b1'
+down_revision: Union[str, Sequence[str], None] = '7c2d9e4f1a6b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Submissions by (assignment_id, student_id) and by assignment_id are served by
+    # uq_submission_assignment_student; email_messages.message_id by its unique constraint.
+    op.create_index('idx_assignment_class_deadline', 'assignments', ['class_id', 'deadline_at'], unique=False)
+    op.create_index('idx_grade_assignment_student', 'grades', ['assignment_id', 'student_id'], unique=False)
+    op.create_index('idx_enrollment_class', 'enrollments', ['class_id', 'active'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_enrollment_class', table_name='enrollments')
+    op.drop_index('idx_grade_assignment_student', table_name='grades')
+    op.drop_index('idx_assignment_class_deadline', table_name='assignments')
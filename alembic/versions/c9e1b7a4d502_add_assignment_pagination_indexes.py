@@ -0,0 +1,34 @@
+"""add_assignment_pagination_indexes
+
+Revision ID: c9e1b7a4d502
+Revises: a3f5c8d2e7b1
+Create Date: 2026-10-17 13:41:52.760213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e1b7a4d502'
+down_revision: Union[str, Sequence[str], None] = 'a3f5c8d2e7b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination of /api/assignments by (deadline_at, id), optionally filtered
+    # by status or term; the class filter uses idx_assignment_class_deadline.
+    op.create_index('idx_assignment_deadline', 'assignments', ['deadline_at', 'id'], unique=False)
+    op.create_index('idx_assignment_status_deadline', 'assignments', ['status', 'deadline_at', 'id'], unique=False)
+    op.create_index('idx_class_term', 'classes', ['term_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_class_term', table_name='classes')
+    op.drop_index('idx_assignment_status_deadline', table_name='assignments')
+    op.drop_index('idx_assignment_deadline', table_name='assignments')
@@ -0,0 +1,34 @@
+"""add_gmail_sync_state
+
+Revision ID: e4a7d1c3b9f6
+Revises: c9e1b7a4d502
+Create Date: 2026-10-17 14:03:51.220817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7d1c3b9f6'
+down_revision: Union[str, Sequence[str], None] = 'c9e1b7a4d502'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Per-mailbox Gmail history checkpoint so ingestion resumes after a restart
+    op.create_table('gmail_sync_state',
+        sa.Column('mailbox', sa.String(), nullable=False),
+        sa.Column('history_id', sa.String(), nullable=False),
+        sa.Column('synced_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('mailbox')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('gmail_sync_state')
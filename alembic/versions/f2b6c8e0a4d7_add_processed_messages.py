@@ -0,0 +1,37 @@
+"""add_processed_messages
+
+Revision ID: f2b6c8e0a4d7
+Revises: e4a7d1c3b9f6
+Create Date: 2026-10-17 15:21:07.538460
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b6c8e0a4d7'
+down_revision: Union[str, Sequence[str], None] = 'e4a7d1c3b9f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Gmail messages already ingested, shared by all instances for idempotency
+    op.create_table('processed_messages',
+        sa.Column('gmail_id', sa.String(), nullable=False),
+        sa.Column('rfc_message_id', sa.String(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('gmail_id'),
+        sa.UniqueConstraint('rfc_message_id')
+    )
+    op.create_index('idx_processed_message_processed_at', 'processed_messages', ['processed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_processed_message_processed_at', table_name='processed_messages')
+    op.drop_table('processed_messages')
@@ -1,19 +1,61 @@
 #!/usr/bin/env python3
 import argparse
+import json
+import os
 import sys
+from datetime import datetime
 from pathlib import Path
 from src.storage import Database
 from src.processor import EmailProcessor
 from src.models import Assignment
+from src.bulk_import import parse_email_bytes, process_mailbox, DEFAULT_BATCH_SIZE
+from src.bench import run_benchmark, parse_mix
+from src.blob_store import LocalBlobStore
+from src.replay import export_trace, replay_trace
+from src.roster_import import RosterImporter, TABS
+
+# Bulk command -> mailbox export format
+BULK_COMMANDS = {'process-dir': 'dir', 'process-mbox': 'mbox', 'process-maildir': 'maildir'}
 
 def main():
     parser = argparse.ArgumentParser(description='RIV Assignment Helper - MVP')
-    parser.add_argument('command', choices=['process', 'list', 'status'], help='Command to run')
+    parser.add_argument('command', choices=['process', 'list', 'status', 'bench', 'export-trace', 'replay', 'import-roster', *BULK_COMMANDS], help='Command to run')
     parser.add_argument('--email-file', help='Path to email file to process')
     parser.add_argument('--assignment-code', help='Assignment code for status check')
+    parser.add_argument('--path', help='Directory of .eml files, mbox file or Maildir for process-dir/-mbox/-maildir, '
+                                       'or directory of roster CSVs for import-roster')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Parser processes for bulk commands, processing threads for replay')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Emails per database commit')
+    parser.add_argument('--checkpoint', default='.process-checkpoint.json', help='Bulk progress file')
+    parser.add_argument('--resume', action='store_true', help='Skip emails already committed per --checkpoint')
+    parser.add_argument('--emails', type=int, default=1000, help='Emails replayed by bench')
+    parser.add_argument('--teachers', type=int, default=5, help='Synthetic teachers for bench')
+    parser.add_argument('--classes-per-teacher', type=int, default=2, help='Synthetic classes per teacher for bench')
+    parser.add_argument('--students-per-class', type=int, default=25, help='Synthetic students per class for bench')
+    parser.add_argument('--mix', help='Bench command mix, e.g. ASSIGN=0.05,SUBMIT=0.6,GRADE=0.25,RETURN=0.05,UNKNOWN=0.05')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the bench school and emails')
+    parser.add_argument('--db-url', help='Empty scratch database for bench (default: temporary SQLite), '
+                                         'or the fresh database replay writes to')
+    parser.add_argument('--json', action='store_true', help='Print the bench or replay report as JSON')
+    parser.add_argument('--trace', help='Trace file (JSONL.gz) written by export-trace and read by replay')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='Start of the export-trace window (UTC, ISO 8601)')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='End of the export-trace window (default: now)')
+    parser.add_argument('--blob-store-path', help='Raw MIME blob store that export-trace recovers bodies from')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Replay pacing as a multiple of the original (0 = as fast as possible)')
     
     args = parser.parse_args()
     
+    if args.command == 'bench':
+        # Runs against its own scratch database, never DATABASE_URL
+        run_bench(args)
+        return
+    if args.command == 'replay':
+        # Writes to a fresh database given explicitly, never DATABASE_URL
+        run_replay(args)
+        return
+    
     db = Database()
     processor = EmailProcessor(db)
     
@@ -29,43 +71,125 @@ def main():
             print("Error: --assignment-code required for status command")
             sys.exit(1)
         show_assignment_status(args.assignment_code, db)
+    elif args.command in BULK_COMMANDS:
+        if not args.path:
+            print(f"Error: --path required for {args.command} command")
+            sys.exit(1)
+        process_bulk(BULK_COMMANDS[args.command], args, processor, db)
+    elif args.command == 'export-trace':
+        if not args.trace or not args.since:
+            print("Error: --trace and --since required for export-trace command")
+            sys.exit(1)
+        blob_store = LocalBlobStore(args.blob_store_path) if args.blob_store_path else None
+        exported = export_trace(db, args.trace, args.since, args.until or datetime.utcnow(), blob_store)
+        print(f"Exported {exported['records']} emails ({exported['with_body']} with bodies) to {args.trace}")
+    elif args.command == 'import-roster':
+        if not args.path:
+            print("Error: --path required for import-roster command")
+            sys.exit(1)
+        import_roster(args.path, db)
 
 def process_email_file(email_file: str, processor: EmailProcessor):
     """Process an email file (eml format or text)."""
     try:
-        with open(email_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Simple email parsing (for MVP)
-        lines = content.split('\n')
-        subject = ""
-        body = ""
-        from_email = ""
-        to_emails = []
-        message_id = ""
+        with open(email_file, 'rb') as f:
+            email = parse_email_bytes(f.read(), Path(email_file).name)
         
-        in_body = False
-        for line in lines:
-            if line.startswith('Subject:'):
-                subject = line[8:].strip()
-            elif line.startswith('From:'):
-                from_email = line[5:].strip()
-            elif line.startswith('To:'):
-                to_emails = [line[3:].strip()]
-            elif line.startswith('Message-ID:'):
-                message_id = line[11:].strip()
-            elif line == '' and not in_body:
-                in_body = True
-            elif in_body:
-                body += line + '\n'
-        
-        response = processor.process_email(body, from_email, to_emails, subject, message_id)
+        response = processor.process_email(**email)
         print(f"Response: {response}")
         
     except Exception as e:
         print(f"Error processing email: {e}")
         sys.exit(1)
 
+def process_bulk(kind: str, args, processor: EmailProcessor, db: Database):
+    """Process a mailbox export and print a throughput summary."""
+    try:
+        summary = process_mailbox(kind, args.path, processor, db, workers=args.workers, batch_size=args.batch_size,
+                                  checkpoint_path=args.checkpoint, resume=args.resume)
+    except (OSError, ValueError) as e:
+        print(f"Error processing {args.path}: {e}")
+        sys.exit(1)
+    
+    if summary['skipped']:
+        print(f"Resumed after {summary['skipped']} emails already processed")
+    print(f"Processed {summary['processed']} emails in {summary['elapsed_seconds']:.1f}s "
+          f"({summary['messages_per_second']:,.1f} msgs/sec)")
+    print("Results by parse_result:")
+    for parse_result, count in summary['results'].items():
+        print(f"  {parse_result}: {count}")
+
+def import_roster(path: str, db: Database):
+    """Import a directory of roster CSVs and print what changed."""
+    if not os.path.isdir(path):
+        print(f"Error: {path} is not a directory")
+        sys.exit(1)
+    
+    report = RosterImporter(db).import_directory(path)
+    print(f"{'Tab':<13}{'Inserted':>10}{'Updated':>10}{'Unchanged':>11}{'Invalid':>9}")
+    for tab in TABS:
+        if tab.name in report:
+            counts = report[tab.name]
+            print(f"{tab.name:<13}{counts['inserted']:>10}{counts['updated']:>10}"
+                  f"{counts['unchanged']:>11}{counts['invalid']:>9}")
+    if 'enrollments_deactivated' in report:
+        print(f"Enrollments deactivated: {report['enrollments_deactivated']}")
+    print(f"Classes with roster changes: {report['classes_bumped']}")
+    for error in report['errors']:
+        print(f"  {error['tab']}.csv line {error['line']}: {error['error']}")
+
+def run_bench(args):
+    """Benchmark the email pipeline on a synthetic school and print the report."""
+    try:
+        mix = parse_mix(args.mix) if args.mix else None
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    
+    report = run_benchmark(emails=args.emails, teachers=args.teachers, classes_per_teacher=args.classes_per_teacher,
+                           students_per_class=args.students_per_class, mix=mix, seed=args.seed, db_url=args.db_url)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    
+    school = report['school']
+    print(f"School: {school['teachers']} teachers, {school['classes']} classes, {school['students']} students")
+    print(f"Processed {report['emails']} emails in {report['elapsed_seconds']:.2f}s "
+          f"({report['emails_per_second']:,.1f} emails/sec, {report['errors']} errors)")
+    print(f"{'Command':<10}{'Emails':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Queries':>10}")
+    for command, stats in [*report['commands'].items(), ('ALL', report['overall'])]:
+        print(f"{command:<10}{stats['emails']:>8}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['queries_per_email']:>10.1f}")
+    if report['peak_rss_mb'] is not None:
+        print(f"Peak RSS: {report['peak_rss_mb']:.1f} MiB")
+
+def run_replay(args):
+    """Replay a trace against a fresh database and print the parse_result comparison."""
+    if not args.trace or not args.db_url:
+        print("Error: --trace and --db-url required for replay command")
+        sys.exit(1)
+    
+    db = Database(args.db_url)
+    try:
+        report = replay_trace(args.trace, EmailProcessor(db), db, speed=args.speed, workers=args.workers)
+    except (OSError, ValueError) as e:
+        print(f"Error replaying {args.trace}: {e}")
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    
+    latency = report['latency_ms']
+    pacing = f"{args.speed:g}x original pacing" if args.speed else "full speed"
+    print(f"Replayed {report['emails']} emails at {pacing} in {report['elapsed_seconds']:.2f}s "
+          f"({report['emails_per_second']:,.1f} emails/sec, {report['errors']} errors, "
+          f"{report['without_body']} without bodies)")
+    print(f"Latency ms: p50 {latency['p50']:,.1f}  p95 {latency['p95']:,.1f}  p99 {latency['p99']:,.1f}")
+    print(f"{'parse_result':<26}{'Original':>10}{'Replayed':>10}{'Delta':>8}")
+    for kind, counts in report['parse_results'].items():
+        print(f"{kind:<26}{counts['original']:>10}{counts['replayed']:>10}{counts['delta']:>+8}")
+    print(f"Emails whose parse_result changed: {report['mismatched']}")
+
 def list_assignments(db: Database):
     """List all assignments."""
     assignments = db.get_all_assignments()
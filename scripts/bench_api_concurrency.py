@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the API.
+Drives GET /api/assignments in-process with N concurrent clients and prints
+requests/sec for each N, once with blocking calls made inline on the event loop
+(the previous behaviour) and once through the BlockingExecutor pools.
+--db-latency-ms adds a sleep to every SQL statement to stand in for a network
+round trip to PostgreSQL.
+
+Usage: python scripts/bench_api_concurrency.py [--clients 1,2,4,8,16] [--requests 200] [--db-latency-ms 2]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+async def run_inline(fn, *args, **kwargs):
+    """Stand-in for BlockingExecutor.run that calls fn on the event loop."""
+    return fn(*args, **kwargs)
+
+
+async def requests_per_second(app, clients: int, total: int) -> float:
+    """Issue `total` requests spread over `clients` concurrent loops."""
+    import httpx
+
+    async def worker(client, count):
+        for _ in range(count):
+            response = await client.get("/api/assignments", params={"limit": 20})
+            response.raise_for_status()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        per_client = max(1, total // clients)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client, per_client) for _ in range(clients)))
+        return per_client * clients / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark API throughput against concurrent clients')
+    parser.add_argument('--clients', default='1,2,4,8,16', help='Comma-separated client counts')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per measurement')
+    parser.add_argument('--db-latency-ms', type=float, default=2.0, help='Simulated latency per SQL statement')
+    args = parser.parse_args()
+    client_counts = [int(n) for n in args.clients.split(',')]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault('APP_DB_POOL_WORKERS', str(max(client_counts)))
+        from sqlalchemy import event
+        from src import api
+
+        if args.db_latency_ms > 0:
+            delay = args.db_latency_ms / 1000.0
+
+            @event.listens_for(api.db.engine, "before_cursor_execute")
+            def simulate_latency(conn, cursor, statement, parameters, context, executemany):
+                time.sleep(delay)
+
+        pooled_run = api.db_pool.run
+        print(f"GET /api/assignments, {args.requests} requests per run, "
+              f"{args.db_latency_ms:g} ms simulated latency per statement")
+        print(f"{'clients':>8} {'inline req/s':>14} {'pooled req/s':>14} {'speedup':>8}")
+        for clients in client_counts:
+            api.db_pool.run = run_inline
+            inline = asyncio.run(requests_per_second(api.app, clients, args.requests))
+            api.db_pool.run = pooled_run
+            pooled = asyncio.run(requests_per_second(api.app, clients, args.requests))
+            print(f"{clients:>8} {inline:>14,.0f} {pooled:>14,.0f} {pooled / inline:>7.2f}x")
+
+        print(f"db pool: {api.db_pool.stats()}")
+        api.db_pool.shutdown()
+        api.processing_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
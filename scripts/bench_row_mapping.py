@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for Database read mapping.
+Compares the previous ORM-entity + validated-model path against the RowMapper
+column-tuple path on a scratch SQLite database, and prints rows/sec for each.
+
+Usage: python scripts/bench_row_mapping.py [--rows 20000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import insert
+from src.storage import Database
+from src.models import Assignment, AssignmentDB, ClassDB
+
+
+def seed(db: Database, rows: int) -> None:
+    """Insert one class and `rows` assignments with a single executemany."""
+    now = datetime(2025, 1, 1)
+    with db.engine.begin() as conn:
+        conn.execute(insert(ClassDB), [{
+            'id': 'class-1', 'term_id': 'term-1', 'name': 'English 7',
+            'teacher_id': 'teacher-1', 'roster_version': 1, 'status': 'ACTIVE'
+        }])
+        conn.execute(insert(AssignmentDB), [{
+            'id': f'assignment-{i}', 'code': f'ENG7-{i:06d}', 'class_id': 'class-1',
+            'title': f'Assignment {i}', 'instructions': 'Read chapter 3',
+            'deadline_at': now + timedelta(hours=i), 'deadline_tz': 'CT',
+            'created_by_teacher_id': 'teacher-1', 'status': 'SCHEDULED',
+            'grace_days': 7, 'created_at': now
+        } for i in range(rows)])
+
+
+def legacy_all_assignments_with_classes(db: Database):
+    """The pre-RowMapper implementation: ORM entities copied into validated models."""
+    with db.SessionLocal() as session:
+        results = session.query(AssignmentDB, ClassDB.name).outerjoin(
+            ClassDB, AssignmentDB.class_id == ClassDB.id
+        ).all()
+        return [
+            (
+                Assignment(
+                    id=assignment.id,
+                    code=assignment.code,
+                    class_id=assignment.class_id,
+                    title=assignment.title,
+                    instructions=assignment.instructions,
+                    deadline_at=assignment.deadline_at,
+                    deadline_tz=assignment.deadline_tz,
+                    created_by_teacher_id=assignment.created_by_teacher_id,
+                    status=assignment.status,
+                    grace_days=assignment.grace_days,
+                    created_at=assignment.created_at
+                ),
+                class_name
+            )
+            for assignment, class_name in results
+        ]
+
+
+def rows_per_second(fn, repeat: int) -> float:
+    """Best-of-N throughput for a listing function."""
+    best = float('inf')
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(fn())
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Database row mapping')
+    parser.add_argument('--rows', type=int, default=20000, help='Number of assignments to list')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per variant (best is reported)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        seed(db, args.rows)
+
+        before = rows_per_second(lambda: legacy_all_assignments_with_classes(db), args.repeat)
+        after = rows_per_second(db.get_all_assignments_with_classes, args.repeat)
+
+    print(f"get_all_assignments_with_classes over {args.rows} rows (best of {args.repeat})")
+    print(f"  before (ORM entities + validation): {before:12,.0f} rows/sec")
+    print(f"  after  (RowMapper fast path):       {after:12,.0f} rows/sec")
+    print(f"  speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for Gmail ingestion, without a Google account.
+Delivers a synthetic school's email traffic into an in-process fake Gmail
+mailbox (with simulated latency and failures) and posts a Pub/Sub webhook
+notification per burst. The messages then go through the real path:
+webhook -> ingestion queue -> history.list -> batch fetch -> EmailProcessor ->
+SQLite. Reports messages/sec and p50/p95/p99 end-to-end latency, measured
+from delivery into the mailbox to the processor's commit.
+
+Usage: python scripts/load_test_ingestion.py [--messages 500] [--rate 100] [--burst 10]
+           [--latency-ms 40] [--error-rate 0.01] [--message-workers 4] [--quota 250] [--json]
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.storage import Database
+from src.processor import EmailProcessor
+from src.gmail_client import GmailClient
+from src.gmail_fake import FakeGmailService
+from src.gmail_ingestion import GmailIngestionService
+from src.ingestion_queue import IngestionQueue
+from src.rate_limit import QuotaLimiter
+from src.synthetic import SyntheticSchool
+from src.bench import percentile
+
+MAILBOX = 'assignments@example.com'
+
+
+class CompletionRecorder:
+    """Processor wrapper recording when each email (by Message-ID) finished processing."""
+
+    def __init__(self, processor: EmailProcessor):
+        self._processor = processor
+        self._lock = threading.Lock()
+        self.completed = {}
+        self.outcomes = Counter()
+        self.all_done = threading.Event()
+        self.expected = 0
+
+    def process_email(self, **kwargs) -> str:
+        response = self._processor.process_email(**kwargs)
+        with self._lock:
+            self.completed[kwargs['message_id']] = time.perf_counter()
+            self.outcomes[response.split(' ')[0].rstrip(':.')] += 1
+            if len(self.completed) >= self.expected:
+                self.all_done.set()
+        return response
+
+
+def pubsub_notification(history_id: str) -> dict:
+    """The push body Pub/Sub posts to /api/gmail-webhook."""
+    data = json.dumps({'emailAddress': MAILBOX, 'historyId': int(history_id)}).encode('utf-8')
+    return {'message': {'data': base64.b64encode(data).decode('ascii'), 'messageId': history_id}}
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(f"sqlite:///{os.path.join(tmp, 'load.db')}")
+        school = SyntheticSchool(teachers=args.teachers, students_per_class=args.students_per_class, seed=args.seed)
+        school.populate(db)
+
+        jitter = random.Random(args.seed)
+        latency = args.latency_ms / 1000.0
+        service = FakeGmailService(latency=lambda: jitter.uniform(0.5 * latency, 1.5 * latency),
+                                   error_rate=args.error_rate, seed=args.seed)
+        client = GmailClient(service=service, user_email=MAILBOX,
+                             limiter=QuotaLimiter(units_per_second=args.quota, backoff_base=0.2, backoff_cap=2.0))
+        recorder = CompletionRecorder(EmailProcessor(db))
+        ingestion = GmailIngestionService(client, db, recorder, workers=args.message_workers)
+        ingestion.queue = IngestionQueue(db, ingestion.process_history, workers=args.workers,
+                                         poll_interval=0.05, backoff_base=0.2, backoff_cap=2.0)
+
+        # As in production: watch the mailbox and sync from the historyId it returns
+        watch = client.setup_watch('projects/load-test/topics/gmail')
+        db.save_gmail_sync_state(ingestion.mailbox, watch['historyId'], datetime.utcnow())
+
+        emails = list(school.emails(args.messages))
+        recorder.expected = len(emails)
+        delivered = {}
+        ingestion.queue.start()
+        started = time.perf_counter()
+        try:
+            for index, email in enumerate(emails):
+                if args.rate > 0:
+                    # Pace deliveries to the target rate
+                    delay = started + index / args.rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                service.add_message(email.as_mime())
+                delivered[email.message_id] = time.perf_counter()
+                if (index + 1) % args.burst == 0 or index + 1 == len(emails):
+                    ingestion.handle_pubsub_notification(pubsub_notification(service.history_id))
+            recorder.all_done.wait(args.timeout)
+        finally:
+            ingestion.queue.stop(timeout=30)
+        elapsed = max(recorder.completed.values(), default=started) - started
+
+        latencies_ms = sorted(
+            (recorder.completed[message_id] - delivered_at) * 1000
+            for message_id, delivered_at in delivered.items() if message_id in recorder.completed
+        )
+        return {
+            'messages': len(emails),
+            'completed': len(latencies_ms),
+            'elapsed_seconds': round(elapsed, 3),
+            'messages_per_second': round(len(latencies_ms) / elapsed, 1) if elapsed > 0 else 0.0,
+            'latency_ms': {
+                'p50': round(percentile(latencies_ms, 50), 1),
+                'p95': round(percentile(latencies_ms, 95), 1),
+                'p99': round(percentile(latencies_ms, 99), 1),
+                'max': round(latencies_ms[-1], 1) if latencies_ms else 0.0,
+            },
+            'outcomes': dict(recorder.outcomes),
+            'gmail': {'round_trips': service.round_trips, 'methods': dict(service.calls), **client.stats()},
+            'ingestion_queue': {key: value for key, value in ingestion.queue.stats().items()
+                                if key in ('enqueued', 'coalesced', 'completed', 'retried', 'failed_total')},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test webhook -> history -> processor -> DB ingestion')
+    parser.add_argument('--messages', type=int, default=500, help='Emails to deliver')
+    parser.add_argument('--rate', type=float, default=100.0, help='Deliveries per second (0 = all at once)')
+    parser.add_argument('--burst', type=int, default=10, help='Deliveries per webhook notification')
+    parser.add_argument('--latency-ms', type=float, default=40.0, help='Mean simulated Gmail round-trip latency')
+    parser.add_argument('--error-rate', type=float, default=0.01, help='Probability a Gmail call fails with 503')
+    parser.add_argument('--workers', type=int, default=2, help='Ingestion queue workers')
+    parser.add_argument('--message-workers', type=int, default=4, help='Fetch/process threads per sync')
+    parser.add_argument('--quota', type=float, default=250.0, help='Gmail quota units per second')
+    parser.add_argument('--teachers', type=int, default=5, help='Synthetic teachers (2 classes each)')
+    parser.add_argument('--students-per-class', type=int, default=25, help='Synthetic students per class')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for traffic and injected failures')
+    parser.add_argument('--timeout', type=float, default=300.0, help='Seconds to wait for processing to finish')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    latency = report['latency_ms']
+    print(f"Delivered {report['messages']} messages at {args.rate:g}/s in bursts of {args.burst}, "
+          f"{args.latency_ms:g} ms Gmail latency, {args.error_rate:.1%} injected errors")
+    print(f"Completed {report['completed']} in {report['elapsed_seconds']:.2f}s: "
+          f"{report['messages_per_second']:,.1f} msgs/sec")
+    print(f"End-to-end latency ms: p50 {latency['p50']:,.1f}  p95 {latency['p95']:,.1f}  "
+          f"p99 {latency['p99']:,.1f}  max {latency['max']:,.1f}")
+    print(f"Outcomes: {report['outcomes']}")
+    print(f"Gmail: {report['gmail']}")
+    print(f"Ingestion queue: {report['ingestion_queue']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,18 +2,39 @@
 """
 Seed development data for RIV Assignment System.
 Creates sample teachers, students, classes, and enrollments for testing.
+
+With size flags, generates a synthetic dataset of any size instead (e.g. 100k
+students for performance work). Rows are generated lazily and written through
+Database.bulk_insert in chunks (COPY on PostgreSQL), so memory stays flat.
+IDs are derived from row numbers; --seed varies names, deadlines and timing.
+
+Usage: python scripts/seed_data.py
+       python scripts/seed_data.py --teachers 500 --classes 4000 --students 100000
+           [--classes-per-student 6] [--assignments 40000] [--submissions 1000000] [--seed 0] [--db-url URL]
 """
 
+import argparse
+import random
 import sys
 import os
+import time
 import uuid
 from datetime import datetime, timedelta
+from typing import Dict, Iterator
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from src.storage import Database
-from src.models import Student, Teacher, Class, Term, Parent, Enrollment
+from src.models import (
+    Student, Teacher, Class, Term, Parent, Enrollment,
+    TermDB, TeacherDB, ClassDB, StudentDB, ParentDB, EnrollmentDB, AssignmentDB, SubmissionDB
+)
+
+FIRST_NAMES = ["Emma", "Liam", "Olivia", "Noah", "Ava", "Elijah", "Sophia", "Lucas", "Mia", "Mateo"]
+LAST_NAMES = ["Johnson", "Brown", "Davis", "Miller", "Wilson", "Garcia", "Martinez", "Lee", "Walker", "Young"]
+TERM_START = datetime(2025, 9, 1)
+TERM_END = datetime(2025, 12, 19)
 
 def seed_development_data():
     """Create sample data for development and testing."""
@@ -134,5 +155,149 @@ def seed_development_data():
     print("Student: STU001, STU002, STU003, STU004, STU005")
     print("Classes: English 7, Math 7, Science 7")
 
+class DatasetGenerator:
+    """
+    Lazily generates rows for a synthetic school of a given size.
+
+    Student n is enrolled in classes (n + j * stride) % classes for j < classes_per_student,
+    so each class's students can be enumerated without holding the roster in memory.
+    """
+
+    def __init__(self, teachers: int, classes: int, students: int, classes_per_student: int,
+                 assignments: int, submissions: int, seed: int):
+        if min(teachers, classes) < 1 or not 1 <= classes_per_student <= classes:
+            raise ValueError("need at least 1 teacher and class, and 1 <= classes-per-student <= classes")
+        self.teachers = teachers
+        self.classes = classes
+        self.students = students
+        self.classes_per_student = classes_per_student
+        self.stride = classes // classes_per_student
+        self.assignments = assignments
+        self.submissions = submissions
+        self.seed = seed
+        self.term_id = f"term-{seed}"
+
+    def _name(self, rng: random.Random) -> Dict:
+        return {'first_name': rng.choice(FIRST_NAMES), 'last_name': rng.choice(LAST_NAMES)}
+
+    def terms(self) -> Iterator[Dict]:
+        yield {'id': self.term_id, 'name': 'FALL', 'year': TERM_START.year,
+               'start_date': TERM_START, 'end_date': TERM_END}
+
+    def teacher_rows(self) -> Iterator[Dict]:
+        rng = random.Random(f"{self.seed}-teachers")
+        for t in range(self.teachers):
+            yield {'id': f"teacher-{t:06d}", 'email': f"teacher{t:06d}@school.example.com",
+                   **self._name(rng), 'status': 'ACTIVE'}
+
+    def class_rows(self) -> Iterator[Dict]:
+        for c in range(self.classes):
+            yield {'id': f"class-{c:06d}", 'term_id': self.term_id, 'name': f"Class {c:06d}",
+                   'subject': None, 'teacher_id': f"teacher-{c % self.teachers:06d}",
+                   'roster_version': 1, 'status': 'ACTIVE'}
+
+    def student_rows(self) -> Iterator[Dict]:
+        rng = random.Random(f"{self.seed}-students")
+        for n in range(self.students):
+            # enrollments.student_id holds the student code but references students.id, so keep them equal
+            yield {'id': f"STU{n:07d}", 'student_id': f"STU{n:07d}", **self._name(rng),
+                   'email': f"stu{n:07d}@school.example.com", 'status': 'ACTIVE'}
+
+    def parent_rows(self) -> Iterator[Dict]:
+        for n in range(self.students):
+            yield {'id': f"parent-{n:07d}", 'email': f"parent{n:07d}@example.com",
+                   'first_name': None, 'last_name': None, 'status': 'ACTIVE'}
+
+    def enrollment_rows(self) -> Iterator[Dict]:
+        for n in range(self.students):
+            for j in range(self.classes_per_student):
+                yield {'id': f"enrollment-{n:07d}-{j}", 'class_id': f"class-{(n + j * self.stride) % self.classes:06d}",
+                       'student_id': f"STU{n:07d}", 'parent_id': f"parent-{n:07d}", 'active': True,
+                       'joined_at': TERM_START, 'left_at': None}
+
+    def _class_of(self, a: int) -> int:
+        return a % self.classes
+
+    def _deadline(self, a: int) -> datetime:
+        rng = random.Random(f"{self.seed}-assignment-{a}")
+        return TERM_START + timedelta(days=rng.randrange((TERM_END - TERM_START).days), hours=23, minutes=59)
+
+    def assignment_rows(self) -> Iterator[Dict]:
+        for a in range(self.assignments):
+            c = self._class_of(a)
+            yield {'id': f"assignment-{a:07d}", 'code': f"C{c:06d}-{a:07d}", 'class_id': f"class-{c:06d}",
+                   'title': f"Assignment {a}", 'instructions': None, 'deadline_at': self._deadline(a),
+                   'deadline_tz': 'CT', 'created_by_teacher_id': f"teacher-{c % self.teachers:06d}",
+                   'status': 'SCHEDULED', 'grace_days': 7, 'created_at': TERM_START}
+
+    def _class_students(self, c: int) -> Iterator[int]:
+        """Students enrolled in class c (n with (n + j * stride) % classes == c for some j)."""
+        for j in range(self.classes_per_student):
+            n = (c - j * self.stride) % self.classes
+            while n < self.students:
+                yield n
+                n += self.classes
+
+    def submission_rows(self) -> Iterator[Dict]:
+        if not self.assignments:
+            return
+        rng = random.Random(f"{self.seed}-submissions")
+        per_assignment, extra = divmod(self.submissions, self.assignments)
+        for a in range(self.assignments):
+            wanted = per_assignment + (a < extra)
+            deadline = self._deadline(a)
+            for k, n in enumerate(self._class_students(self._class_of(a))):
+                if k >= wanted:
+                    break
+                # About one in ten submissions arrives after the deadline
+                received_at = deadline - timedelta(minutes=rng.randrange(-1440, 12960))
+                yield {'id': f"submission-{a:07d}-{n:07d}", 'assignment_id': f"assignment-{a:07d}",
+                       'student_id': f"STU{n:07d}", 'received_at': received_at,
+                       'on_time': received_at <= deadline, 'status': 'RECEIVED'}
+
+def generate_dataset(db: Database, generator: DatasetGenerator) -> None:
+    """Write a generated dataset, table by table, and print rows/sec for each."""
+    tables = [
+        (TermDB, generator.terms), (TeacherDB, generator.teacher_rows), (ClassDB, generator.class_rows),
+        (StudentDB, generator.student_rows), (ParentDB, generator.parent_rows),
+        (EnrollmentDB, generator.enrollment_rows), (AssignmentDB, generator.assignment_rows),
+        (SubmissionDB, generator.submission_rows),
+    ]
+    total = 0
+    started = time.perf_counter()
+    for table, rows in tables:
+        table_started = time.perf_counter()
+        inserted = db.bulk_insert(table, rows())
+        elapsed = time.perf_counter() - table_started
+        total += inserted
+        print(f"{table.__tablename__:<12} {inserted:>10,} rows in {elapsed:6.2f}s "
+              f"({inserted / elapsed if elapsed > 0 else 0:,.0f} rows/sec)")
+    elapsed = time.perf_counter() - started
+    print(f"{'total':<12} {total:>10,} rows in {elapsed:6.2f}s ({total / elapsed if elapsed > 0 else 0:,.0f} rows/sec)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed development data, or generate a dataset of a given size')
+    parser.add_argument('--teachers', type=int, help='Teachers to generate (enables dataset generation)')
+    parser.add_argument('--classes', type=int, help='Classes, assigned to teachers round-robin')
+    parser.add_argument('--students', type=int, help='Students, each with one parent')
+    parser.add_argument('--classes-per-student', type=int, default=1, help='Enrollments per student')
+    parser.add_argument('--assignments', type=int, default=0, help='Assignments, spread across classes')
+    parser.add_argument('--submissions', type=int, default=0,
+                        help='Submissions, spread across assignments (capped at each class size)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for names, deadlines and submission times')
+    parser.add_argument('--db-url', help='Database to write (default: DATABASE_URL)')
+    args = parser.parse_args()
+
+    if args.teachers is None and args.classes is None and args.students is None:
+        seed_development_data()
+        return
+    try:
+        generator = DatasetGenerator(args.teachers or 1, args.classes or 1, args.students or 0,
+                                     args.classes_per_student, args.assignments, args.submissions, args.seed)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    generate_dataset(Database(args.db_url), generator)
+
 if __name__ == "__main__":
-    seed_development_data()
+    main()
@@ -1,20 +1,29 @@
 import os
+import base64
+import hmac
+import json
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response, Query, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, field_validator, Field
 from pydantic_settings import BaseSettings
 from typing import List, Optional
 import re
 from email_validator import validate_email, EmailNotValidError
 from .storage import Database
+from .blob_store import LocalBlobStore, BlobNotFoundError, CHUNK_SIZE
 from .processor import EmailProcessor
+from .cache import VersionPoller
+from .executor import BlockingExecutor, ExecutorSaturatedError
 from .models import Assignment, Submission
 from .gmail_client import GmailClient
 from .gmail_ingestion import GmailIngestionService
+from .ingestion_queue import IngestionQueue
+from .outbox import OutboxSender
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,13 +32,37 @@ logger = logging.getLogger(__name__)
 class Settings(BaseSettings):
     environment: str = Field(default="development")
     cors_origins: str = Field(default="*")
+    cache_version_poll_ms: int = Field(default=1000)
+    db_pool_workers: int = Field(default=8)
+    processing_pool_workers: int = Field(default=4)
+    executor_max_queue: int = Field(default=100)
+    ingestion_workers: int = Field(default=2)
+    ingestion_message_workers: int = Field(default=4)
+    blob_store_path: str = Field(default="")  # raw MIME archive directory; empty disables archiving
+    blob_store_compression: str = Field(default="gzip")
+    outbox_batch_size: int = Field(default=20)
+    admin_token: str = Field(default="")  # bearer token for admin endpoints; empty disables them
     
     class Config:
         env_prefix = "APP_"
 
 settings = Settings()
 
-app = FastAPI(title="RIV Assignment Helper API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the Gmail ingestion queue workers and outbox sender for the lifetime of the app."""
+    queue = ingestion_service.queue if ingestion_service else None
+    if queue:
+        queue.start()
+    if outbox_sender:
+        outbox_sender.start()
+    yield
+    if queue:
+        queue.stop(timeout=30)
+    if outbox_sender:
+        outbox_sender.stop(timeout=30)
+
+app = FastAPI(title="RIV Assignment Helper API", version="1.0.0", lifespan=lifespan)
 
 # Configure CORS
 origins = settings.cors_origins.split(",") if settings.cors_origins != "*" else ["*"]
@@ -39,20 +72,51 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Initialize database and processor
 db = Database()
-processor = EmailProcessor(db)
+# Each worker polls the shared cache_versions counters to drop stale lookups
+processor = EmailProcessor(
+    db,
+    version_poller=VersionPoller(db.get_table_versions, interval_ms=settings.cache_version_poll_ms)
+)
+
+blob_store = LocalBlobStore(settings.blob_store_path, settings.blob_store_compression) if settings.blob_store_path else None
+
+# Blocking Database/EmailProcessor calls run on these pools, never on the event loop
+db_pool = BlockingExecutor("db", settings.db_pool_workers, settings.executor_max_queue)
+processing_pool = BlockingExecutor("processing", settings.processing_pool_workers, settings.executor_max_queue)
+
+def saturated_error(e: ExecutorSaturatedError) -> HTTPException:
+    logger.warning(str(e))
+    return HTTPException(status_code=503, detail="Server busy, retry shortly", headers={"Retry-After": "1"})
+
+def require_admin(authorization: Optional[str] = Header(default=None)) -> None:
+    """Allow the request only with the admin bearer token (APP_ADMIN_TOKEN)."""
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.admin_token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing admin token",
+                            headers={"WWW-Authenticate": "Bearer"})
 
 # Initialize Gmail client and ingestion service (if credentials are available)
 gmail_client = None
 ingestion_service = None
+outbox_sender = None
 
 try:
     if os.getenv('GOOGLE_APPLICATION_CREDENTIALS') and os.getenv('GMAIL_USER_EMAIL'):
         gmail_client = GmailClient()
-        ingestion_service = GmailIngestionService(gmail_client, db, processor)
+        ingestion_service = GmailIngestionService(gmail_client, db, processor,
+                                                  workers=settings.ingestion_message_workers,
+                                                  blob_store=blob_store, enqueue_replies=True)
+        ingestion_service.queue = IngestionQueue(db, ingestion_service.process_history,
+                                                 workers=settings.ingestion_workers)
+        # Replies to ingested emails are queued with each email's writes and sent in the background
+        outbox_sender = OutboxSender(db, gmail_client, batch_size=settings.outbox_batch_size)
         logger.info("Gmail ingestion service initialized")
     else:
         logger.info("Gmail ingestion not configured (missing credentials)")
@@ -128,7 +192,8 @@ async def process_email_endpoint(request: EmailRequest):
     All inputs are validated both client-side and server-side.
     """
     try:
-        response = processor.process_email(
+        response = await processing_pool.run(
+            processor.process_email,
             email_content=request.body,
             from_email=request.from_email,
             to_emails=[request.to_email],
@@ -136,6 +201,8 @@ async def process_email_endpoint(request: EmailRequest):
             message_id=request.message_id
         )
         return {"success": True, "response": response}
+    except ExecutorSaturatedError as e:
+        raise saturated_error(e)
     except ValueError as e:
         # Validation errors from the processor
         logger.warning(f"Validation error: {str(e)}")
@@ -151,10 +218,60 @@ async def process_email_endpoint(request: EmailRequest):
         
         raise HTTPException(status_code=500, detail=detail)
 
+def encode_cursor(key: tuple) -> str:
+    """Encode a (deadline_at, id) keyset position as an opaque URL-safe token."""
+    deadline_at, assignment_id = key
+    raw = json.dumps([deadline_at.isoformat(), assignment_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a token from encode_cursor. Raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        deadline_at, assignment_id = json.loads(raw)
+        return datetime.fromisoformat(deadline_at), str(assignment_id)
+    except Exception as e:
+        raise ValueError('Invalid cursor') from e
+
 @app.get("/api/assignments")
-async def list_assignments_endpoint():
-    """List all assignments."""
-    assignments_with_classes = db.get_all_assignments_with_classes()
+async def list_assignments_endpoint(
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    class_id: Optional[str] = None,
+    term_id: Optional[str] = None,
+    status: Optional[str] = None,
+    deadline_from: Optional[datetime] = None,
+    deadline_to: Optional[datetime] = None
+):
+    """
+    List assignments one page at a time, ordered by deadline.
+    
+    Filters by class, term, status and deadline range are optional. When more
+    assignments follow, the X-Next-Cursor response header carries the token to
+    pass as `cursor` for the next page.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    try:
+        assignments_with_classes, next_key = await db_pool.run(
+            db.get_assignments_page,
+            limit,
+            after=after,
+            class_id=class_id,
+            term_id=term_id,
+            status=status,
+            deadline_from=deadline_from,
+            deadline_to=deadline_to
+        )
+    except ExecutorSaturatedError as e:
+        raise saturated_error(e)
+    if next_key is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(next_key)
+    
     result = []
     for assignment, class_name in assignments_with_classes:
         result.append(AssignmentResponse(
@@ -176,12 +293,21 @@ async def get_assignment_status_endpoint(assignment_code: str):
     if not re.match(r'^[A-Z0-9]+-[A-Z0-9]+$', assignment_code):
         raise HTTPException(status_code=400, detail="Invalid assignment code format. Use format like ENG7-0115")
     
-    result = db.get_assignment_with_class_by_code(assignment_code)
-    if not result:
+    def load_status():
+        with db.transaction() as uow:
+            result = uow.get_assignment_with_class_by_code(assignment_code)
+            if not result:
+                return None
+            return result, uow.get_submissions_by_assignment(result[0].id)
+    
+    try:
+        status = await db_pool.run(load_status)
+    except ExecutorSaturatedError as e:
+        raise saturated_error(e)
+    if not status:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
-    assignment, class_name = result
-    submissions = db.get_submissions_by_assignment(assignment.id)
+    (assignment, class_name), submissions = status
     
     return {
         "assignment": AssignmentResponse(
@@ -214,7 +340,8 @@ async def gmail_webhook(request: Request):
     Webhook endpoint for Gmail Pub/Sub push notifications.
     
     This endpoint is called by Google Cloud Pub/Sub when new emails arrive.
-    It processes the notification and ingests the email.
+    It records the notification in the ingestion queue and returns at once;
+    background workers fetch and process the new messages.
     """
     if not ingestion_service:
         raise HTTPException(
@@ -228,8 +355,8 @@ async def gmail_webhook(request: Request):
         
         logger.info(f"Received Gmail webhook: {body}")
         
-        # Process the notification
-        result = ingestion_service.handle_pubsub_notification(body)
+        # Queue the notification (a single insert)
+        result = await db_pool.run(ingestion_service.handle_pubsub_notification, body)
         
         return {
             "status": "ok",
@@ -251,12 +378,51 @@ async def health_check():
     """Health check endpoint for Cloud Run."""
     try:
         # Test database connection
-        db.test_connection()
+        await db_pool.run(db.test_connection)
         return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         raise HTTPException(status_code=503, detail="Service unhealthy")
 
+@app.get("/api/blobs/{key}", dependencies=[Depends(require_admin)])
+async def get_raw_blob(key: str):
+    """Stream an archived raw MIME message by its blob key (SHA-256). Admin only: it holds student PII."""
+    if blob_store is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    try:
+        stream = await db_pool.run(blob_store.open, key)
+    except BlobNotFoundError:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    except ExecutorSaturatedError as e:
+        raise saturated_error(e)
+    
+    async def content():
+        # File reads and decompression run on the pool, never on the event loop
+        try:
+            while chunk := await db_pool.run(stream.read, CHUNK_SIZE):
+                yield chunk
+        finally:
+            await db_pool.run(stream.close)
+    
+    return StreamingResponse(content(), media_type="message/rfc822")
+
+@app.get("/api/metrics")
+async def metrics_endpoint():
+    """Executor pool, processor cache, ingestion queue, outbox, Gmail quota and blob store metrics."""
+    metrics = {
+        "pools": {pool.name: pool.stats() for pool in (db_pool, processing_pool)},
+        "processor_cache": processor.cache_stats()
+    }
+    if ingestion_service and ingestion_service.queue:
+        metrics["ingestion_queue"] = await db_pool.run(ingestion_service.queue.stats)
+    if outbox_sender:
+        metrics["outbox"] = await db_pool.run(outbox_sender.stats)
+    if gmail_client:
+        metrics["gmail_quota"] = gmail_client.stats()
+    if blob_store:
+        metrics["blob_store"] = await db_pool.run(db.get_raw_blob_stats)
+    return metrics
+
 @app.get("/")
 async def serve_index():
     return FileResponse("static/index.html")
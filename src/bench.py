@@ -0,0 +1,127 @@
+"""
+Benchmark of the email pipeline against a synthetic school.
+Replays a generated mix of ASSIGN/SUBMIT/GRADE/RETURN/unknown emails through
+EmailProcessor.process_email one at a time and reports throughput, latency
+percentiles and database statements per email by command, and peak RSS.
+"""
+
+import os
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from .processor import EmailProcessor
+from .storage import Database
+from .synthetic import SyntheticSchool, DEFAULT_MIX
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list (0.0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse a command mix such as 'ASSIGN=0.05,SUBMIT=0.6,GRADE=0.3,UNKNOWN=0.05'."""
+    mix = {}
+    for part in spec.split(','):
+        command, _, weight = part.partition('=')
+        command = command.strip().upper()
+        if command not in DEFAULT_MIX:
+            raise ValueError(f"Unknown command {command!r} in mix; expected one of {', '.join(DEFAULT_MIX)}")
+        mix[command] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise ValueError("Mix weights must add up to more than 0")
+    return mix
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MiB, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if os.uname().sysname == 'Darwin' else 1024), 1)
+
+
+def _summarize(latencies: List[float], queries: int) -> Dict:
+    latencies = sorted(latencies)
+    return {
+        'emails': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'queries_per_email': round(queries / len(latencies), 2) if latencies else 0.0,
+    }
+
+
+def run_benchmark(emails: int = 1000, teachers: int = 5, classes_per_teacher: int = 2, students_per_class: int = 25,
+                  mix: Optional[Dict[str, float]] = None, seed: int = 0, db_url: Optional[str] = None) -> Dict:
+    """
+    Populate a scratch database with a synthetic school and replay emails through the processor.
+
+    Args:
+        emails: Number of emails to replay
+        teachers: Synthetic teachers
+        classes_per_teacher: Classes per teacher
+        students_per_class: Students enrolled per class
+        mix: Command -> weight (default: synthetic.DEFAULT_MIX)
+        seed: Seed for the roster and the email stream
+        db_url: Empty scratch database to use, e.g. a Postgres URL (default: a temporary SQLite file)
+
+    Returns:
+        Report with overall throughput and, per command, latency percentiles and
+        database statements per email
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        school = SyntheticSchool(teachers=teachers, classes_per_teacher=classes_per_teacher,
+                                 students_per_class=students_per_class, seed=seed)
+        school.populate(db)
+        processor = EmailProcessor(db)
+        stream = list(school.emails(emails, mix))
+
+        statements = 0
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            nonlocal statements
+            statements += 1
+
+        latencies = defaultdict(list)
+        queries = defaultdict(int)
+        errors = 0
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+        try:
+            started = time.perf_counter()
+            for email in stream:
+                before = statements
+                email_started = time.perf_counter()
+                try:
+                    processor.process_email(**email.as_kwargs())
+                except Exception:
+                    errors += 1
+                latencies[email.command].append(time.perf_counter() - email_started)
+                queries[email.command] += statements - before
+            elapsed = time.perf_counter() - started
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count_statement)
+        db.engine.dispose()
+
+    return {
+        'emails': len(stream),
+        'errors': errors,
+        'elapsed_seconds': round(elapsed, 3),
+        'emails_per_second': round(len(stream) / elapsed, 1) if elapsed > 0 else 0.0,
+        'overall': _summarize([value for values in latencies.values() for value in values], sum(queries.values())),
+        'commands': {command: _summarize(latencies[command], queries[command]) for command in sorted(latencies)},
+        'peak_rss_mb': peak_rss_mb(),
+        'school': {'teachers': teachers, 'classes': len(school.classes), 'students': len(school.students)},
+    }
@@ -0,0 +1,169 @@
+"""
+Content-addressed store for raw MIME.
+Objects are keyed by the SHA-256 of their uncompressed bytes, so an email
+delivered twice is stored once. Content is hashed and compressed as it is
+streamed in, never held whole in memory. LocalBlobStore keeps objects in a
+directory tree and stands in for Google Drive.
+"""
+
+import gzip
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import BinaryIO, Iterable, Iterator, NamedTuple, Optional
+from .storage import Database
+
+try:
+    import zstandard
+except ImportError:  # optional: gzip is always available
+    zstandard = None
+
+CHUNK_SIZE = 64 * 1024
+COMPRESSIONS = ('gzip', 'zstd')
+EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+HEX_DIGITS = frozenset('0123456789abcdef')
+
+
+class BlobNotFoundError(KeyError):
+    """No object is stored under the requested key."""
+
+
+class BlobInfo(NamedTuple):
+    """A stored object: its key and its uncompressed and stored sizes in bytes."""
+    key: str
+    size: int
+    stored_size: int
+    compression: str
+    created: bool  # False if an identical object was already stored
+
+
+def iter_chunks(data: bytes, chunk_size: int = CHUNK_SIZE) -> Iterator[memoryview]:
+    """Yield zero-copy slices of an in-memory buffer, for put()."""
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+
+def iter_file(fileobj: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield a file's content in chunks, for put()."""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def archive_raw_mime(store: "BlobStore", db: Database, chunks: Iterable[bytes]) -> BlobInfo:
+    """Stream raw MIME into the store and record the object in raw_blobs (for the size report)."""
+    info = store.put(chunks)
+    db.save_raw_blob(info.key, info.size, info.stored_size, info.compression, datetime.utcnow())
+    return info
+
+
+class BlobStore(ABC):
+    """Interface of a content-addressed blob store backend."""
+
+    @abstractmethod
+    def put(self, chunks: Iterable[bytes]) -> BlobInfo:
+        """Store streamed content and return its info; storing existing content is a no-op."""
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """Open a stored object for streamed reading of its uncompressed content."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Whether an object is stored under the key."""
+
+    def get(self, key: str) -> bytes:
+        """Read a whole stored object."""
+        with self.open(key) as stream:
+            return stream.read()
+
+    def iter_content(self, key: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield a stored object's uncompressed content in chunks."""
+        with self.open(key) as stream:
+            yield from iter_file(stream, chunk_size)
+
+
+class LocalBlobStore(BlobStore):
+    """Blob store on the local filesystem: root/ab/cd/<sha256><ext>."""
+
+    def __init__(self, root: str, compression: str = 'gzip', level: Optional[int] = None):
+        """
+        Initialize store.
+
+        Args:
+            root: Directory holding the objects (created if missing)
+            compression: 'gzip', or 'zstd' (requires the zstandard package)
+            level: Compression level (default: 6 for gzip, 3 for zstd)
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"compression must be one of {COMPRESSIONS}")
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        self.root = root
+        self.compression = compression
+        self.level = level if level is not None else (6 if compression == 'gzip' else 3)
+        self._tmp = os.path.join(root, 'tmp')
+        os.makedirs(self._tmp, exist_ok=True)
+
+    def put(self, chunks: Iterable[bytes]) -> BlobInfo:
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp)
+        try:
+            with os.fdopen(fd, 'wb') as raw, self._writer(raw) as out:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            stored_size = os.path.getsize(tmp_path)
+            key = digest.hexdigest()
+            path = self._path(key, self.compression)
+            if self._find(key):
+                return BlobInfo(key, size, stored_size, self.compression, False)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Atomic: readers never see a partial object, and a racing writer of
+            # the same content just replaces it with identical bytes
+            os.replace(tmp_path, path)
+            return BlobInfo(key, size, stored_size, self.compression, True)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def open(self, key: str) -> BinaryIO:
+        found = self._find(key)
+        if found is None:
+            raise BlobNotFoundError(key)
+        path, compression = found
+        if compression == 'gzip':
+            return gzip.open(path, 'rb')
+        if zstandard is None:
+            raise ValueError(f"Blob {key} is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+
+    def exists(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def _writer(self, raw: BinaryIO):
+        if self.compression == 'gzip':
+            # mtime=0 keeps identical content byte-identical on disk
+            return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=self.level, mtime=0)
+        return zstandard.ZstdCompressor(level=self.level).stream_writer(raw, closefd=False)
+
+    def _path(self, key: str, compression: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key + EXTENSIONS[compression])
+
+    def _find(self, key: str):
+        """Return (path, compression) of a stored object, whichever compression it was written with."""
+        if len(key) != 64 or any(c not in HEX_DIGITS for c in key):
+            return None  # not a SHA-256 key; never build a path from it
+        for compression in COMPRESSIONS:
+            path = self._path(key, compression)
+            if os.path.exists(path):
+                return path, compression
+        return None
+
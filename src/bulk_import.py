@@ -0,0 +1,196 @@
+"""
+Bulk processing of exported mailboxes (a directory of .eml files, an mbox
+file or a Maildir), e.g. to backfill a term. Messages are streamed from the
+source and parsed with the stdlib email parser in a process pool; parsed
+chunks are persisted in source order through EmailProcessor.process_emails,
+one batched commit per chunk, so emails about the same assignment are
+applied in the order they appear. After each commit the number of messages
+done is written to a checkpoint file, which a rerun can resume from.
+"""
+
+import itertools
+import json
+import logging
+import mailbox
+import os
+import re
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from email import message_from_bytes, policy
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from .processor import EmailProcessor
+from .storage import Database
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+PARSE_ERROR = 'PARSE_ERROR'
+PROCESSING_ERROR = 'PROCESSING_ERROR'
+
+
+def parse_email_bytes(raw: bytes, fallback_id: str) -> Dict:
+    """
+    Parse RFC 822 bytes into keyword arguments for EmailProcessor.process_email.
+
+    Args:
+        raw: Message bytes
+        fallback_id: Used to build a stable Message-ID when the header is missing
+
+    Returns:
+        Dict with email_content, from_email, to_emails, subject, message_id
+    """
+    mime = message_from_bytes(raw, policy=policy.default)
+    body = mime.get_body(preferencelist=('plain', 'html'))
+    return {
+        'email_content': body.get_content().strip() if body is not None else "",
+        'from_email': str(mime['from'] or ''),
+        'to_emails': [str(mime['to'] or '')],
+        'subject': str(mime['subject'] or ''),
+        'message_id': str(mime['message-id'] or '').strip() or f"<{fallback_id}@bulk-import>",
+    }
+
+
+def _parse_chunk(chunk: List[Tuple[str, bytes]]) -> List[Tuple[str, Optional[Dict], Optional[str]]]:
+    """Parse (key, raw) pairs in a pool worker. Returns (key, kwargs, error) per message."""
+    parsed = []
+    for key, raw in chunk:
+        try:
+            parsed.append((key, parse_email_bytes(raw, key), None))
+        except Exception as e:
+            parsed.append((key, None, str(e)))
+    return parsed
+
+
+def iter_directory(path: str) -> Iterator[Tuple[str, bytes]]:
+    """
+    Yield (relative path, bytes) for every .eml file under a directory, in path order.
+
+    Other files (checkpoints, databases, editor temp files) and anything hidden
+    under a dot-named file or directory are skipped.
+    """
+    root = Path(path)
+    for file_path in sorted(root.rglob('*')):
+        relative = file_path.relative_to(root)
+        if (file_path.is_file() and file_path.suffix.lower() == '.eml'
+                and not any(part.startswith('.') for part in relative.parts)):
+            yield relative.as_posix(), file_path.read_bytes()
+
+
+def iter_mbox(path: str) -> Iterator[Tuple[str, bytes]]:
+    """Yield (position, bytes) for every message of an mbox file, in file order."""
+    box = mailbox.mbox(path, create=False)
+    try:
+        for key in box.iterkeys():
+            yield f"mbox-{key}", box.get_bytes(key)
+    finally:
+        box.close()
+
+
+def _delivery_order(key: str) -> List:
+    """Sort key for Maildir names like "<seconds>.M<usec>P<pid>Q<n>.<host>", comparing numbers as numbers."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', key)]
+
+
+def iter_maildir(path: str) -> Iterator[Tuple[str, bytes]]:
+    """Yield (key, bytes) for every message of a Maildir, in key (delivery time) order."""
+    box = mailbox.Maildir(path, factory=None, create=False)
+    for key in sorted(box.iterkeys(), key=_delivery_order):
+        yield key, box.get_bytes(key)
+
+
+SOURCES: Dict[str, Callable[[str], Iterator[Tuple[str, bytes]]]] = {
+    'dir': iter_directory,
+    'mbox': iter_mbox,
+    'maildir': iter_maildir,
+}
+
+
+def load_checkpoint(checkpoint_path: str, source: str) -> int:
+    """Return how many messages of source a previous run committed (0 without a checkpoint)."""
+    if not os.path.exists(checkpoint_path):
+        return 0
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('source') != os.path.abspath(source):
+        raise ValueError(f"Checkpoint {checkpoint_path} belongs to {checkpoint.get('source')}, not {source}")
+    return int(checkpoint['done'])
+
+
+def save_checkpoint(checkpoint_path: str, source: str, done: int) -> None:
+    """Atomically record that the first `done` messages of source are committed."""
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': os.path.abspath(source), 'done': done}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def process_mailbox(kind: str, source: str, processor: EmailProcessor, db: Database,
+                    workers: int = 1, batch_size: int = DEFAULT_BATCH_SIZE,
+                    checkpoint_path: Optional[str] = None, resume: bool = False) -> Dict:
+    """
+    Process every message of a mailbox export.
+
+    Args:
+        kind: 'dir', 'mbox' or 'maildir'
+        source: Path to the directory, mbox file or Maildir
+        processor: Email processor the parsed messages are persisted through
+        db: Database, used to read back each email's parse_result
+        workers: Parser processes (1 = parse in this process)
+        batch_size: Messages per parse chunk and per database commit
+        checkpoint_path: Where progress is recorded after each commit (default: none)
+        resume: Skip the messages a previous run recorded in checkpoint_path
+
+    Returns:
+        Summary with processed, skipped, elapsed_seconds, messages_per_second and
+        results (count by parse_result, without its ID suffix)
+    """
+    skipped = load_checkpoint(checkpoint_path, source) if resume and checkpoint_path else 0
+    messages = itertools.islice(SOURCES[kind](source), skipped, None)
+    chunks = iter(lambda: list(itertools.islice(messages, batch_size)), [])
+    done = skipped
+    results = Counter()
+    started = time.perf_counter()
+
+    def persist(parsed: List[Tuple[str, Optional[Dict], Optional[str]]]) -> None:
+        nonlocal done
+        batch = [kwargs for _, kwargs, _ in parsed if kwargs is not None]
+        for key, _, error in parsed:
+            if error is not None:
+                logger.error(f"Could not parse {key}: {error}")
+                results[PARSE_ERROR] += 1
+        responses = processor.process_emails(batch) if batch else []
+        parse_results = db.get_parse_results(kwargs['message_id'] for kwargs in batch)
+        for kwargs, response in zip(batch, responses):
+            if response.startswith("Error:"):
+                results[PROCESSING_ERROR] += 1
+            else:
+                results[(parse_results.get(kwargs['message_id']) or 'UNKNOWN').split(':')[0]] += 1
+        done += len(parsed)
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, source, done)
+
+    if workers <= 1:
+        for chunk in chunks:
+            persist(_parse_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Keep a bounded number of chunks in flight so memory stays flat on large exports
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(pool.submit(_parse_chunk, chunk))
+                if len(in_flight) >= 2 * workers:
+                    persist(in_flight.popleft().result())
+            while in_flight:
+                persist(in_flight.popleft().result())
+
+    elapsed = time.perf_counter() - started
+    processed = done - skipped
+    return {
+        'processed': processed,
+        'skipped': skipped,
+        'elapsed_seconds': round(elapsed, 3),
+        'messages_per_second': round(processed / elapsed, 1) if elapsed > 0 else 0.0,
+        'results': dict(results.most_common()),
+    }
@@ -0,0 +1,169 @@
+"""
+Bounded lookup cache for the email processor.
+LRU eviction with a TTL, an optional separate TTL for negative (None) results,
+and hit/miss/eviction counters, plus a poller that keeps caches in separate
+worker processes coherent through a shared per-table version counter.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+DEFAULT_MAX_SIZE = 1024
+DEFAULT_TTL_SECONDS = 300.0
+DEFAULT_NEGATIVE_TTL_SECONDS = 30.0
+DEFAULT_POLL_INTERVAL_MS = 1000
+
+
+class LookupCache:
+    """Thread-safe LRU cache with per-entry expiry."""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL_SECONDS,
+                 negative_ttl: Optional[float] = DEFAULT_NEGATIVE_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize cache.
+
+        Args:
+            max_size: Maximum number of entries before the least recently used is evicted
+            ttl: Seconds a found value stays valid
+            negative_ttl: Seconds a None result stays valid (None = same as ttl, 0 = never cache)
+            clock: Monotonic time source (injectable for tests)
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._generation = 0  # bumped on invalidation so in-flight loads don't re-cache stale values
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, calling loader() and caching its result on a miss."""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            generation = self._generation
+
+        # Load outside the lock so slow lookups don't serialize other keys
+        value = loader()
+        self.put(key, value, generation)
+        return value
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        ttl = self.negative_ttl if value is None else self.ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry if present."""
+        with self._lock:
+            self._generation += 1
+            if key in self._entries:
+                del self._entries[key]
+                self.invalidations += 1
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        """Drop every entry whose string key starts with prefix."""
+        with self._lock:
+            self._generation += 1
+            stale = [key for key in self._entries if isinstance(key, str) and key.startswith(prefix)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Return size and hit/miss/eviction counters."""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+class VersionPoller:
+    """
+    Detects writes made by other workers via a shared per-table version counter.
+
+    poll() reads the counters at most once per interval and returns the tables
+    whose version moved since the previous read, so a worker can drop just those
+    cache entries without a DB lookup per request.
+    """
+
+    def __init__(self, fetch_versions: Callable[[], Dict[str, int]],
+                 interval_ms: int = DEFAULT_POLL_INTERVAL_MS,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize poller.
+
+        Args:
+            fetch_versions: Returns the current {table: version} map (e.g. Database.get_table_versions)
+            interval_ms: Minimum milliseconds between reads of the counters
+            clock: Monotonic time source (injectable for tests)
+        """
+        self._fetch_versions = fetch_versions
+        self.interval = interval_ms / 1000.0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._versions: Optional[Dict[str, int]] = None
+        self._next_poll_at = 0.0
+        self.polls = 0
+
+    def poll(self) -> Set[str]:
+        """Return the tables changed since the last poll (empty if not yet due)."""
+        now = self._clock()
+        with self._lock:
+            if now < self._next_poll_at:
+                return set()
+            self._next_poll_at = now + self.interval
+            previous = self._versions
+
+        current = self._fetch_versions()
+        with self._lock:
+            self._versions = current
+            self.polls += 1
+        if previous is None:
+            # First read only establishes the baseline
+            return set()
+        return {table for table in set(current) | set(previous) if current.get(table) != previous.get(table)}
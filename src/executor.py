@@ -0,0 +1,200 @@
+"""
+Bounded thread pools for running blocking work from async endpoints.
+Database and EmailProcessor calls are synchronous; running them on the event
+loop serializes every request behind each SQL round trip. Endpoints await
+BlockingExecutor.run() instead, which hands the call to a named pool and keeps
+per-pool metrics. KeyedExecutor is the thread-side counterpart for batch work
+that must stay ordered per key (e.g. per email sender).
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when a pool already has its maximum of running plus queued calls."""
+
+
+class BlockingExecutor:
+    """Named, bounded thread pool with in-flight limits and timing metrics."""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        """
+        Initialize executor.
+
+        Args:
+            name: Pool name used in thread names and metrics
+            max_workers: Number of worker threads
+            max_queue: Calls allowed to wait for a free worker before new calls are rejected
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.peak_in_flight = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) on the pool and await its result.
+
+        Raises:
+            ExecutorSaturatedError: If max_workers + max_queue calls are already in flight
+        """
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturatedError(f"{self.name} pool is saturated")
+            self._in_flight += 1
+            self.submitted += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+
+        enqueued_at = time.perf_counter()
+        try:
+            future = self._pool.submit(self._timed_call, enqueued_at, functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # The slot is held until the call itself finishes (or is cancelled before starting),
+        # not until this coroutine stops awaiting it: a cancelled request's call keeps running
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future: Optional[Future] = None) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _timed_call(self, enqueued_at: float, call: Callable) -> Any:
+        started_at = time.perf_counter()
+        wait = started_at - enqueued_at
+        with self._lock:
+            self._active += 1
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        try:
+            result = call()
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._active -= 1
+                self.completed += 1
+                self.total_run_seconds += time.perf_counter() - started_at
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool size, queue depth and timing counters."""
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                'name': self.name,
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'active': self._active,
+                'queued': self._in_flight - self._active,
+                'peak_in_flight': self.peak_in_flight,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'avg_wait_ms': round(self.total_wait_seconds / completed * 1000, 3),
+                'max_wait_ms': round(self.max_wait_seconds * 1000, 3),
+                'avg_run_ms': round(self.total_run_seconds / completed * 1000, 3),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work and release the worker threads."""
+        self._pool.shutdown(wait=wait)
+
+
+class KeyedExecutor:
+    """
+    Thread pool that orders tasks by key: a task starts only after every
+    earlier task sharing any of its keys has finished, while unrelated tasks
+    run in parallel. submit() blocks once max_in_flight tasks are queued or
+    running, so producers can't run ahead.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_in_flight: int):
+        """
+        Initialize executor.
+
+        Args:
+            name: Pool name used in thread names
+            max_workers: Number of worker threads
+            max_in_flight: Tasks allowed to be queued or running before submit() blocks
+        """
+        if max_workers < 1 or max_in_flight < 1:
+            raise ValueError("max_workers and max_in_flight must be at least 1")
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._last: Dict[Hashable, Future] = {}  # key -> most recently submitted task holding it
+
+    def submit(self, keys: Iterable[Hashable], fn: Callable, *args, **kwargs) -> Future:
+        """Schedule fn(*args, **kwargs) to run after all earlier tasks sharing a key with it."""
+        keys = tuple(keys)
+        self._slots.acquire()
+        future: Future = Future()
+        call = functools.partial(fn, *args, **kwargs)
+        with self._lock:
+            predecessors = {self._last[key] for key in keys if key in self._last}
+            for key in keys:
+                self._last[key] = future
+            remaining = [len(predecessors)]
+
+        if not predecessors:
+            self._pool.submit(self._run, keys, future, call)
+            return future
+
+        def on_predecessor_done(_):
+            with self._lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                self._pool.submit(self._run, keys, future, call)
+
+        for predecessor in predecessors:
+            predecessor.add_done_callback(on_predecessor_done)
+        return future
+
+    def _run(self, keys: tuple, future: Future, call: Callable) -> None:
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(call())
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            with self._lock:
+                for key in keys:
+                    if self._last.get(key) is future:
+                        del self._last[key]
+            self._slots.release()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work and release the worker threads."""
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self) -> "KeyedExecutor":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
@@ -6,27 +6,51 @@ Handles Gmail watch, fetching messages, and storing raw MIME.
 import base64
 import logging
 import os
-from typing import Optional, Dict, List
-from email import message_from_bytes
+import threading
+from typing import Callable, Optional, Dict, List, Iterable, Iterator, Tuple
+from email import message_from_bytes, policy
+from email.mime.text import MIMEText
+import google_auth_httplib2
+import httplib2
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from .rate_limit import QuotaLimiter, is_retryable
 
 logger = logging.getLogger(__name__)
 
+# Gmail accepts at most 100 calls per batch HTTP request but recommends 50 to avoid rate limiting
+MAX_BATCH_SIZE = 100
+DEFAULT_BATCH_SIZE = 50
+HISTORY_PAGE_SIZE = 500  # history.list maximum
+
+
+class HistoryExpiredError(Exception):
+    """The requested startHistoryId is older than Gmail retains; a full resync is needed."""
+
 
 class GmailClient:
     """Client for interacting with Gmail API."""
     
-    def __init__(self, credentials_path: Optional[str] = None, user_email: Optional[str] = None):
+    def __init__(self, credentials_path: Optional[str] = None, user_email: Optional[str] = None, service=None,
+                 limiter: Optional[QuotaLimiter] = None):
         """
         Initialize Gmail client.
         
         Args:
             credentials_path: Path to service account JSON key file
             user_email: Email address to impersonate (for domain-wide delegation)
+            service: Prebuilt Gmail service resource (e.g. gmail_fake.FakeGmailService); skips credentials
+            limiter: Quota limiter shared by every call to this mailbox (default: Gmail's per-user quota)
         """
         self.user_email = user_email or os.getenv('GMAIL_USER_EMAIL')
+        self.limiter = limiter or QuotaLimiter()
+        
+        self._credentials = None
+        self._local = threading.local()
+        if service is not None:
+            self.service = service
+            return
         
         # Load credentials
         creds_path = credentials_path or os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
@@ -51,6 +75,7 @@ class GmailClient:
             if self.user_email:
                 credentials = credentials.with_subject(self.user_email)
             
+            self._credentials = credentials
             self.service = build('gmail', 'v1', credentials=credentials)
             logger.info(f"Gmail client initialized for user: {self.user_email}")
             
@@ -58,6 +83,28 @@ class GmailClient:
             logger.error(f"Failed to initialize Gmail client: {e}")
             raise
     
+    def _http(self):
+        """
+        Return this thread's authorized transport (None for an injected service).
+        
+        httplib2 connections are not thread-safe, so each thread making calls
+        gets its own instead of sharing the one built into self.service.
+        """
+        if self._credentials is None:
+            return None
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = google_auth_httplib2.AuthorizedHttp(self._credentials, http=httplib2.Http())
+        return http
+    
+    def _execute(self, method: str, request, idempotent: bool = True) -> Dict:
+        """Execute a request under the quota limiter, retrying throttled and transient errors."""
+        return self.limiter.call(method, lambda: request.execute(http=self._http()), idempotent=idempotent)
+    
+    def stats(self) -> Dict:
+        """Return quota, throttling and retry counters."""
+        return self.limiter.stats()
+    
     def setup_watch(self, topic_name: str, label_ids: List[str] = None) -> Dict:
         """
         Set up Gmail push notifications via Pub/Sub.
@@ -75,10 +122,10 @@ class GmailClient:
                 'labelIds': label_ids or ['INBOX']
             }
             
-            response = self.service.users().watch(
+            response = self._execute('watch', self.service.users().watch(
                 userId='me',
                 body=request_body
-            ).execute()
+            ))
             
             logger.info(f"Gmail watch established: {response}")
             return response
@@ -99,11 +146,11 @@ class GmailClient:
             Message data including headers, body, attachments
         """
         try:
-            message = self.service.users().messages().get(
+            message = self._execute('messages.get', self.service.users().messages().get(
                 userId='me',
                 id=message_id,
                 format=format
-            ).execute()
+            ))
             
             logger.info(f"Fetched message {message_id}")
             return message
@@ -112,6 +159,88 @@ class GmailClient:
             logger.error(f"Failed to fetch message {message_id}: {e}")
             raise
     
+    def get_messages_batch(self, message_ids: Iterable[str], format: str = 'raw',
+                           batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Tuple[str, Optional[Dict], Optional[Exception]]]:
+        """
+        Fetch many messages through the Gmail batch endpoint.
+        
+        Each chunk of batch_size ids is one HTTP round trip. Results are yielded
+        as each chunk completes, so callers can process them before the next chunk
+        is fetched.
+        
+        Args:
+            message_ids: Gmail message IDs (duplicates are fetched once)
+            format: Response format (minimal, full, raw, metadata)
+            batch_size: Calls per batch request (1-100)
+        
+        Yields:
+            (message_id, message, error) with exactly one of message/error set
+        """
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"batch_size must be between 1 and {MAX_BATCH_SIZE}")
+        
+        ids = list(dict.fromkeys(message_ids))
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            results = self._execute_batch('messages.get', chunk, lambda message_id: (
+                self.service.users().messages().get(userId='me', id=message_id, format=format)
+            ))
+            
+            logger.info(f"Fetched batch of {len(chunk)} messages")
+            for message_id in chunk:
+                response, exception = results.get(message_id, (None, None))
+                if exception is None and response is None:
+                    exception = ConnectionError(f"No response for message {message_id} in batch")
+                if exception is not None:
+                    logger.error(f"Failed to fetch message {message_id}: {exception}")
+                yield message_id, response, exception
+    
+    def _execute_batch(self, method: str, keys: List[str], build_request: Callable[[str], object],
+                       idempotent: bool = True) -> Dict[str, Tuple[Optional[Dict], Optional[Exception]]]:
+        """
+        Execute one batch request, re-batching calls that were throttled.
+        
+        Gmail rate-limits the calls inside a batch individually, so a batch can
+        succeed while some of its calls return 429; only those are sent again.
+        
+        Args:
+            method: Gmail method name of every call, for quota costing
+            keys: Request IDs, one call each
+            build_request: Builds the API request for a key
+            idempotent: Whether calls failing with 5xx may be retried (False for sends)
+        
+        Returns:
+            {key: (response, error)} for every key that got a response
+        """
+        results = {}
+        pending = keys
+        attempt = 0
+        while True:
+            def on_response(request_id, response, exception):
+                results[request_id] = (response, exception)
+            
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for key in pending:
+                batch.add(build_request(key), request_id=key)
+            
+            try:
+                self.limiter.call(method, lambda: batch.execute(http=self._http()),
+                                  idempotent=idempotent, count=len(pending))
+            except HttpError as e:
+                logger.error(f"Failed to execute batch of {len(pending)} {method} calls: {e}")
+                raise
+            
+            retry = [key for key in pending if is_retryable(results.get(key, (None, None))[1], idempotent)]
+            if not retry:
+                return results
+            if attempt >= self.limiter.max_retries:
+                for _ in retry:
+                    self.limiter.give_up()
+                return results
+            attempt += 1
+            self.limiter.backoff(attempt, results[retry[0]][1])
+            pending = retry
+    
     def get_raw_message(self, message_id: str) -> bytes:
         """
         Fetch raw MIME content of a message.
@@ -123,11 +252,11 @@ class GmailClient:
             Raw MIME bytes
         """
         try:
-            message = self.service.users().messages().get(
+            message = self._execute('messages.get', self.service.users().messages().get(
                 userId='me',
                 id=message_id,
                 format='raw'
-            ).execute()
+            ))
             
             # Decode base64url encoded raw message
             raw_bytes = base64.urlsafe_b64decode(message['raw'])
@@ -146,7 +275,7 @@ class GmailClient:
             message_data: Gmail API message response
         
         Returns:
-            Parsed message with from, to, subject, body
+            Parsed message with from, to, subject, body, label_ids, auto_submitted
         """
         headers = message_data.get('payload', {}).get('headers', [])
         
@@ -158,7 +287,9 @@ class GmailClient:
             'to': None,
             'subject': None,
             'date': None,
-            'body': None
+            'body': None,
+            'label_ids': message_data.get('labelIds', []),
+            'auto_submitted': None
         }
         
         for header in headers:
@@ -175,12 +306,67 @@ class GmailClient:
                 parsed['date'] = value
             elif name == 'message-id':
                 parsed['email_message_id'] = value
+            elif name == 'auto-submitted':
+                parsed['auto_submitted'] = value
         
         # Extract body
         parsed['body'] = self._extract_body(message_data.get('payload', {}))
         
         return parsed
     
+    def parse_raw_message(self, message_data: Dict, raw_mime: bytes) -> Dict:
+        """
+        Parse a format='raw' Gmail message locally into the same structure as parse_message.
+        
+        Args:
+            message_data: Gmail API message response fetched with format='raw'
+            raw_mime: Decoded raw MIME bytes from message_data['raw']
+        
+        Returns:
+            Parsed message with from, to, subject, body, label_ids, auto_submitted
+        """
+        mime = message_from_bytes(raw_mime, policy=policy.default)
+        
+        parsed = {
+            'message_id': message_data.get('id'),
+            'thread_id': message_data.get('threadId'),
+            'from': self._header(mime, 'from'),
+            'to': self._header(mime, 'to'),
+            'subject': self._header(mime, 'subject'),
+            'date': self._header(mime, 'date'),
+            'body': self._extract_mime_body(mime)
+        }
+        if 'message-id' in mime:
+            parsed['email_message_id'] = self._header(mime, 'message-id')
+        # Used to recognise the mailbox's own replies and other automatic mail
+        parsed['label_ids'] = message_data.get('labelIds', [])
+        parsed['auto_submitted'] = self._header(mime, 'auto-submitted')
+        
+        return parsed
+    
+    @staticmethod
+    def _header(mime, name: str) -> Optional[str]:
+        """Return a header as a decoded string, or None if absent."""
+        value = mime[name]
+        return str(value) if value is not None else None
+    
+    def _extract_mime_body(self, mime) -> str:
+        """Extract text body from a parsed MIME message, preferring text/plain over text/html."""
+        html = None
+        for part in mime.walk():
+            if part.is_multipart() or part.get_content_disposition() == 'attachment':
+                continue
+            content_type = part.get_content_type()
+            if content_type not in ('text/plain', 'text/html'):
+                continue
+            payload = part.get_payload(decode=True) or b''
+            text = payload.decode(part.get_content_charset() or 'utf-8', errors='ignore')
+            if content_type == 'text/plain':
+                return text.strip()
+            if html is None:
+                html = text
+        return (html or "").strip()
+    
     def _extract_body(self, payload: Dict) -> str:
         """Extract text body from message payload."""
         body = ""
@@ -204,34 +390,92 @@ class GmailClient:
     
     def list_history(self, start_history_id: str, max_results: int = 100) -> List[Dict]:
         """
-        List message history changes since a given history ID.
+        List message history changes since a given history ID, following every page.
         
         Args:
             start_history_id: History ID to start from
-            max_results: Maximum number of results
+            max_results: Records per page
         
         Returns:
-            List of history records
+            List of history records (empty if the history ID has expired)
         """
         try:
-            response = self.service.users().history().list(
-                userId='me',
-                startHistoryId=start_history_id,
-                maxResults=max_results,
-                historyTypes=['messageAdded']
-            ).execute()
+            return [
+                record
+                for page in self.list_history_pages(start_history_id, page_size=max_results)
+                for record in page.get('history', [])
+            ]
+        except HistoryExpiredError:
+            return []
+    
+    def list_history_pages(self, start_history_id: str, page_size: int = HISTORY_PAGE_SIZE) -> Iterator[Dict]:
+        """
+        Yield history.list responses page by page, following nextPageToken.
+        
+        Each page carries 'history' (possibly absent) and the mailbox's current 'historyId'.
+        
+        Raises:
+            HistoryExpiredError: If start_history_id is too old (HTTP 404)
+        """
+        page_token = None
+        while True:
+            try:
+                response = self._execute('history.list', self.service.users().history().list(
+                    userId='me',
+                    startHistoryId=start_history_id,
+                    maxResults=page_size,
+                    historyTypes=['messageAdded'],
+                    pageToken=page_token
+                ))
+            except HttpError as e:
+                if e.resp.status == 404:
+                    # History ID not found (too old), need full sync
+                    logger.warning(f"History ID {start_history_id} not found")
+                    raise HistoryExpiredError(start_history_id) from e
+                logger.error(f"Failed to list history: {e}")
+                raise
             
-            return response.get('history', [])
+            yield response
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return
+    
+    def list_message_ids(self, query: str, page_size: int = HISTORY_PAGE_SIZE) -> Iterator[List[str]]:
+        """
+        Yield pages of message IDs matching a Gmail search query (newest first).
+        
+        Args:
+            query: Gmail search query, e.g. 'after:1736899200'
+            page_size: IDs per page (max 500)
+        """
+        page_token = None
+        while True:
+            try:
+                response = self._execute('messages.list', self.service.users().messages().list(
+                    userId='me',
+                    q=query,
+                    maxResults=page_size,
+                    pageToken=page_token
+                ))
+            except HttpError as e:
+                logger.error(f"Failed to list messages for {query!r}: {e}")
+                raise
             
+            yield [message['id'] for message in response.get('messages', [])]
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return
+    
+    def get_profile(self) -> Dict:
+        """Fetch the mailbox profile (emailAddress, historyId, messagesTotal)."""
+        try:
+            return self._execute('getProfile', self.service.users().getProfile(userId='me'))
         except HttpError as e:
-            if e.resp.status == 404:
-                # History ID not found (too old), need full sync
-                logger.warning(f"History ID {start_history_id} not found")
-                return []
-            logger.error(f"Failed to list history: {e}")
+            logger.error(f"Failed to fetch profile: {e}")
             raise
     
-    def send_message(self, to: str, subject: str, body: str, from_email: Optional[str] = None) -> Dict:
+    def send_message(self, to: str, subject: str, body: str, from_email: Optional[str] = None,
+                     in_reply_to: Optional[str] = None) -> Dict:
         """
         Send an email message.
         
@@ -240,27 +484,17 @@ class GmailClient:
             subject: Email subject
             body: Email body (plain text)
             from_email: Optional from address
+            in_reply_to: Message-ID being answered, so the reply threads with it
         
         Returns:
             Sent message data
         """
         try:
-            # Create MIME message
-            from email.mime.text import MIMEText
-            
-            message = MIMEText(body)
-            message['to'] = to
-            message['subject'] = subject
-            if from_email:
-                message['from'] = from_email
-            
-            # Encode message
-            raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
-            
-            response = self.service.users().messages().send(
+            # Not idempotent: only throttling rejections are retried, never 5xx
+            response = self._execute('messages.send', self.service.users().messages().send(
                 userId='me',
-                body={'raw': raw}
-            ).execute()
+                body=self.build_message(to, subject, body, from_email, in_reply_to)
+            ), idempotent=False)
             
             logger.info(f"Sent message to {to}: {response.get('id')}")
             return response
@@ -268,4 +502,43 @@ class GmailClient:
         except HttpError as e:
             logger.error(f"Failed to send message: {e}")
             raise
-
+    
+    def send_messages_batch(self, messages: Dict[str, Dict]) -> Dict[str, Tuple[Optional[Dict], Optional[Exception]]]:
+        """
+        Send several messages in one batch request.
+        
+        Args:
+            messages: {key: keyword arguments of build_message} (at most MAX_BATCH_SIZE)
+        
+        Returns:
+            {key: (response, error)} with exactly one of response/error set
+        """
+        if len(messages) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} messages per batch")
+        results = self._execute_batch('messages.send', list(messages), lambda key: (
+            self.service.users().messages().send(userId='me', body=self.build_message(**messages[key]))
+        ), idempotent=False)
+        
+        logger.info(f"Sent batch of {len(messages)} messages")
+        for key in messages:
+            response, exception = results.get(key, (None, None))
+            if exception is None and response is None:
+                results[key] = (None, ConnectionError(f"No response for message {key} in batch"))
+            elif exception is not None:
+                logger.error(f"Failed to send message {key}: {exception}")
+        return results
+    
+    @staticmethod
+    def build_message(to: str, subject: str, body: str, from_email: Optional[str] = None,
+                      in_reply_to: Optional[str] = None) -> Dict:
+        """Build the messages.send body for a plain-text email."""
+        message = MIMEText(body)
+        message['to'] = to
+        message['subject'] = subject
+        if from_email:
+            message['from'] = from_email
+        if in_reply_to:
+            message['In-Reply-To'] = in_reply_to
+            message['References'] = in_reply_to
+        
+        return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
@@ -0,0 +1,314 @@
+"""
+In-process stand-in for the Gmail API service resource.
+Implements the subset of the discovery client that GmailClient uses, so the
+client and GmailIngestionService can be exercised without a Google account:
+pass FakeGmailService() as GmailClient(service=...). Round trips can be given
+network latency and random failures for load testing.
+"""
+
+import base64
+import itertools
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import Callable, Deque, Dict, List, Optional, Union
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+def http_error(status: int, reason: str = "", retry_after: Optional[float] = None) -> HttpError:
+    """Build the HttpError the discovery client raises for a failed call."""
+    headers = {'status': status}
+    if retry_after is not None:
+        headers['retry-after'] = str(retry_after)
+    resp = httplib2.Response(headers)
+    resp.reason = reason
+    return HttpError(resp, reason.encode('utf-8'))
+
+
+class FakeRequest:
+    """A prepared API call; execute() is one HTTP round trip."""
+
+    def __init__(self, service: "FakeGmailService", method: str, handler: Callable[[], Dict]):
+        self._service = service
+        self.method = method
+        self._handler = handler
+
+    def execute(self, http=None, num_retries: int = 0) -> Dict:
+        self._service._record_round_trip()
+        self._service._raise_random_error()
+        return self._call()
+
+    def _call(self) -> Dict:
+        self._service._record_call(self.method)
+        return self._handler()
+
+
+class FakeBatchHttpRequest:
+    """Batch of calls executed in one round trip, like googleapiclient.http.BatchHttpRequest."""
+
+    def __init__(self, service: "FakeGmailService", callback: Optional[Callable] = None):
+        self._service = service
+        self._callback = callback
+        self._requests: Dict[str, tuple] = {}
+        self._ids = itertools.count()
+
+    def add(self, request: FakeRequest, callback: Optional[Callable] = None, request_id: Optional[str] = None) -> None:
+        if request_id is None:
+            request_id = str(next(self._ids))
+        if request_id in self._requests:
+            raise KeyError(f'A request with this ID already exists: {request_id}')
+        self._requests[request_id] = (request, callback)
+
+    def execute(self, http=None) -> None:
+        self._service._record_round_trip()
+        self._service._raise_injected('batch')
+        for request_id, (request, callback) in self._requests.items():
+            response, exception = None, None
+            try:
+                self._service._raise_random_error()
+                response = request._call()
+            except HttpError as e:
+                exception = e
+            for cb in (callback, self._callback):
+                if cb is not None:
+                    cb(request_id, response, exception)
+
+
+class FakeGmailService:
+    """Mailbox held in memory, exposing users().messages(), users().history(), watch() and getProfile()."""
+
+    def __init__(self, latency: Union[float, Callable[[], float]] = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, seed: Optional[int] = None):
+        """
+        Initialize service.
+
+        Args:
+            latency: Seconds each round trip (single call or whole batch) takes, or a
+                callable returning them, e.g. lambda: random.uniform(0.02, 0.08)
+            error_rate: Probability that any call fails with error_status
+            error_status: HTTP status of random failures (503 and 429 are retried by GmailClient)
+            seed: Seed for the random failures
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._messages: Dict[str, Dict] = {}
+        self._history: List[Dict] = []
+        self._history_id = 1000
+        self._history_floor = 0  # history.list with an older startHistoryId returns 404
+        self._message_ids = itertools.count(1)
+        self.sent: List[Dict] = []  # messages.send calls: {'id', 'raw'} with raw MIME bytes; also in the mailbox
+        self.watch_request: Optional[Dict] = None  # body of the last users().watch() call
+        self._injected: Dict[str, Deque[HttpError]] = defaultdict(deque)
+        self.calls: Counter = Counter()  # method name -> calls, batched or not
+        self.round_trips = 0
+
+    @property
+    def history_id(self) -> str:
+        """Current mailbox historyId."""
+        return str(self._history_id)
+
+    def add_message(self, raw_mime: bytes, thread_id: Optional[str] = None,
+                    internal_date: Optional[float] = None) -> str:
+        """
+        Deliver a message and record it in history. Returns its Gmail message ID.
+
+        Args:
+            raw_mime: RFC 822 message bytes
+            thread_id: Gmail thread ID (default: the message ID)
+            internal_date: Receipt time as epoch seconds (default: now)
+        """
+        with self._lock:
+            return self._add(raw_mime, ['INBOX', 'UNREAD'], thread_id, internal_date)
+
+    def _add(self, raw_mime: bytes, label_ids: List[str], thread_id: Optional[str] = None,
+             internal_date: Optional[float] = None) -> str:
+        """Store a message and its messagesAdded history record; the caller holds the lock."""
+        message_id = f"{next(self._message_ids):016x}"
+        self._history_id += 1
+        self._messages[message_id] = {
+            'id': message_id,
+            'threadId': thread_id or message_id,
+            'labelIds': label_ids,
+            'historyId': str(self._history_id),
+            'internalDate': str(int((time.time() if internal_date is None else internal_date) * 1000)),
+            'raw': raw_mime,
+        }
+        self._history.append({
+            'id': str(self._history_id),
+            'messagesAdded': [{'message': {'id': message_id, 'threadId': thread_id or message_id,
+                                           'labelIds': label_ids}}],
+        })
+        return message_id
+
+    def delete_message(self, message_id: str) -> None:
+        """Remove a message; later messages.get calls for it return 404."""
+        with self._lock:
+            self._messages.pop(message_id, None)
+
+    def expire_history(self) -> None:
+        """Drop all history so far; history.list from any ID up to now then returns 404 like Gmail."""
+        with self._lock:
+            self._history.clear()
+            self._history_floor = self._history_id + 1
+
+    def inject_errors(self, method: str, status: int = 429, count: int = 1,
+                      retry_after: Optional[float] = None, reason: str = 'Too Many Requests') -> None:
+        """
+        Make the next `count` calls to `method` fail with an HTTP error.
+
+        Args:
+            method: Method name as counted in `calls` (e.g. 'messages.get'), or 'batch'
+                to fail whole batch requests
+            status: HTTP status to return (429 for rate limiting)
+            count: Number of calls to fail
+            retry_after: Retry-After header value in seconds
+            reason: Error reason/content (e.g. 'userRateLimitExceeded' with status 403)
+        """
+        with self._lock:
+            for _ in range(count):
+                self._injected[method].append(http_error(status, reason, retry_after))
+
+    def users(self) -> "_Users":
+        return _Users(self)
+
+    def new_batch_http_request(self, callback: Optional[Callable] = None) -> FakeBatchHttpRequest:
+        return FakeBatchHttpRequest(self, callback)
+
+    def _record_round_trip(self) -> None:
+        with self._lock:
+            self.round_trips += 1
+        delay = self.latency() if callable(self.latency) else self.latency
+        if delay > 0:
+            time.sleep(delay)
+
+    def _raise_random_error(self) -> None:
+        if self.error_rate <= 0:
+            return
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise http_error(self.error_status, 'Injected failure')
+
+    def _record_call(self, method: str) -> None:
+        with self._lock:
+            self.calls[method] += 1
+        self._raise_injected(method)
+
+    def _raise_injected(self, method: str) -> None:
+        with self._lock:
+            errors = self._injected.get(method)
+            error = errors.popleft() if errors else None
+        if error is not None:
+            raise error
+
+    def _get_message(self, message_id: str, format: str) -> Dict:
+        message = self._messages.get(message_id)
+        if message is None:
+            raise http_error(404, 'Requested entity was not found.')
+        result = {'id': message['id'], 'threadId': message['threadId'], 'labelIds': message['labelIds'],
+                  'historyId': message['historyId'], 'internalDate': message['internalDate']}
+        if format == 'raw':
+            result['raw'] = base64.urlsafe_b64encode(message['raw']).decode('ascii')
+        elif format != 'minimal':
+            raise ValueError(f"FakeGmailService does not support format={format!r}")
+        return result
+
+    def _list_history(self, start_history_id: str, max_results: int, page_token: Optional[str]) -> Dict:
+        if int(start_history_id) < self._history_floor:
+            raise http_error(404, 'Requested entity was not found.')
+        records = [record for record in self._history if int(record['id']) > int(start_history_id)]
+        offset = int(page_token or 0)
+        page = records[offset:offset + max_results]
+        response = {'historyId': self.history_id}
+        if page:
+            response['history'] = page
+        if offset + max_results < len(records):
+            response['nextPageToken'] = str(offset + max_results)
+        return response
+
+    def _list_messages(self, query: Optional[str], max_results: int, page_token: Optional[str]) -> Dict:
+        after_ms = 0
+        for term in (query or '').split():
+            if term.startswith('after:'):
+                after_ms = int(term[len('after:'):]) * 1000
+            else:
+                raise ValueError(f"FakeGmailService only supports 'after:' queries, got {term!r}")
+        # Newest first, like Gmail
+        matches = [
+            {'id': message['id'], 'threadId': message['threadId']}
+            for message in reversed(list(self._messages.values()))
+            if int(message['internalDate']) > after_ms
+        ]
+        offset = int(page_token or 0)
+        response = {'resultSizeEstimate': len(matches)}
+        if matches[offset:offset + max_results]:
+            response['messages'] = matches[offset:offset + max_results]
+        if offset + max_results < len(matches):
+            response['nextPageToken'] = str(offset + max_results)
+        return response
+
+    def _send(self, body: Dict) -> Dict:
+        # Like Gmail, sent mail lands in the mailbox and its history, labelled SENT
+        raw_mime = base64.urlsafe_b64decode(body['raw'])
+        with self._lock:
+            message_id = self._add(raw_mime, ['SENT'])
+            self.sent.append({'id': message_id, 'raw': raw_mime})
+        return {'id': message_id, 'threadId': message_id, 'labelIds': ['SENT']}
+
+    def _watch(self, body: Dict) -> Dict:
+        with self._lock:
+            self.watch_request = body
+        expiration_ms = int((time.time() + 7 * 24 * 3600) * 1000)  # Gmail watches last 7 days
+        return {'historyId': self.history_id, 'expiration': str(expiration_ms)}
+
+    def _profile(self) -> Dict:
+        return {'emailAddress': 'me', 'messagesTotal': len(self._messages), 'historyId': self.history_id}
+
+
+class _Users:
+    def __init__(self, service: FakeGmailService):
+        self._service = service
+
+    def messages(self) -> "_Messages":
+        return _Messages(self._service)
+
+    def getProfile(self, userId: str) -> FakeRequest:
+        return FakeRequest(self._service, 'getProfile', self._service._profile)
+
+    def watch(self, userId: str, body: Dict) -> FakeRequest:
+        return FakeRequest(self._service, 'watch', lambda: self._service._watch(body))
+
+    def history(self) -> "_History":
+        return _History(self._service)
+
+
+class _Messages:
+    def __init__(self, service: FakeGmailService):
+        self._service = service
+
+    def get(self, userId: str, id: str, format: str = 'full') -> FakeRequest:
+        return FakeRequest(self._service, 'messages.get', lambda: self._service._get_message(id, format))
+
+    def list(self, userId: str, q: Optional[str] = None, maxResults: int = 100,
+             pageToken: Optional[str] = None) -> FakeRequest:
+        return FakeRequest(self._service, 'messages.list',
+                           lambda: self._service._list_messages(q, maxResults, pageToken))
+
+    def send(self, userId: str, body: Dict) -> FakeRequest:
+        return FakeRequest(self._service, 'messages.send', lambda: self._service._send(body))
+
+
+class _History:
+    def __init__(self, service: FakeGmailService):
+        self._service = service
+
+    def list(self, userId: str, startHistoryId: str, maxResults: int = 100,
+             historyTypes: Optional[List[str]] = None, pageToken: Optional[str] = None) -> FakeRequest:
+        return FakeRequest(self._service, 'history.list',
+                           lambda: self._service._list_history(startHistoryId, maxResults, pageToken))
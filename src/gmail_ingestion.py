@@ -7,19 +7,64 @@ import base64
 import json
 import logging
 import hashlib
-from typing import Dict, Optional
-from datetime import datetime
-from .gmail_client import GmailClient
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parseaddr
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from googleapiclient.errors import HttpError
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+from .blob_store import BlobStore, archive_raw_mime, iter_chunks
+from .executor import KeyedExecutor
+from .parser import tokenize_email, assignment_code_of
+from .gmail_client import GmailClient, HistoryExpiredError, DEFAULT_BATCH_SIZE, HISTORY_PAGE_SIZE
 from .processor import EmailProcessor
 from .storage import Database
+from .idempotency import ProcessedMessageStore
+from .rate_limit import is_retryable
 
 logger = logging.getLogger(__name__)
 
+# Without a checkpoint timestamp, a resync looks back this far
+DEFAULT_RESYNC_LOOKBACK = timedelta(days=1)
+# Resyncs start this long before the last checkpoint; already-processed messages are skipped
+RESYNC_OVERLAP = timedelta(hours=1)
+
+
+def ordering_keys(from_header: Optional[str], subject: Optional[str], body: Optional[str]) -> Tuple[str, ...]:
+    """
+    KeyedExecutor keys for an email: a sender's emails stay in order, and so do all
+    emails about one assignment (so a SUBMIT can't overtake the ASSIGN that creates it).
+    """
+    sender = parseaddr(from_header or '')[1].lower()
+    assignment_code = assignment_code_of(tokenize_email(body or '', subject or ''))
+    return tuple(key for key in (
+        f"sender:{sender}" if sender else None,
+        f"assignment:{assignment_code}" if assignment_code else None,
+    ) if key)
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Whether a message that failed with this error may succeed on a later sync:
+    Gmail throttling or 5xx, a dropped connection, or a busy database. Anything
+    else (a 404, unparseable MIME, an IntegrityError or ValueError from the
+    handler) fails the same way every time.
+    """
+    if isinstance(error, HttpError):
+        return is_retryable(error)
+    return isinstance(error, (OperationalError, InterfaceError, PoolTimeoutError, OSError))
+
 
 class GmailIngestionService:
     """Service for ingesting emails from Gmail via Pub/Sub notifications."""
     
-    def __init__(self, gmail_client: GmailClient, db: Database, processor: EmailProcessor):
+    def __init__(self, gmail_client: GmailClient, db: Database, processor: EmailProcessor,
+                 fetch_batch_size: int = DEFAULT_BATCH_SIZE, history_page_size: int = HISTORY_PAGE_SIZE,
+                 resync_lookback: timedelta = DEFAULT_RESYNC_LOOKBACK,
+                 processed_store: Optional[ProcessedMessageStore] = None,
+                 workers: int = 1, max_in_flight: Optional[int] = None, blob_store: Optional[BlobStore] = None,
+                 enqueue_replies: bool = False):
         """
         Initialize ingestion service.
         
@@ -27,16 +72,39 @@ class GmailIngestionService:
             gmail_client: Gmail API client
             db: Database instance
             processor: Email processor
+            fetch_batch_size: Messages fetched per Gmail batch request in process_history
+            history_page_size: History records requested per history.list page
+            resync_lookback: How far back a full resync reaches when no checkpoint exists
+            processed_store: Idempotency store shared across instances (default: backed by db)
+            workers: Threads fetching and processing messages in parallel (1 = sequential).
+                Messages from the same sender, or about the same assignment, are
+                always processed in arrival order.
+            max_in_flight: Fetched messages allowed to wait for or be in processing
+                (default: 2 * fetch_batch_size)
+            blob_store: Where raw MIME is archived, keyed by checksum (default: not archived)
+            enqueue_replies: Queue a reply in the outbox for each command processed
         """
         self.gmail = gmail_client
         self.db = db
         self.processor = processor
-        self.processed_messages = set()  # Simple in-memory dedup (use Redis/DB in prod)
+        self.fetch_batch_size = fetch_batch_size
+        self.history_page_size = history_page_size
+        self.resync_lookback = resync_lookback
+        self.mailbox = gmail_client.user_email or 'me'
+        self.processed = processed_store or ProcessedMessageStore(db)
+        self.queue = None  # IngestionQueue; when set, notifications are queued instead of processed inline
+        self.workers = workers
+        self.max_in_flight = max_in_flight or 2 * fetch_batch_size
+        self.blob_store = blob_store
+        self.enqueue_replies = enqueue_replies
     
     def handle_pubsub_notification(self, pubsub_message: Dict) -> Dict:
         """
         Handle incoming Pub/Sub push notification from Gmail.
         
+        With a queue attached, the notification is only recorded for the
+        background workers; a failure to record it raises so Pub/Sub redelivers.
+        
         Args:
             pubsub_message: Pub/Sub message payload
         
@@ -65,58 +133,232 @@ class GmailIngestionService:
                 logger.warning("No historyId in notification")
                 return {'status': 'ignored', 'reason': 'no_history_id'}
             
-            # Fetch new messages from history
-            return self.process_history(history_id)
+            if self.queue is None:
+                # Fetch new messages from history
+                return self.process_history(history_id)
             
         except Exception as e:
             logger.error(f"Error handling Pub/Sub notification: {e}", exc_info=True)
             return {'status': 'error', 'error': str(e)}
+        
+        queued = self.queue.enqueue(self.mailbox, str(history_id))
+        return {'status': 'queued' if queued else 'coalesced', 'history_id': str(history_id)}
     
-    def process_history(self, start_history_id: str) -> Dict:
+    def process_history(self, start_history_id: Optional[str] = None) -> Dict:
         """
         Process Gmail history changes to find new messages.
         
+        Resumes from the checkpoint stored in the database, follows every
+        history page and checkpoints after each one. If Gmail no longer has the
+        history, falls back to a messages.list resync from the last checkpoint
+        time. Transient failures (Gmail 5xx/429, connection or database
+        errors) hold the checkpoint; messages that fail permanently are marked
+        processed and reported under 'failed'.
+        
         Args:
-            start_history_id: History ID to start from
+            start_history_id: History ID to start from when no checkpoint is stored
+                (a notification's historyId; ignored once a checkpoint exists)
         
         Returns:
-            Processing result with count of processed messages
+            Processing result with count of processed messages and the checkpointed history ID
         """
         try:
-            # Fetch history
-            history = self.gmail.list_history(start_history_id)
-            
-            processed_count = 0
-            errors = []
-            
-            # Process each history item
-            for record in history:
-                messages_added = record.get('messagesAdded', [])
-                
-                for msg_entry in messages_added:
-                    message = msg_entry.get('message', {})
-                    message_id = message.get('id')
-                    
-                    if message_id:
-                        try:
-                            result = self.process_message(message_id)
-                            if result['status'] == 'processed':
-                                processed_count += 1
-                        except Exception as e:
-                            error_msg = f"Failed to process message {message_id}: {e}"
-                            logger.error(error_msg)
-                            errors.append(error_msg)
+            checkpoint = self.db.get_gmail_sync_state(self.mailbox)
+            synced_at = None
+            if checkpoint:
+                stored_history_id, synced_at = checkpoint
+                if start_history_id and int(start_history_id) <= int(stored_history_id):
+                    # Redelivered or stale notification: nothing newer than the checkpoint
+                    return {'status': 'success', 'processed_count': 0, 'errors': [],
+                            'history_id': stored_history_id}
+                start_history_id = stored_history_id
             
-            return {
-                'status': 'success',
-                'processed_count': processed_count,
-                'errors': errors
-            }
+            if not start_history_id:
+                return self.full_resync()
+            try:
+                return self._sync_history(start_history_id)
+            except HistoryExpiredError:
+                return self.full_resync(synced_at - RESYNC_OVERLAP if synced_at else None)
             
         except Exception as e:
             logger.error(f"Error processing history: {e}", exc_info=True)
             return {'status': 'error', 'error': str(e)}
     
+    def _sync_history(self, start_history_id: str) -> Dict:
+        """Process history pages after start_history_id, checkpointing after each page."""
+        processed_count = 0
+        errors = []
+        failed = []
+        messages = []
+        history_id = start_history_id
+        
+        for page in self.gmail.list_history_pages(start_history_id, page_size=self.history_page_size):
+            records = page.get('history', [])
+            message_ids = [
+                msg_entry.get('message', {}).get('id')
+                for record in records
+                for msg_entry in record.get('messagesAdded', [])
+            ]
+            page_processed, page_errors, page_failed, page_messages = self._fetch_and_process(message_ids)
+            processed_count += page_processed
+            errors.extend(page_errors)
+            failed.extend(page_failed)
+            messages.extend(page_messages)
+            if page_errors:
+                # Keep the checkpoint before this page so transient failures are retried next sync
+                break
+            
+            if not page.get('nextPageToken'):
+                history_id = page.get('historyId', history_id)
+            elif records:
+                history_id = records[-1]['id']
+            self._checkpoint(history_id)
+        
+        return {
+            'status': 'success',
+            'processed_count': processed_count,
+            'errors': errors,
+            'failed': failed,
+            'history_id': history_id,
+            'messages': messages
+        }
+    
+    def full_resync(self, since: Optional[datetime] = None) -> Dict:
+        """
+        Process every message received since a time, then checkpoint the current history ID.
+        
+        Args:
+            since: UTC time to resync from (default: now - resync_lookback)
+        
+        Returns:
+            Processing result as for process_history
+        """
+        since = since or datetime.utcnow() - self.resync_lookback
+        logger.warning(f"Full resync of {self.mailbox} from {since.isoformat()}")
+        
+        # Read the history ID first so anything arriving during the resync is caught by the next sync
+        history_id = self.gmail.get_profile()['historyId']
+        query = f"after:{int(since.replace(tzinfo=timezone.utc).timestamp())}"
+        message_ids = [message_id for page in self.gmail.list_message_ids(query) for message_id in page]
+        message_ids.reverse()  # messages.list is newest first; process in arrival order
+        
+        processed_count, errors, failed, messages = self._fetch_and_process(message_ids)
+        if not errors:
+            self._checkpoint(history_id)
+        
+        return {
+            'status': 'success',
+            'processed_count': processed_count,
+            'errors': errors,
+            'failed': failed,
+            'history_id': history_id,
+            'messages': messages,
+            'resync': True
+        }
+    
+    def _checkpoint(self, history_id: str) -> None:
+        self.db.save_gmail_sync_state(self.mailbox, str(history_id), datetime.utcnow())
+    
+    def _fetch_and_process(self, message_ids: List[Optional[str]]) -> Tuple[int, List[str], List[str], List[Dict]]:
+        """
+        Batch-fetch and process messages not yet processed.
+        
+        Returns:
+            (processed_count, transient errors, permanent failures,
+            per-message summaries with timing_ms)
+        """
+        pending = self.processed.filter_unprocessed(
+            dict.fromkeys(message_id for message_id in message_ids if message_id)
+        )
+        chunks = [pending[i:i + self.fetch_batch_size] for i in range(0, len(pending), self.fetch_batch_size)]
+        if self.workers > 1:
+            results = self._fetch_and_process_concurrently(chunks)
+        else:
+            # Fetch in batches and process each chunk as it arrives
+            results = [
+                self._process_fetched(message_id, prepared, fetch_ms, time.perf_counter())
+                for chunk in chunks
+                for message_id, prepared, fetch_ms in self._fetch_chunk(chunk)
+            ]
+        
+        processed_count = sum(1 for result in results if result['status'] == 'processed')
+        # Transient failures hold the checkpoint so the next sync retries them; permanent
+        # ones were marked processed and are only reported
+        errors = [result['error'] for result in results if result['status'] in ('fetch_error', 'error')]
+        failed = [result['error'] for result in results if result['status'] == 'failed']
+        messages = [
+            {key: result[key] for key in ('message_id', 'status', 'timing_ms') if key in result}
+            for result in results
+        ]
+        return processed_count, errors, failed, messages
+    
+    def _fetch_and_process_concurrently(self, chunks: List[List[str]]) -> List[Dict]:
+        """
+        Overlap batch fetches with processing across senders.
+        
+        Chunks are fetched up to `workers` at a time; their messages are handed
+        to a KeyedExecutor in arrival order keyed by sender and assignment code,
+        so related messages never overtake each other while unrelated ones run
+        in parallel.
+        """
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="gmail-fetch") as fetch_pool, \
+                KeyedExecutor("gmail-ingest", self.workers, self.max_in_flight) as lanes:
+            fetches = [fetch_pool.submit(self._fetch_chunk, chunk) for chunk in chunks[:self.workers]]
+            for index in range(len(chunks)):
+                fetched = fetches[index].result()
+                if index + self.workers < len(chunks):
+                    fetches.append(fetch_pool.submit(self._fetch_chunk, chunks[index + self.workers]))
+                for message_id, prepared, fetch_ms in fetched:
+                    futures.append(lanes.submit(
+                        prepared.get('order_keys') or (message_id,),
+                        self._process_fetched, message_id, prepared, fetch_ms, time.perf_counter()
+                    ))
+            return [future.result() for future in futures]
+    
+    def _fetch_chunk(self, chunk: List[str]) -> List[Tuple[str, Dict, float]]:
+        """Fetch one batch and parse each message. Returns [(message_id, prepared, fetch_ms)]."""
+        started = time.perf_counter()
+        fetched = list(self.gmail.get_messages_batch(chunk, format='raw', batch_size=len(chunk)))
+        fetch_ms = round((time.perf_counter() - started) * 1000, 3)
+        results = []
+        for message_id, message_data, fetch_error in fetched:
+            if fetch_error is not None:
+                results.append((message_id, {'fetch_error': fetch_error}, fetch_ms))
+                continue
+            try:
+                results.append((message_id, self._prepare(message_data), fetch_ms))
+            except Exception as e:
+                results.append((message_id, {'parse_error': e}, fetch_ms))
+        return results
+    
+    def _process_fetched(self, message_id: str, prepared: Dict, fetch_ms: float, enqueued_at: float) -> Dict:
+        """Process one prepared message, adding fetch/queue/process timings to its result."""
+        started = time.perf_counter()
+        if 'fetch_error' in prepared:
+            error = prepared['fetch_error']
+            error_msg = f"Failed to process message {message_id}: {error}"
+            logger.error(error_msg)
+            result = (
+                {'status': 'fetch_error', 'message_id': message_id, 'error': error_msg}
+                if is_transient(error) else self._give_up(message_id, None, error_msg)
+            )
+        elif 'parse_error' in prepared:
+            error = prepared['parse_error']
+            logger.error(f"Error processing message {message_id}: {error}")
+            result = (
+                {'status': 'error', 'message_id': message_id, 'error': str(error)}
+                if is_transient(error) else self._give_up(message_id, None, str(error))
+            )
+        else:
+            result = self._process_prepared(message_id, prepared)
+        result['timing_ms'] = {
+            'fetch': fetch_ms,
+            'queued': round((started - enqueued_at) * 1000, 3),
+            'process': round((time.perf_counter() - started) * 1000, 3),
+        }
+        return result
+    
     def process_message(self, message_id: str) -> Dict:
         """
         Fetch and process a single Gmail message.
@@ -128,25 +370,101 @@ class GmailIngestionService:
             Processing result
         """
         # Check if already processed (idempotency)
-        if message_id in self.processed_messages:
+        if self.processed.is_processed(message_id):
             logger.info(f"Message {message_id} already processed, skipping")
             return {'status': 'duplicate', 'message_id': message_id}
         
         try:
-            # Fetch message details
-            message_data = self.gmail.get_message(message_id, format='full')
-            parsed_message = self.gmail.parse_message(message_data)
+            # One format='raw' fetch serves both the audit checksum and parsing
+            message_data = self.gmail.get_message(message_id, format='raw')
+        except Exception as e:
+            logger.error(f"Error processing message {message_id}: {e}", exc_info=True)
+            return {
+                'status': 'error',
+                'message_id': message_id,
+                'error': str(e)
+            }
+        
+        return self.process_message_data(message_id, message_data)
+    
+    def process_message_data(self, message_id: str, message_data: Dict) -> Dict:
+        """
+        Process a Gmail message already fetched with format='raw'.
+        
+        The caller has already checked the Gmail ID against the idempotency store.
+        
+        Args:
+            message_id: Gmail message ID
+            message_data: Gmail API message response
+        
+        Returns:
+            Processing result
+        """
+        try:
+            prepared = self._prepare(message_data)
+        except Exception as e:
+            logger.error(f"Error processing message {message_id}: {e}", exc_info=True)
+            return {
+                'status': 'error',
+                'message_id': message_id,
+                'error': str(e)
+            }
+        return self._process_prepared(message_id, prepared)
+    
+    def _prepare(self, message_data: Dict) -> Dict:
+        """Decode, checksum, archive and parse a format='raw' message."""
+        raw_mime = base64.urlsafe_b64decode(message_data['raw'])
+        if self.blob_store is not None:
+            # The blob key is the SHA-256 checksum, so hashing happens once, while streaming
+            checksum = archive_raw_mime(self.blob_store, self.db, iter_chunks(raw_mime)).key
+        else:
+            checksum = hashlib.sha256(raw_mime).hexdigest()
+        parsed_message = self.gmail.parse_raw_message(message_data, raw_mime)
+        return {
+            'checksum': checksum,
+            'archived': self.blob_store is not None,
+            'parsed': parsed_message,
+            'order_keys': ordering_keys(
+                parsed_message.get('from'), parsed_message.get('subject'), parsed_message.get('body')
+            ),
+        }
+    
+    def _skip_reason(self, parsed_message: Dict) -> Optional[str]:
+        """Why a message must not be processed: sent by this mailbox, or automatic (RFC 3834)."""
+        if 'SENT' in parsed_message.get('label_ids', []):
+            return 'sent'
+        sender = parseaddr(parsed_message.get('from') or '')[1].lower()
+        if sender and self.gmail.user_email and sender == self.gmail.user_email.lower():
+            return 'own_address'
+        auto_submitted = (parsed_message.get('auto_submitted') or 'no').strip().lower()
+        if auto_submitted != 'no':
+            return 'auto_submitted'
+        return None
+    
+    def _process_prepared(self, message_id: str, prepared: Dict) -> Dict:
+        """Run a parsed message through the processor and record it as processed."""
+        try:
+            raw_checksum = prepared['checksum']
+            parsed_message = prepared['parsed']
+            rfc_message_id = parsed_message.get('email_message_id')
+            
+            # Same email delivered under another Gmail ID (e.g. to an alias)
+            if rfc_message_id and self.processed.is_rfc_processed(rfc_message_id):
+                logger.info(f"Message {message_id} ({rfc_message_id}) already processed, skipping")
+                self.processed.mark_processed(message_id)
+                return {'status': 'duplicate', 'message_id': message_id}
             
-            # Fetch raw MIME for audit
-            raw_mime = self.gmail.get_raw_message(message_id)
-            raw_checksum = hashlib.sha256(raw_mime).hexdigest()
+            # Never process (and so never answer) our own replies or other automatic mail
+            skip_reason = self._skip_reason(parsed_message)
+            if skip_reason:
+                logger.info(f"Message {message_id} skipped: {skip_reason}")
+                self.processed.mark_processed(message_id, rfc_message_id)
+                return {'status': 'skipped', 'message_id': message_id, 'reason': skip_reason}
             
             logger.info(f"Processing message {message_id}")
             logger.info(f"From: {parsed_message.get('from')}")
             logger.info(f"Subject: {parsed_message.get('subject')}")
             
-            # TODO: Store raw MIME in Google Drive
-            # For now, just log the checksum
             logger.info(f"Raw MIME checksum: {raw_checksum}")
             
             # Process the email through existing processor
@@ -155,11 +473,15 @@ class GmailIngestionService:
                 from_email=parsed_message.get('from', ''),
                 to_emails=[parsed_message.get('to', '')],
                 subject=parsed_message.get('subject', ''),
-                message_id=parsed_message.get('email_message_id', message_id)
+                message_id=parsed_message.get('email_message_id', message_id),
+                raw_blob_key=raw_checksum if prepared['archived'] else None,
+                enqueue_reply=self.enqueue_replies
             )
             
-            # Mark as processed
-            self.processed_messages.add(message_id)
+            # Mark as processed. Recorded after processing, so a crash in between means
+            # a redelivery is processed again; the unique email_messages.message_id
+            # rejects that second run.
+            self.processed.mark_processed(message_id, rfc_message_id)
             
             logger.info(f"Successfully processed message {message_id}: {response}")
             
@@ -172,9 +494,30 @@ class GmailIngestionService:
             
         except Exception as e:
             logger.error(f"Error processing message {message_id}: {e}", exc_info=True)
+            if self._already_logged(message_id, prepared):
+                # Processed before a crash, but never marked: the unique message_id rejected the rerun
+                self.processed.mark_processed(message_id, prepared['parsed'].get('email_message_id'))
+                return {'status': 'duplicate', 'message_id': message_id}
+            if not is_transient(e):
+                return self._give_up(message_id, prepared['parsed'].get('email_message_id'), str(e))
             return {
                 'status': 'error',
                 'message_id': message_id,
                 'error': str(e)
             }
+    
+    def _give_up(self, message_id: str, rfc_message_id: Optional[str], error: str) -> Dict:
+        """Mark a message that can never succeed as processed, so it stops holding the checkpoint."""
+        logger.error(f"Giving up on message {message_id}, marking it processed: {error}")
+        self.processed.mark_processed(message_id, rfc_message_id)
+        return {'status': 'failed', 'message_id': message_id, 'error': error}
+    
+    def _already_logged(self, message_id: str, prepared: Dict) -> bool:
+        """Whether the email log already holds this message (False if that can't be checked)."""
+        email_id = prepared['parsed'].get('email_message_id', message_id)
+        try:
+            return email_id in self.db.get_parse_results([email_id])
+        except Exception:
+            return False
+
 
@@ -0,0 +1,109 @@
+"""
+Idempotency store for ingested Gmail messages.
+Processed messages are recorded in the processed_messages table by Gmail ID
+and RFC Message-ID, so redeliveries are skipped across restarts and
+instances. A bounded in-process LRU answers repeat checks without a query,
+and records older than the retention window are compacted away.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+from .cache import LookupCache
+from .storage import Database
+
+DEFAULT_RETENTION = timedelta(days=30)  # well past Pub/Sub's 7-day maximum redelivery window
+DEFAULT_COMPACT_INTERVAL_SECONDS = 3600.0
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_CACHE_TTL_SECONDS = 3600.0
+
+
+class ProcessedMessageStore:
+    """DB-backed record of processed messages with an LRU front for positive hits."""
+
+    def __init__(self, db: Database, cache: Optional[LookupCache] = None,
+                 retention: timedelta = DEFAULT_RETENTION,
+                 compact_interval: float = DEFAULT_COMPACT_INTERVAL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize store.
+
+        Args:
+            db: Database instance
+            cache: Front cache for keys known to be processed (negative results are never cached,
+                since another instance may process the message at any time)
+            retention: How long records are kept before compaction
+            compact_interval: Minimum seconds between automatic compactions
+            clock: Monotonic time source for compaction scheduling (injectable for tests)
+        """
+        self.db = db
+        self._cache = cache or LookupCache(max_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL_SECONDS, negative_ttl=0)
+        self.retention = retention
+        self.compact_interval = compact_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._next_compact_at = clock() + compact_interval
+        self.compacted = 0
+
+    def is_processed(self, gmail_id: str) -> bool:
+        """Check whether a Gmail message ID was already processed."""
+        return bool(self._cache.get_or_load(
+            f"gmail_{gmail_id}", lambda: gmail_id in self.db.get_processed_gmail_ids([gmail_id]) or None
+        ))
+
+    def is_rfc_processed(self, rfc_message_id: str) -> bool:
+        """Check whether a Message-ID header value was already processed."""
+        return bool(self._cache.get_or_load(
+            f"rfc_{rfc_message_id}", lambda: self.db.is_rfc_message_processed(rfc_message_id) or None
+        ))
+
+    def filter_unprocessed(self, gmail_ids: Iterable[str]) -> List[str]:
+        """Return the IDs not yet processed, in order, with one query for all cache misses."""
+        ids = list(gmail_ids)
+        misses = [gmail_id for gmail_id in ids if not self._cache_hit(f"gmail_{gmail_id}")]
+        found = self.db.get_processed_gmail_ids(misses) if misses else set()
+        for gmail_id in found:
+            self._cache.put(f"gmail_{gmail_id}", True)
+        return [gmail_id for gmail_id in misses if gmail_id not in found]
+
+    def mark_processed(self, gmail_id: str, rfc_message_id: Optional[str] = None) -> bool:
+        """
+        Record a processed message. Returns False if it was already recorded.
+
+        A Message-ID already recorded under another Gmail ID (the same email
+        delivered twice) is recorded for this Gmail ID alone.
+        """
+        processed_at = datetime.utcnow()
+        inserted = self.db.mark_message_processed(gmail_id, rfc_message_id, processed_at)
+        if not inserted and rfc_message_id:
+            inserted = self.db.mark_message_processed(gmail_id, None, processed_at)
+        self._cache.put(f"gmail_{gmail_id}", True)
+        if rfc_message_id:
+            self._cache.put(f"rfc_{rfc_message_id}", True)
+        self.maybe_compact()
+        return inserted
+
+    def maybe_compact(self) -> int:
+        """Compact if compact_interval has passed since the last run. Returns records deleted."""
+        now = self._clock()
+        with self._lock:
+            if now < self._next_compact_at:
+                return 0
+            self._next_compact_at = now + self.compact_interval
+        return self.compact()
+
+    def compact(self, now: Optional[datetime] = None) -> int:
+        """Delete records older than the retention window. Returns the number deleted."""
+        deleted = self.db.delete_processed_messages_before((now or datetime.utcnow()) - self.retention)
+        if deleted:
+            self._cache.clear()
+        self.compacted += deleted
+        return deleted
+
+    def stats(self) -> Dict[str, int]:
+        """Return front-cache counters and the number of records compacted."""
+        return {**self._cache.stats(), 'compacted': self.compacted}
+
+    def _cache_hit(self, key: str) -> bool:
+        return bool(self._cache.get_or_load(key, lambda: None))
@@ -0,0 +1,183 @@
+"""
+Durable work queue for Gmail Pub/Sub notifications.
+The webhook only records the notification (ingestion_queue table) and returns;
+a bounded set of worker threads drains the queue. All notifications queued for
+a mailbox are claimed together and handled with one history sync, so bursts and
+redeliveries coalesce instead of each triggering their own sync.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Set
+from .retry import backoff_delay
+from .storage import Database
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_POLL_INTERVAL_SECONDS = 1.0
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_LEASE_SECONDS = 300.0
+
+
+class IngestionQueue:
+    """DB-backed notification queue drained by a bounded pool of worker threads."""
+
+    def __init__(self, db: Database, handler: Callable[[str], Dict], workers: int = DEFAULT_WORKERS,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, backoff_base: float = 1.0, backoff_cap: float = 300.0):
+        """
+        Initialize queue.
+
+        Args:
+            db: Database instance
+            handler: Called as handler(history_id) with the newest queued historyId of a
+                mailbox, e.g. GmailIngestionService.process_history. A result with
+                status 'error' or non-empty 'errors' is retried.
+            workers: Number of worker threads
+            poll_interval: Seconds an idle worker waits before checking the queue again
+            max_attempts: Attempts before a notification is parked as FAILED
+            lease_seconds: A claim older than this is assumed dead and can be reclaimed
+            backoff_base: First retry delay ceiling in seconds (doubles per attempt)
+            backoff_cap: Maximum retry delay ceiling in seconds
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.db = db
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease = timedelta(seconds=lease_seconds)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._active_mailboxes: Set[str] = set()  # one worker per mailbox at a time
+        self._threads = []
+        self._stopping = False
+        self.enqueued = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.last_run_seconds = 0.0
+
+    def enqueue(self, mailbox: str, history_id: str) -> bool:
+        """Record a notification durably and wake a worker. Returns False if already queued."""
+        queued = self.db.enqueue_notification(mailbox, str(history_id), datetime.utcnow())
+        with self._wakeup:
+            if queued:
+                self.enqueued += 1
+            else:
+                self.coalesced += 1
+            self._wakeup.notify()
+        return queued
+
+    def start(self) -> None:
+        """Start the worker threads."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            self._threads = [
+                threading.Thread(target=self._run, name=f"ingestion-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the workers after their current item; unfinished items stay queued."""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def drain_once(self) -> bool:
+        """Claim and handle one mailbox's queued notifications. Returns False if nothing was ready."""
+        now = datetime.utcnow()
+        # Claims are short; holding the lock keeps two local workers off the same mailbox
+        with self._lock:
+            claim = self.db.claim_notifications(now, now - self.lease, exclude_mailboxes=self._active_mailboxes)
+            if claim is None:
+                return False
+            claim_token, mailbox, rows = claim
+            self._active_mailboxes.add(mailbox)
+
+        try:
+            self._handle(claim_token, mailbox, rows)
+        finally:
+            with self._lock:
+                self._active_mailboxes.discard(mailbox)
+        return True
+
+    def _handle(self, claim_token: str, mailbox: str, rows) -> None:
+        history_id = max((row[1] for row in rows), key=int)
+        attempts = max(row[2] for row in rows)
+        if len(rows) > 1:
+            logger.info(f"Coalesced {len(rows)} notifications for {mailbox} into history {history_id}")
+
+        started = time.perf_counter()
+        try:
+            result = self.handler(history_id)
+            if result.get('status') == 'error' or result.get('errors'):
+                raise RuntimeError(result.get('error') or '; '.join(result['errors']))
+        except Exception as e:
+            delay = backoff_delay(attempts, self.backoff_base, self.backoff_cap)
+            failed = self.db.release_notifications(
+                claim_token, datetime.utcnow() + timedelta(seconds=delay), str(e)[:1000], self.max_attempts
+            )
+            with self._lock:
+                self.retried += len(rows) - failed
+                self.failed += failed
+            logger.warning(f"History sync for {mailbox} failed (attempt {attempts}), retrying in {delay:.1f}s: {e}")
+            return
+        finally:
+            self.last_run_seconds = time.perf_counter() - started
+
+        self.db.complete_notifications(claim_token)
+        with self._lock:
+            self.completed += len(rows)
+
+    def _run(self) -> None:
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+            try:
+                if self.drain_once():
+                    continue
+            except Exception as e:
+                logger.error(f"Ingestion worker error: {e}", exc_info=True)
+            with self._wakeup:
+                if self._stopping:
+                    return
+                self._wakeup.wait(self.poll_interval)
+
+    def stats(self) -> Dict:
+        """Return queue depth, lag of the oldest pending notification, and worker counters."""
+        by_status = self.db.get_ingestion_queue_stats()
+        oldest = min(
+            (entry['oldest_enqueued_at'] for status, entry in by_status.items() if status != 'FAILED'),
+            default=None
+        )
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'depth': sum(entry['count'] for status, entry in by_status.items() if status != 'FAILED'),
+                'pending': by_status.get('PENDING', {}).get('count', 0),
+                'processing': by_status.get('PROCESSING', {}).get('count', 0),
+                'failed': by_status.get('FAILED', {}).get('count', 0),
+                'lag_seconds': round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0.0,
+                'enqueued': self.enqueued,
+                'coalesced': self.coalesced,
+                'completed': self.completed,
+                'retried': self.retried,
+                'failed_total': self.failed,
+                'last_run_ms': round(self.last_run_seconds * 1000, 3),
+            }
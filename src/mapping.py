@@ -0,0 +1,89 @@
+"""
+Row <-> model mapping for Database.
+One RowMapper per table, built once at import: reads select plain column
+tuples and build pydantic models without re-validating trusted DB rows;
+writes turn models into ORM rows.
+"""
+
+import json
+from typing import Any, Callable, Dict, Optional, Sequence
+from pydantic import BaseModel
+from .models import (
+    Assignment, Submission, Grade, EmailMessage, Student, Teacher, Class, Term, TermName, Enrollment, Parent,
+    OutboxMessage,
+    AssignmentDB, SubmissionDB, GradeDB, EmailMessageDB, StudentDB, TeacherDB, ClassDB, TermDB, EnrollmentDB, ParentDB,
+    OutboxDB
+)
+
+_object_setattr = object.__setattr__
+
+
+class RowMapper:
+    """Maps between one ORM table and its pydantic model, field for field."""
+
+    def __init__(self, table: type, model: type,
+                 load: Optional[Dict[str, Callable[[Any], Any]]] = None,
+                 dump: Optional[Dict[str, Callable[[Any], Any]]] = None):
+        """
+        Initialize mapper.
+
+        Args:
+            table: ORM class (e.g. AssignmentDB)
+            model: Pydantic model with the same field names (e.g. Assignment)
+            load: Per-field converters applied to column values when reading
+            dump: Per-field converters applied to model values when writing
+        """
+        self.table = table
+        self.model = model
+        self.fields = tuple(model.model_fields)
+        # Instrumented attributes keep the select ORM-enabled, so it autoflushes pending writes
+        self.columns = tuple(getattr(table, name) for name in self.fields)
+        self._load = load or {}
+        self._dump = dump or {}
+        self._new = model.__new__
+
+    def from_row(self, row: Sequence) -> BaseModel:
+        """
+        Build a model from a row selected with `columns`, skipping validation.
+
+        Extra trailing values in the row (e.g. a joined column) are ignored.
+        """
+        values = dict(zip(self.fields, row))
+        for name, convert in self._load.items():
+            values[name] = convert(values[name])
+        # Same end state as model_construct(), minus its per-field default handling:
+        # every field comes from the row, so there is nothing to fill in.
+        obj = self._new(self.model)
+        _object_setattr(obj, '__dict__', values)
+        _object_setattr(obj, '__pydantic_fields_set__', set(self.fields))
+        _object_setattr(obj, '__pydantic_extra__', None)
+        _object_setattr(obj, '__pydantic_private__', None)
+        return obj
+
+    def to_values(self, obj: BaseModel) -> Dict[str, Any]:
+        """Return the column values for a model."""
+        values = {name: getattr(obj, name) for name in self.fields}
+        for name, convert in self._dump.items():
+            values[name] = convert(values[name])
+        return values
+
+    def to_db(self, obj: BaseModel):
+        """Return a new ORM row for a model."""
+        return self.table(**self.to_values(obj))
+
+
+ASSIGNMENTS = RowMapper(AssignmentDB, Assignment)
+SUBMISSIONS = RowMapper(SubmissionDB, Submission)
+GRADES = RowMapper(GradeDB, Grade)
+EMAIL_MESSAGES = RowMapper(
+    EmailMessageDB, EmailMessage,
+    load={'to_emails': lambda value: json.loads(value) if value else []},
+    dump={'to_emails': json.dumps}
+)
+STUDENTS = RowMapper(StudentDB, Student)
+TEACHERS = RowMapper(TeacherDB, Teacher)
+PARENTS = RowMapper(ParentDB, Parent)
+TERMS = RowMapper(TermDB, Term, load={'name': TermName}, dump={'name': lambda name: TermName(name).value})
+CLASSES = RowMapper(ClassDB, Class)
+ENROLLMENTS = RowMapper(EnrollmentDB, Enrollment)
+OUTBOX = RowMapper(OutboxDB, OutboxMessage)
@@ -99,6 +99,21 @@ class EmailMessage(BaseModel):
     message_id: str
     processed_at: datetime
     parse_result: Optional[str] = None
+    raw_blob_key: Optional[str] = None  # blob store key (SHA-256) of the raw MIME
+
+class OutboxMessage(BaseModel):
+    id: Optional[int] = None
+    to_email: str
+    subject: str
+    body: str
+    in_reply_to: Optional[str] = None  # Message-ID answered; one reply per incoming email
+    status: str = 'PENDING'  # PENDING, SENDING, SENT or DEAD
+    attempts: int = 0
+    created_at: datetime
+    available_at: datetime
+    sent_at: Optional[datetime] = None
+    gmail_message_id: Optional[str] = None
+    last_error: Optional[str] = None
 
 class AssignmentDB(Base):
     __tablename__ = 'assignments'
@@ -114,6 +129,11 @@ class AssignmentDB(Base):
     status = Column(String, default='SCHEDULED')
     grace_days = Column(Integer, default=7)
     created_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        Index('idx_assignment_class_deadline', 'class_id', 'deadline_at'),
+        Index('idx_assignment_deadline', 'deadline_at', 'id'),
+        Index('idx_assignment_status_deadline', 'status', 'deadline_at', 'id'),
+    )
 
 class SubmissionDB(Base):
     __tablename__ = 'submissions'
@@ -124,6 +144,7 @@ class SubmissionDB(Base):
     received_at = Column(DateTime, nullable=False)
     on_time = Column(Boolean, nullable=False)
     status = Column(String, default='RECEIVED')
+    __table_args__ = (Index('uq_submission_assignment_student', 'assignment_id', 'student_id', unique=True),)
 
 class GradeDB(Base):
     __tablename__ = 'grades'
@@ -134,6 +155,7 @@ class GradeDB(Base):
     grade_value = Column(String, nullable=False)
     feedback_text = Column(Text)
     graded_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (Index('idx_grade_assignment_student', 'assignment_id', 'student_id'),)
 
 class EmailMessageDB(Base):
     __tablename__ = 'email_messages'
@@ -146,6 +168,11 @@ class EmailMessageDB(Base):
     message_id = Column(String, unique=True, nullable=False)
     processed_at = Column(DateTime, default=datetime.utcnow)
     parse_result = Column(Text)
+    raw_blob_key = Column(String, nullable=True)
+    __table_args__ = (
+        Index('idx_email_message_raw_blob_key', 'raw_blob_key'),
+        Index('idx_email_message_processed_at', 'processed_at', 'id'),
+    )
 
 class TermDB(Base):
     __tablename__ = 'terms'
@@ -196,7 +223,10 @@ class ClassDB(Base):
     teacher_id = Column(String, ForeignKey('teachers.id'), nullable=False)
     roster_version = Column(Integer, nullable=False, default=1)
     status = Column(String, nullable=False, default='ACTIVE')
-    __table_args__ = (Index('idx_class_name', 'name'),)
+    __table_args__ = (
+        Index('idx_class_name', 'name'),
+        Index('idx_class_term', 'term_id'),
+    )
 
 class EnrollmentDB(Base):
     __tablename__ = 'enrollments'
@@ -208,4 +238,79 @@ class EnrollmentDB(Base):
     active = Column(Boolean, nullable=False, default=True)
     joined_at = Column(DateTime, nullable=False)
     left_at = Column(DateTime, nullable=True)
-    __table_args__ = (Index('idx_enrollment_lookup', 'student_id', 'class_id', 'active'),)
+    __table_args__ = (
+        Index('idx_enrollment_lookup', 'student_id', 'class_id', 'active'),
+        Index('idx_enrollment_class', 'class_id', 'active'),
+    )
+
+class CacheVersionDB(Base):
+    __tablename__ = 'cache_versions'
+    
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class GmailSyncStateDB(Base):
+    __tablename__ = 'gmail_sync_state'
+    
+    mailbox = Column(String, primary_key=True)
+    history_id = Column(String, nullable=False)  # last Gmail historyId fully processed
+    synced_at = Column(DateTime, nullable=False)  # when history_id was checkpointed
+
+class ProcessedMessageDB(Base):
+    __tablename__ = 'processed_messages'
+    
+    gmail_id = Column(String, primary_key=True)
+    rfc_message_id = Column(String, unique=True, nullable=True)  # Message-ID header, when present
+    processed_at = Column(DateTime, nullable=False)
+    __table_args__ = (Index('idx_processed_message_processed_at', 'processed_at'),)
+
+class IngestionQueueDB(Base):
+    __tablename__ = 'ingestion_queue'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    mailbox = Column(String, nullable=False)
+    history_id = Column(String, nullable=False)
+    status = Column(String, nullable=False, default='PENDING')  # PENDING, PROCESSING or FAILED
+    attempts = Column(Integer, nullable=False, default=0)
+    enqueued_at = Column(DateTime, nullable=False)
+    available_at = Column(DateTime, nullable=False)  # not claimed before this (retry backoff)
+    claimed_at = Column(DateTime, nullable=True)
+    claim_token = Column(String, nullable=True)
+    last_error = Column(Text)
+    __table_args__ = (
+        Index('uq_ingestion_queue_mailbox_history', 'mailbox', 'history_id', unique=True),
+        Index('idx_ingestion_queue_status_available', 'status', 'available_at'),
+        Index('idx_ingestion_queue_claim_token', 'claim_token'),
+    )
+
+class RawBlobDB(Base):
+    __tablename__ = 'raw_blobs'
+    
+    key = Column(String, primary_key=True)  # SHA-256 of the uncompressed content
+    size = Column(Integer, nullable=False)  # uncompressed bytes
+    stored_size = Column(Integer, nullable=False)  # compressed bytes in the blob store
+    compression = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+class OutboxDB(Base):
+    __tablename__ = 'outbox'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    in_reply_to = Column(String, nullable=True)
+    status = Column(String, nullable=False, default='PENDING')
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False)
+    available_at = Column(DateTime, nullable=False)  # not claimed before this (retry backoff)
+    claimed_at = Column(DateTime, nullable=True)
+    claim_token = Column(String, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+    gmail_message_id = Column(String, nullable=True)
+    last_error = Column(Text)
+    __table_args__ = (
+        Index('uq_outbox_in_reply_to', 'in_reply_to', unique=True),
+        Index('idx_outbox_status_available', 'status', 'available_at'),
+        Index('idx_outbox_claim_token', 'claim_token'),
+    )
@@ -0,0 +1,174 @@
+"""
+Sender for the outbound reply outbox.
+Email handlers queue replies in the outbox table in the same transaction as
+their writes; a background worker drains it in Gmail batch requests, metered
+by the GmailClient's quota limiter. Failed sends are retried with backoff and
+dead-lettered (status DEAD) once they run out of attempts. Delivery is
+at-least-once: a worker dying between the send and marking it SENT means
+the reply goes out again when its lease expires.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from googleapiclient.errors import HttpError
+from .gmail_client import GmailClient, MAX_BATCH_SIZE
+from .models import OutboxMessage
+from .rate_limit import is_retryable
+from .retry import backoff_delay
+from .storage import Database
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_POLL_INTERVAL_SECONDS = 1.0
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_LEASE_SECONDS = 300.0
+
+
+def is_permanent(error: Exception) -> bool:
+    """A 4xx other than throttling (e.g. an invalid recipient) will fail the same way on every retry."""
+    return isinstance(error, HttpError) and 400 <= error.resp.status < 500 and not is_retryable(error)
+
+
+class OutboxSender:
+    """Drains the outbox table in batches on a background worker thread."""
+
+    def __init__(self, db: Database, gmail_client: GmailClient, batch_size: int = DEFAULT_BATCH_SIZE,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, backoff_base: float = 1.0, backoff_cap: float = 300.0):
+        """
+        Initialize sender.
+
+        Args:
+            db: Database instance
+            gmail_client: Gmail client whose quota limiter meters the sends
+            batch_size: Messages sent per Gmail batch request (1-100)
+            poll_interval: Seconds the idle worker waits before checking the outbox again
+            max_attempts: Attempts before a message is dead-lettered as DEAD
+            lease_seconds: A claim older than this is assumed dead and can be reclaimed
+            backoff_base: First retry delay ceiling in seconds (doubles per attempt)
+            backoff_cap: Maximum retry delay ceiling in seconds
+        """
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"batch_size must be between 1 and {MAX_BATCH_SIZE}")
+        self.db = db
+        self.gmail = gmail_client
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease = timedelta(seconds=lease_seconds)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._stopping = False
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+        self.last_batch_seconds = 0.0
+
+    def start(self) -> None:
+        """Start the worker thread."""
+        with self._lock:
+            if self._thread:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="outbox-sender", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the worker after its current batch; unsent messages stay queued."""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def drain_once(self) -> int:
+        """Claim and send one batch. Returns the number of messages claimed (0 if none were ready)."""
+        now = datetime.utcnow()
+        claim = self.db.claim_outbox(now, now - self.lease, self.batch_size)
+        if claim is None:
+            return 0
+        claim_token, messages = claim
+        by_id = {message.id: message for message in messages}
+
+        started = time.perf_counter()
+        try:
+            results = self.gmail.send_messages_batch({
+                str(message.id): {
+                    'to': message.to_email,
+                    'subject': message.subject,
+                    'body': message.body,
+                    'in_reply_to': message.in_reply_to,
+                }
+                for message in messages
+            })
+        except Exception as e:
+            self._release(claim_token, messages, e)
+            return len(messages)
+        finally:
+            self.last_batch_seconds = time.perf_counter() - started
+
+        sent = {int(key): response.get('id') for key, (response, error) in results.items() if error is None}
+        failed = {int(key): error for key, (response, error) in results.items() if error is not None}
+        if sent:
+            self.db.mark_outbox_sent(claim_token, sent, datetime.utcnow())
+            with self._lock:
+                self.sent += len(sent)
+        for outbox_id, error in failed.items():
+            self._release(claim_token, [by_id[outbox_id]], error)
+        return len(messages)
+
+    def _release(self, claim_token: str, failed: List[OutboxMessage], error: Exception) -> None:
+        attempts = max(message.attempts for message in failed)
+        delay = backoff_delay(attempts, self.backoff_base, self.backoff_cap)
+        dead = self.db.release_outbox(
+            claim_token, [message.id for message in failed], datetime.utcnow() + timedelta(seconds=delay),
+            str(error)[:1000], 0 if is_permanent(error) else self.max_attempts
+        )
+        with self._lock:
+            self.retried += len(failed) - dead
+            self.dead += dead
+        if dead:
+            logger.error(f"Dead-lettered {dead} outbox messages: {error}")
+        else:
+            logger.warning(f"Sending {len(failed)} outbox messages failed (attempt {attempts}), "
+                           f"retrying in {delay:.1f}s: {error}")
+
+    def _run(self) -> None:
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+            try:
+                if self.drain_once():
+                    continue
+            except Exception as e:
+                logger.error(f"Outbox sender error: {e}", exc_info=True)
+            with self._wakeup:
+                if self._stopping:
+                    return
+                self._wakeup.wait(self.poll_interval)
+
+    def stats(self) -> Dict:
+        """Return outbox depth, lag of the oldest ready message, and sender counters."""
+        by_status = self.db.get_outbox_stats()
+        oldest = by_status.get('PENDING', {}).get('oldest_available_at')
+        with self._lock:
+            return {
+                'pending': by_status.get('PENDING', {}).get('count', 0),
+                'sending': by_status.get('SENDING', {}).get('count', 0),
+                'sent': by_status.get('SENT', {}).get('count', 0),
+                'dead': by_status.get('DEAD', {}).get('count', 0),
+                'lag_seconds': round(max(0.0, (datetime.utcnow() - oldest).total_seconds()), 3) if oldest else 0.0,
+                'sent_total': self.sent,
+                'retried': self.retried,
+                'dead_total': self.dead,
+                'last_batch_ms': round(self.last_batch_seconds * 1000, 3),
+            }
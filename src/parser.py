@@ -1,28 +1,56 @@
 import re
 import uuid
 from datetime import datetime
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from .models import Assignment
 
-def parse_assignment_email(email_body: str, subject: str) -> Optional[Dict]:
-    """Parse ASSIGN email and return assignment data or None if invalid."""
-    if not subject.strip().upper().startswith('ASSIGN'):
-        return None
-    
+# The verb starts the subject and ends at whitespace: "SUBMIT2 X" and "SUBMIT: X" are not SUBMIT
+_VERB_RE = re.compile(r'([A-Z]*)(?=\s|$)')
+# Body fields where the first line wins, as SUBMIT has always read StudentID; others keep the last
+_FIRST_WINS_FIELDS = frozenset({'studentid'})
+
+class EmailTokens(NamedTuple):
+    """Subject verb, subject arguments and body key:value fields of one email."""
+    command: str
+    args: List[str]
+    fields: Dict[str, str]
+
+def tokenize_email(email_body: str, subject: str) -> EmailTokens:
+    """Read the subject verb and the body key:value lines in a single pass."""
+    upper_subject = subject.upper()
+    match = _VERB_RE.match(upper_subject)
+    command = match.group(1) if match else ''
+    args = upper_subject[match.end():].split() if match else []
+
+    # ASSIGN has always been matched on prefix only (e.g. "ASSIGNMENT", "ASSIGN:"), after leading whitespace
+    if upper_subject.lstrip().startswith('ASSIGN'):
+        command = 'ASSIGN'
+
     # Extract key:value pairs from body
     fields = {}
     for line in email_body.split('\n'):
         line = line.strip()
         if ':' in line:
             key, value = line.split(':', 1)
-            fields[key.strip().lower()] = value.strip()
-    
+            key = key.strip().lower()
+            if key not in _FIRST_WINS_FIELDS or key not in fields:
+                fields[key] = value.strip()
+
+    return EmailTokens(command, args, fields)
+
+def extract_assignment(tokens: EmailTokens) -> Optional[Dict]:
+    """Extract ASSIGN fields from tokens and return assignment data or None if invalid."""
+    if tokens.command != 'ASSIGN':
+        return None
+
+    fields = tokens.fields
+
     # Validate required fields
     required = ['title', 'class', 'deadline']
     for field in required:
         if field not in fields:
             return None
-    
+
     # Parse deadline (expects YYYY-MM-DD [HH:mm] CT format)
     try:
         deadline_str = fields['deadline'].replace('CT', '').strip()
@@ -33,12 +61,12 @@ def parse_assignment_email(email_body: str, subject: str) -> Optional[Dict]:
             deadline_at = deadline_at.replace(hour=23, minute=59)
     except ValueError:
         return None
-    
+
     # Generate assignment code
     class_code = fields['class'].replace(' ', '').upper()[:8]
     date_code = deadline_at.strftime('%m%d')
     code = f"{class_code}-{date_code}"
-    
+
     return {
         'code': code,
         'title': fields['title'],
@@ -48,70 +76,74 @@ def parse_assignment_email(email_body: str, subject: str) -> Optional[Dict]:
         'rubric': fields.get('rubric', '')
     }
 
-def parse_submission_email(email_body: str, subject: str) -> Optional[Tuple[str, str]]:
-    """Parse SUBMIT email and return (assignment_code, student_id) or None if invalid."""
-    match = re.match(r'SUBMIT\s+(\S+)', subject.upper())
-    if not match:
+def extract_submission(tokens: EmailTokens) -> Optional[Tuple[str, str]]:
+    """Extract SUBMIT fields from tokens and return (assignment_code, student_id) or None if invalid."""
+    if tokens.command != 'SUBMIT' or len(tokens.args) < 1:
         return None
-    
-    assignment_code = match.group(1)
-    
-    # Extract StudentID from body
-    student_id = None
-    for line in email_body.split('\n'):
-        line = line.strip()
-        if line.upper().startswith('STUDENTID:'):
-            student_id = line.split(':', 1)[1].strip()
-            break
-    
+
+    assignment_code = tokens.args[0]
+
+    # StudentID comes from the body
+    student_id = tokens.fields.get('studentid')
     if not student_id:
         return None
-    
+
     return (assignment_code, student_id)
 
-def parse_grade_email(email_body: str, subject: str) -> Optional[Dict]:
-    """Parse GRADE email and return grade data or None if invalid."""
-    match = re.match(r'GRADE\s+(\S+)\s+(\S+)', subject.upper())
-    if not match:
+def extract_grade(tokens: EmailTokens) -> Optional[Dict]:
+    """Extract GRADE fields from tokens and return grade data or None if invalid."""
+    if tokens.command != 'GRADE' or len(tokens.args) < 2:
         return None
-    
-    assignment_code = match.group(1)
-    student_id = match.group(2)
-    
-    # Extract grade and feedback from body
-    grade_data = {}
-    for line in email_body.split('\n'):
-        line = line.strip()
-        if ':' in line:
-            key, value = line.split(':', 1)
-            grade_data[key.strip().lower()] = value.strip()
-    
+
+    assignment_code, student_id = tokens.args[0], tokens.args[1]
+
     # Validate required fields
-    if 'grade' not in grade_data:
+    if 'grade' not in tokens.fields:
         return None
-    
+
     return {
         'assignment_code': assignment_code,
         'student_id': student_id,
-        'grade_value': grade_data['grade'],
-        'feedback_text': grade_data.get('feedback', '')
+        'grade_value': tokens.fields['grade'],
+        'feedback_text': tokens.fields.get('feedback', '')
     }
 
+def extract_return(tokens: EmailTokens) -> Optional[Tuple[str, str, Dict]]:
+    """Extract RETURN fields from tokens and return (assignment_code, student_id, grade_data) or None."""
+    if tokens.command != 'RETURN' or len(tokens.args) < 2:
+        return None
+
+    return (tokens.args[0], tokens.args[1], dict(tokens.fields))
+
+# Subject verb -> field extractor
+EXTRACTORS = {
+    'ASSIGN': extract_assignment,
+    'SUBMIT': extract_submission,
+    'GRADE': extract_grade,
+    'RETURN': extract_return,
+}
+
+def assignment_code_of(tokens: EmailTokens) -> Optional[str]:
+    """Return the assignment code an email creates (ASSIGN) or refers to, or None."""
+    if tokens.command == 'ASSIGN':
+        assignment_data = extract_assignment(tokens)
+        return assignment_data['code'] if assignment_data else None
+    if tokens.command in EXTRACTORS and tokens.args:
+        return tokens.args[0]
+    return None
+
+def parse_assignment_email(email_body: str, subject: str) -> Optional[Dict]:
+    """Parse ASSIGN email and return assignment data or None if invalid."""
+    return extract_assignment(tokenize_email(email_body, subject))
+
+def parse_submission_email(email_body: str, subject: str) -> Optional[Tuple[str, str]]:
+    """Parse SUBMIT email and return (assignment_code, student_id) or None if invalid."""
+    return extract_submission(tokenize_email(email_body, subject))
+
+def parse_grade_email(email_body: str, subject: str) -> Optional[Dict]:
+    """Parse GRADE email and return grade data or None if invalid."""
+    return extract_grade(tokenize_email(email_body, subject))
+
 def parse_return_email(email_body: str, subject: str) -> Optional[Tuple[str, str, Dict]]:
     """Parse RETURN email and return (assignment_code, student_id, grade_data) or None."""
-    match = re.match(r'RETURN\s+(\S+)\s+(\S+)', subject.upper())
-    if not match:
-        return None
-    
-    assignment_code = match.group(1)
-    student_id = match.group(2)
-    
-    # Extract grade and feedback
-    grade_data = {}
-    for line in email_body.split('\n'):
-        line = line.strip()
-        if ':' in line:
-            key, value = line.split(':', 1)
-            grade_data[key.strip().lower()] = value.strip()
-    
-    return (assignment_code, student_id, grade_data)
+    return extract_return(tokenize_email(email_body, subject))
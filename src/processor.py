@@ -1,17 +1,98 @@
+import logging
 import uuid
 from datetime import datetime, timedelta
-from typing import Optional
-from .parser import parse_assignment_email, parse_submission_email, parse_grade_email, parse_return_email
+from typing import List, Optional, Tuple
+from .parser import tokenize_email, EXTRACTORS
 from .storage import Database
-from .models import Assignment, Submission, Grade, EmailMessage, Teacher, Class
+from .cache import LookupCache, VersionPoller
+from .models import Assignment, Submission, Grade, EmailMessage, OutboxMessage, Teacher, Class
+
+logger = logging.getLogger(__name__)
 
 class EmailProcessor:
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, cache: Optional[LookupCache] = None, version_poller: Optional[VersionPoller] = None):
         self.db = db
-        self._cache = {}  # Simple session cache for email processing
+        self._cache = cache or LookupCache()  # Teacher/class lookups, bounded with TTL
+        self.db.add_write_listener(self._on_db_write)
+        # Picks up teacher/class writes made by other workers
+        self._version_poller = version_poller or VersionPoller(self.db.get_table_versions)
+        self._handlers = {
+            'ASSIGN': self._handle_assignment,
+            'SUBMIT': self._handle_submission,
+            'GRADE': self._handle_grade,
+            'RETURN': self._handle_return,  # legacy
+        }
+    
+    def process_email(self, email_content: str, from_email: str, to_emails: list, subject: str, message_id: str,
+                      raw_blob_key: Optional[str] = None, enqueue_reply: bool = False) -> str:
+        """
+        Process incoming email and return response message.
+        
+        With enqueue_reply, the reply to a recognised command is also queued in
+        the outbox, in the same transaction as the email's writes. Only callers
+        that have checked the email really came from a user (Gmail ingestion)
+        should set it.
+        """
+        email_msg, command, command_data = self._parse_email(
+            email_content, from_email, to_emails, subject, message_id, raw_blob_key
+        )
+        self._sync_cache()
+        
+        # One unit of work per email: lookups, writes and the audit row commit together
+        with self.db.transaction() as uow:
+            return self._dispatch(email_msg, command, command_data, uow, enqueue_reply)
     
-    def process_email(self, email_content: str, from_email: str, to_emails: list, subject: str, message_id: str) -> str:
-        """Process incoming email and return response message."""
+    def process_emails(self, batch: List[dict], enqueue_replies: bool = False) -> List[str]:
+        """
+        Process a batch of emails and return their responses in order.
+        
+        Each item holds the keyword arguments of process_email. Assignments,
+        students, enrollments and existing submissions referenced by the batch
+        are resolved with grouped lookups, and all writes land in one commit.
+        If that commit fails (e.g. a duplicate message_id), the batch is
+        replayed one email at a time so only the offending email fails.
+        enqueue_replies is applied to every email as process_email's enqueue_reply.
+        """
+        parsed = [self._parse_email(**item) for item in batch]
+        
+        assignment_codes = set()
+        student_ids = set()
+        for _, command, command_data in parsed:
+            if command == 'SUBMIT':
+                assignment_codes.add(command_data[0])
+                student_ids.add(command_data[1])
+            elif command == 'GRADE':
+                assignment_codes.add(command_data['assignment_code'])
+                student_ids.add(command_data['student_id'])
+            elif command == 'RETURN':
+                assignment_codes.add(command_data[0])
+                student_ids.add(command_data[1])
+        
+        self._sync_cache()
+        batch_ctx = self.db.batch(assignment_codes, student_ids)
+        responses = [
+            self._dispatch(email_msg, command, command_data, batch_ctx, enqueue_replies)
+            for email_msg, command, command_data in parsed
+        ]
+        
+        try:
+            batch_ctx.commit()
+            return responses
+        except Exception as e:
+            logger.warning(f"Batch commit failed, replaying {len(batch)} emails individually: {e}")
+        
+        responses = []
+        for item in batch:
+            try:
+                responses.append(self.process_email(**item, enqueue_reply=enqueue_replies))
+            except Exception as e:
+                logger.error(f"Error processing email {item.get('message_id')}: {e}")
+                responses.append(f"Error: {e}")
+        return responses
+    
+    def _parse_email(self, email_content: str, from_email: str, to_emails: list, subject: str, message_id: str,
+                     raw_blob_key: Optional[str] = None) -> Tuple[EmailMessage, Optional[str], object]:
+        """Build the audit record and extract command data for one email."""
         # Log the email
         email_msg = EmailMessage(
             id=str(uuid.uuid4()),
@@ -21,60 +102,84 @@ class EmailProcessor:
             subject=subject,
             message_id=message_id,
             processed_at=datetime.utcnow(),
-            parse_result=None
+            parse_result=None,
+            raw_blob_key=raw_blob_key
         )
         
-        # Try to parse as assignment
-        assignment_data = parse_assignment_email(email_content, subject)
-        if assignment_data:
-            return self._handle_assignment(assignment_data, email_msg)
-        
-        # Try to parse as submission
-        submission_data = parse_submission_email(email_content, subject)
-        if submission_data:
-            return self._handle_submission(submission_data, email_msg)
-        
-        # Try to parse as grade
-        grade_data = parse_grade_email(email_content, subject)
-        if grade_data:
-            return self._handle_grade(grade_data, email_msg)
-        
-        # Try to parse as return (legacy)
-        return_data = parse_return_email(email_content, subject)
-        if return_data:
-            return self._handle_return(return_data, email_msg)
-        
-        # Unknown command
-        email_msg.parse_result = 'UNKNOWN_COMMAND'
-        self.db.save_email_message(email_msg)
-        return "Unknown command. Please use ASSIGN, SUBMIT, or GRADE format."
+        # Tokenize once, then pick the extractor for the subject verb
+        tokens = tokenize_email(email_content, subject)
+        extractor = EXTRACTORS.get(tokens.command)
+        if extractor:
+            command_data = extractor(tokens)
+            if command_data:
+                return email_msg, tokens.command, command_data
+        return email_msg, None, None
+    
+    def _dispatch(self, email_msg: EmailMessage, command: Optional[str], command_data, store,
+                  enqueue_reply: bool = False) -> str:
+        """Run the handler for a parsed command against a UnitOfWork or BatchContext."""
+        if command:
+            reply = self._handlers[command](command_data, email_msg, store)
+        else:
+            # Unknown command
+            email_msg.parse_result = 'UNKNOWN_COMMAND'
+            store.save_email_message(email_msg)
+            reply = "Unknown command. Please use ASSIGN, SUBMIT, or GRADE format."
+        
+        # Unknown commands get no reply: they are mostly spam, bounces and auto-replies
+        if enqueue_reply and command:
+            now = datetime.utcnow()
+            subject = email_msg.subject if email_msg.subject.lower().startswith('re:') else f"Re: {email_msg.subject}"
+            store.enqueue_reply(OutboxMessage(
+                to_email=email_msg.from_email,
+                subject=subject,
+                body=reply,
+                in_reply_to=email_msg.message_id,
+                created_at=now,
+                available_at=now
+            ))
+        return reply
+    
+    def cache_stats(self) -> dict:
+        """Return hit/miss counters for the teacher/class lookup cache."""
+        return self._cache.stats()
+
+    def _on_db_write(self, table: str, key: str) -> None:
+        """Drop cached lookups for teacher/class rows that were just written."""
+        if table == 'teachers':
+            self._cache.invalidate(f"teacher_{key}")
+        elif table == 'classes':
+            self._cache.invalidate(f"class_{key}")
+    
+    def _sync_cache(self) -> None:
+        """Drop cached lookups for tables another worker has written to."""
+        changed = self._version_poller.poll()
+        if 'teachers' in changed:
+            self._cache.invalidate_prefix("teacher_")
+        if 'classes' in changed:
+            self._cache.invalidate_prefix("class_")
     
-    def _validate_teacher_authorization(self, email: str) -> Optional[Teacher]:
+    def _validate_teacher_authorization(self, email: str, store) -> Optional[Teacher]:
         """Validate teacher is authorized. Returns Teacher or None."""
-        if email not in self._cache:
-            self._cache[email] = self.db.get_teacher_by_email(email)
-        return self._cache[email]
+        return self._cache.get_or_load(f"teacher_{email}", lambda: store.get_teacher_by_email(email))
     
-    def _validate_class_exists(self, class_name: str) -> Optional[Class]:
+    def _validate_class_exists(self, class_name: str, store) -> Optional[Class]:
         """Validate class exists. Returns Class or None."""
-        cache_key = f"class_{class_name}"
-        if cache_key not in self._cache:
-            self._cache[cache_key] = self.db.get_class_by_name(class_name)
-        return self._cache[cache_key]
+        return self._cache.get_or_load(f"class_{class_name}", lambda: store.get_class_by_name(class_name))
     
-    def _handle_assignment(self, assignment_data: dict, email_msg: EmailMessage) -> str:
+    def _handle_assignment(self, assignment_data: dict, email_msg: EmailMessage, store) -> str:
         # Validate teacher is whitelisted
-        teacher = self._validate_teacher_authorization(email_msg.from_email)
+        teacher = self._validate_teacher_authorization(email_msg.from_email, store)
         if not teacher:
             email_msg.parse_result = 'TEACHER_NOT_WHITELISTED'
-            self.db.save_email_message(email_msg)
+            store.save_email_message(email_msg)
             return f"Error: Email {email_msg.from_email} is not authorized to create assignments."
         
         # Validate class exists
-        class_obj = self._validate_class_exists(assignment_data['class_name'])
+        class_obj = self._validate_class_exists(assignment_data['class_name'], store)
         if not class_obj:
             email_msg.parse_result = 'CLASS_NOT_FOUND'
-            self.db.save_email_message(email_msg)
+            store.save_email_message(email_msg)
             return f"Error: Class '{assignment_data['class_name']}' not found."
         
         # Create assignment object
@@ -93,44 +198,37 @@ class EmailProcessor:
         )
         
         # Save assignment
-        self.db.save_assignment(assignment)
+        store.save_assignment(assignment)
         
         # Log success
         email_msg.parse_result = f'ASSIGNMENT_CREATED:{assignment.code}'
-        self.db.save_email_message(email_msg)
+        store.save_email_message(email_msg)
         
         return f"Assignment '{assignment.title}' created successfully. Code: {assignment.code}"
     
-    def _handle_submission(self, submission_data: tuple, email_msg: EmailMessage) -> str:
+    def _handle_submission(self, submission_data: tuple, email_msg: EmailMessage, store) -> str:
         assignment_code, student_id = submission_data
         
         # Find assignment
-        assignment = self.db.get_assignment_by_code(assignment_code)
+        assignment = store.get_assignment_by_code(assignment_code)
         if not assignment:
             email_msg.parse_result = 'ASSIGNMENT_NOT_FOUND'
-            self.db.save_email_message(email_msg)
+            store.save_email_message(email_msg)
             return f"Assignment {assignment_code} not found."
         
         # Validate student exists
-        student = self.db.get_student_by_id(student_id)
+        student = store.get_student_by_id(student_id)
         if not student:
             email_msg.parse_result = 'STUDENT_NOT_FOUND'
-            self.db.save_email_message(email_msg)
+            store.save_email_message(email_msg)
             return f"Student {student_id} not found."
         
         # Validate student is enrolled in the class
-        if not self.db.is_student_enrolled_in_class(student_id, assignment.class_id):
+        if not store.is_student_enrolled_in_class(student_id, assignment.class_id):
             email_msg.parse_result = 'STUDENT_NOT_ENROLLED'
-            self.db.save_email_message(email_msg)
+            store.save_email_message(email_msg)
             return f"Student {student_id} is not enrolled in this class."
         
-        # Check if already submitted
-        existing = self.db.get_submission_by_assignment_and_student(assignment.id, student_id)
-        if existing:
-            email_msg.parse_result = 'DUPLICATE_SUBMISSION'
-            self.db.save_email_message(email_msg)
-            return "Submission already received. Contact admin to request changes."
-        
         # Determine if on-time (including grace period)
         now = datetime.utcnow()
         grace_deadline = assignment.deadline_at + timedelta(days=assignment.grace_days)
@@ -146,37 +244,41 @@ class EmailProcessor:
             status='RECEIVED'
         )
         
-        self.db.save_submission(submission)
+        # Insert unless already submitted (single conflict-aware statement)
+        if not store.insert_submission_if_absent(submission):
+            email_msg.parse_result = 'DUPLICATE_SUBMISSION'
+            store.save_email_message(email_msg)
+            return "Submission already received. Contact admin to request changes."
         
         email_msg.parse_result = f'SUBMISSION_RECEIVED:{submission.id}'
-        self.db.save_email_message(email_msg)
+        store.save_email_message(email_msg)
         
         status = "on time" if on_time else "late"
         return f"Submission received {status} for {assignment_code} (Student {student_id})."
     
-    def _handle_grade(self, grade_data: dict, email_msg: EmailMessage) -> str:
+    def _handle_grade(self, grade_data: dict, email_msg: EmailMessage, store) -> str:
         assignment_code = grade_data['assignment_code']
         student_id = grade_data['student_id']
         
         # Validate teacher is whitelisted
-        teacher = self._validate_teacher_authorization(email_msg.from_email)
+        teacher = self._validate_teacher_authorization(email_msg.from_email, store)
         if not teacher:
             email_msg.parse_result = 'TEACHER_NOT_WHITELISTED'
-            self.db.save_email_message(email_msg)
+            store.save_email_message(email_msg)
             return f"Error: Email {email_msg.from_email} is not authorized to grade assignments."
         
         # Find assignment
-        assignment = self.db.get_assignment_by_code(assignment_code)
+        assignment = store.get_assignment_by_code(assignment_code)
         if not assignment:
             email_msg.parse_result = 'ASSIGNMENT_NOT_FOUND'
-            self.db.save_email_message(email_msg)
+            store.save_email_message(email_msg)
             return f"Assignment {assignment_code} not found."
         
         # Check if student has submitted
-        submission = self.db.get_submission_by_assignment_and_student(assignment.id, student_id)
+        submission = store.get_submission_by_assignment_and_student(assignment.id, student_id)
         if not submission:
             email_msg.parse_result = 'NO_SUBMISSION_FOUND'
-            self.db.save_email_message(email_msg)
+            store.save_email_message(email_msg)
             return f"No submission found for student {student_id} on assignment {assignment_code}."
         
         # Create grade
@@ -189,28 +291,28 @@ class EmailProcessor:
             graded_at=datetime.utcnow()
         )
         
-        self.db.save_grade(grade)
+        store.save_grade(grade)
         
         email_msg.parse_result = f'GRADE_RECEIVED:{grade.id}'
-        self.db.save_email_message(email_msg)
+        store.save_email_message(email_msg)
         
         return f"Grade recorded for student {student_id} on assignment {assignment_code}: {grade.grade_value}"
     
-    def _handle_return(self, return_data: tuple, email_msg: EmailMessage) -> str:
+    def _handle_return(self, return_data: tuple, email_msg: EmailMessage, store) -> str:
         assignment_code, student_id, grade_data = return_data
         
         # Find assignment
-        assignment = self.db.get_assignment_by_code(assignment_code)
+        assignment = store.get_assignment_by_code(assignment_code)
         if not assignment:
             email_msg.parse_result = 'ASSIGNMENT_NOT_FOUND'
-            self.db.save_email_message(email_msg)
+            store.save_email_message(email_msg)
             return f"Assignment {assignment_code} not found."
         
         # Check if student has submitted
-        submission = self.db.get_submission_by_assignment_and_student(assignment.id, student_id)
+        submission = store.get_submission_by_assignment_and_student(assignment.id, student_id)
         if not submission:
             email_msg.parse_result = 'NO_SUBMISSION_FOUND'
-            self.db.save_email_message(email_msg)
+            store.save_email_message(email_msg)
             return f"No submission found for student {student_id} on assignment {assignment_code}."
         
         # Create grade
@@ -223,9 +325,9 @@ class EmailProcessor:
             graded_at=datetime.utcnow()
         )
         
-        self.db.save_grade(grade)
+        store.save_grade(grade)
         
         email_msg.parse_result = f'GRADE_RECEIVED:{grade.id}'
-        self.db.save_email_message(email_msg)
+        store.save_email_message(email_msg)
         
         return f"Grade recorded for student {student_id} on assignment {assignment_code}: {grade.grade_value}"
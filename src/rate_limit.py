@@ -0,0 +1,208 @@
+"""
+Quota-aware rate limiting and retry for Gmail API calls.
+Gmail meters each user in quota units per second, with a cost per method.
+A token bucket shared by every GmailClient call for the mailbox keeps us
+under that budget. Throttled (429, rate-limit 403) and transient (5xx) errors
+are retried with jittered exponential backoff, honoring Retry-After.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+from googleapiclient.errors import HttpError
+from .retry import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# Gmail per-user quota: 250 units/second; per-method costs from the Gmail API usage limits
+DEFAULT_UNITS_PER_SECOND = 250.0
+GMAIL_QUOTA_UNITS = {
+    'messages.get': 5,
+    'messages.list': 5,
+    'messages.send': 100,
+    'history.list': 2,
+    'getProfile': 1,
+    'watch': 100,
+}
+DEFAULT_METHOD_UNITS = 5
+DEFAULT_MAX_RETRIES = 5
+
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until enough tokens have accrued."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize bucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum stored tokens, i.e. the largest burst (default: one second's worth)
+            clock: Monotonic time source (injectable for tests)
+            sleep: Blocking sleep (injectable for tests)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated_at = clock()
+
+    def acquire(self, tokens: float) -> float:
+        """
+        Take tokens, waiting as needed. Returns the seconds spent waiting.
+
+        A request larger than the capacity waits for a full bucket and leaves it
+        in debt, so later callers wait until the excess has been paid back.
+        """
+        needed = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                # Tolerance keeps float rounding from leaving a shortfall too small to sleep off
+                if self._tokens >= needed - 1e-9:
+                    self._tokens = max(self._tokens, needed) - tokens
+                    return waited
+                wait = (needed - self._tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+
+def is_retryable(error: Exception, idempotent: bool = True) -> bool:
+    """
+    Return whether a failed call may be retried.
+
+    Throttling (429, 403 rate-limit reasons) is always retryable because the
+    call was rejected before doing anything. Server errors (5xx) are retried
+    only for idempotent calls, so a send is never duplicated.
+    """
+    if not isinstance(error, HttpError):
+        return False
+    status = error.resp.status
+    if status == 429 or (status == 403 and any(reason in str(error.content) for reason in RATE_LIMIT_REASONS)):
+        return True
+    return idempotent and 500 <= status < 600
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Return the Retry-After delay carried by an HttpError, if any."""
+    if not isinstance(error, HttpError):
+        return None
+    value = error.resp.get('retry-after')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class QuotaLimiter:
+    """Meters Gmail calls against a shared quota bucket and retries throttled calls."""
+
+    def __init__(self, units_per_second: float = DEFAULT_UNITS_PER_SECOND,
+                 method_units: Optional[Dict[str, int]] = None, max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_base: float = 1.0, backoff_cap: float = 32.0,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize limiter.
+
+        Args:
+            units_per_second: Quota units the mailbox may spend per second
+            method_units: Quota cost per method name (default: GMAIL_QUOTA_UNITS)
+            max_retries: Retries after the first attempt before giving up
+            backoff_base: First retry delay ceiling in seconds (doubles per retry)
+            backoff_cap: Maximum retry delay ceiling in seconds
+            clock: Monotonic time source (injectable for tests)
+            sleep: Blocking sleep (injectable for tests)
+        """
+        self.bucket = TokenBucket(units_per_second, clock=clock, sleep=sleep)
+        self.method_units = method_units or GMAIL_QUOTA_UNITS
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.units = 0
+        self.throttled = 0      # calls that had to wait for quota, or were rejected with 429/403
+        self.retried = 0
+        self.failed = 0         # calls that gave up after max_retries
+        self.wait_seconds = 0.0
+
+    def units_for(self, method: str, count: int = 1) -> int:
+        """Quota cost of `count` calls to `method`."""
+        return self.method_units.get(method, DEFAULT_METHOD_UNITS) * count
+
+    def acquire(self, method: str, count: int = 1) -> None:
+        """Wait until the quota allows `count` calls to `method`."""
+        units = self.units_for(method, count)
+        waited = self.bucket.acquire(units)
+        with self._lock:
+            self.calls += count
+            self.units += units
+            self.wait_seconds += waited
+            if waited:
+                self.throttled += 1
+
+    def backoff(self, attempt: int, error: Exception) -> None:
+        """Sleep before retry number `attempt`, honoring Retry-After when given."""
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+        with self._lock:
+            self.retried += 1
+            if error.resp.status in (403, 429):
+                self.throttled += 1
+            self.wait_seconds += delay
+        logger.warning(f"Gmail call throttled or failed ({error.resp.status}), retry {attempt} in {delay:.2f}s")
+        self._sleep(delay)
+
+    def call(self, method: str, fn: Callable[[], Dict], idempotent: bool = True, count: int = 1) -> Dict:
+        """
+        Run fn() under the quota, retrying throttled and transient failures.
+
+        Args:
+            method: Gmail method name used for quota costing (e.g. 'messages.get')
+            fn: Performs the API call (e.g. lambda: request.execute())
+            idempotent: Whether 5xx errors may be retried (False for sends)
+            count: Calls made by fn (a batch request costs each call it carries)
+        """
+        attempt = 0
+        while True:
+            self.acquire(method, count)
+            try:
+                return fn()
+            except HttpError as e:
+                if not is_retryable(e, idempotent) or attempt >= self.max_retries:
+                    if is_retryable(e, idempotent):
+                        with self._lock:
+                            self.failed += 1
+                    raise
+                attempt += 1
+                self.backoff(attempt, e)
+
+    def give_up(self) -> None:
+        """Count a call abandoned by a caller running its own retry loop."""
+        with self._lock:
+            self.failed += 1
+
+    def stats(self) -> Dict:
+        """Return call, quota and throttling counters."""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'units': self.units,
+                'throttled': self.throttled,
+                'retried': self.retried,
+                'failed': self.failed,
+                'wait_seconds': round(self.wait_seconds, 3),
+            }
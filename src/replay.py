@@ -0,0 +1,178 @@
+"""
+Replay of production email traffic from the email_messages audit log.
+export_trace writes a time-ordered window of inbound emails, with bodies
+recovered from the raw MIME blob store where archived, to a gzipped JSONL
+trace. replay_trace re-drives a trace through an EmailProcessor (normally
+against a fresh database holding only the roster) at the original pacing,
+an N× multiple of it or as fast as possible, and compares the resulting
+parse_result distribution with the recorded one.
+"""
+
+import gzip
+import json
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from .blob_store import BlobStore, BlobNotFoundError
+from .bulk_import import parse_email_bytes
+from .bench import percentile
+from .executor import KeyedExecutor
+from .gmail_ingestion import ordering_keys
+from .processor import EmailProcessor
+from .storage import Database
+
+logger = logging.getLogger(__name__)
+
+EXPORT_PAGE_SIZE = 1000
+RESULTS_CHUNK_SIZE = 500
+
+
+def result_kind(parse_result: Optional[str]) -> str:
+    """parse_result without its ID suffix, e.g. SUBMISSION_RECEIVED:<id> -> SUBMISSION_RECEIVED."""
+    return (parse_result or 'NONE').split(':')[0]
+
+
+def _stored_body(blob_store: Optional[BlobStore], key: Optional[str]) -> Optional[str]:
+    if blob_store is None or key is None:
+        return None
+    try:
+        return parse_email_bytes(blob_store.get(key), key)['email_content']
+    except BlobNotFoundError:
+        return None
+
+
+def export_trace(db: Database, path: str, since: datetime, until: datetime,
+                 blob_store: Optional[BlobStore] = None) -> Dict:
+    """
+    Export inbound emails processed in [since, until) to a JSONL.gz trace, oldest first.
+
+    Args:
+        db: Database holding the email log
+        path: Trace file to write
+        since, until: Window of processed_at times
+        blob_store: Store holding archived raw MIME (default: bodies are not exported)
+
+    Returns:
+        {'records': exported emails, 'with_body': those whose body was recovered}
+    """
+    records = with_body = 0
+    after = None
+    with gzip.open(path, 'wt', encoding='utf-8') as trace:
+        while True:
+            page, after = db.get_email_messages_page(since, until, EXPORT_PAGE_SIZE, after)
+            for message in page:
+                body = _stored_body(blob_store, message.raw_blob_key)
+                trace.write(json.dumps({
+                    'at': message.processed_at.isoformat(),
+                    'from': message.from_email,
+                    'to': message.to_emails,
+                    'subject': message.subject,
+                    'message_id': message.message_id,
+                    'parse_result': message.parse_result,
+                    'body': body,
+                }, separators=(',', ':')) + '\n')
+                records += 1
+                with_body += body is not None
+            if after is None:
+                break
+    return {'records': records, 'with_body': with_body}
+
+
+def load_trace(path: str) -> Iterator[Dict]:
+    """Yield the records of a trace file in order."""
+    with gzip.open(path, 'rt', encoding='utf-8') as trace:
+        for line in trace:
+            if line.strip():
+                yield json.loads(line)
+
+
+def replay_trace(path: str, processor: EmailProcessor, db: Database, speed: float = 1.0, workers: int = 1,
+                 max_in_flight: int = 100) -> Dict:
+    """
+    Re-drive a trace through a processor and compare parse_results with the recorded ones.
+
+    Args:
+        path: Trace written by export_trace
+        processor: Processor bound to the target database
+        db: Target database (normally fresh, holding only the roster)
+        speed: Time multiple of the original pacing (2.0 = twice as fast; 0 = as fast as possible)
+        workers: Processing threads; emails from one sender or about one assignment stay in order
+        max_in_flight: Emails allowed to be queued or processing before the replay waits
+
+    Returns:
+        Report with throughput, latency (from each email's scheduled arrival to
+        its commit) and the original vs replayed parse_result distribution
+    """
+    if speed < 0:
+        raise ValueError("speed must be 0 (as fast as possible) or positive")
+    original = Counter()
+    replayed = Counter()
+    pending: List[Tuple[str, str, object]] = []  # (message_id, original kind, future)
+    latencies: List[float] = []
+    mismatched = errors = without_body = 0
+
+    def process(record: Dict, scheduled: float) -> Tuple[float, Optional[str]]:
+        error = None
+        try:
+            processor.process_email(email_content=record.get('body') or '', from_email=record['from'],
+                                    to_emails=record['to'], subject=record['subject'],
+                                    message_id=record['message_id'])
+        except Exception as e:
+            error = str(e)
+        return time.perf_counter() - scheduled, error
+
+    def collect(entries: List[Tuple[str, str, object]]) -> None:
+        nonlocal mismatched, errors
+        outcomes = [future.result() for _, _, future in entries]
+        results = db.get_parse_results(message_id for message_id, _, _ in entries)
+        for (message_id, expected, _), (latency, error) in zip(entries, outcomes):
+            latencies.append(latency)
+            if error is not None:
+                errors += 1
+                logger.warning(f"Replaying {message_id} failed: {error}")
+            kind = 'ERROR' if error is not None else result_kind(results.get(message_id))
+            replayed[kind] += 1
+            mismatched += kind != expected
+
+    started = time.perf_counter()
+    first_at = None
+    with KeyedExecutor("replay", workers, max_in_flight) as lanes:
+        for record in load_trace(path):
+            at = datetime.fromisoformat(record['at'])
+            first_at = first_at or at
+            scheduled = time.perf_counter()
+            if speed > 0:
+                scheduled = started + (at - first_at).total_seconds() / speed
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            expected = result_kind(record.get('parse_result'))
+            original[expected] += 1
+            without_body += record.get('body') is None
+            keys = ordering_keys(record['from'], record['subject'], record.get('body')) or (record['message_id'],)
+            pending.append((record['message_id'], expected, lanes.submit(keys, process, record, scheduled)))
+            if len(pending) >= 2 * RESULTS_CHUNK_SIZE:
+                # The older half is done (or nearly), so reading its results doesn't stall pacing
+                collect(pending[:RESULTS_CHUNK_SIZE])
+                pending = pending[RESULTS_CHUNK_SIZE:]
+        collect(pending)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    total = sum(original.values())
+    return {
+        'emails': total,
+        'without_body': without_body,
+        'errors': errors,
+        'elapsed_seconds': round(elapsed, 3),
+        'emails_per_second': round(total / elapsed, 1) if elapsed > 0 else 0.0,
+        'latency_ms': {p: round(percentile(latencies, value) * 1000, 1)
+                       for p, value in (('p50', 50), ('p95', 95), ('p99', 99))},
+        'mismatched': mismatched,
+        'parse_results': {
+            kind: {'original': original[kind], 'replayed': replayed[kind], 'delta': replayed[kind] - original[kind]}
+            for kind in sorted(set(original) | set(replayed))
+        },
+    }
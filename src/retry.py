@@ -0,0 +1,20 @@
+"""
+Retry timing shared by the ingestion queue and Gmail client.
+Exponential backoff with jitter, so retries from many workers spread out
+instead of arriving together.
+"""
+
+import random
+from typing import Callable
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 300.0,
+                  rand: Callable[[], float] = random.random) -> float:
+    """
+    Return seconds to wait before retry number `attempt` (1-based).
+
+    The ceiling doubles each attempt up to `cap`; the delay is drawn from the
+    upper half of [0, ceiling] ("equal jitter"), so it never collapses to zero.
+    """
+    ceiling = min(cap, base * (2 ** max(attempt - 1, 0)))
+    return ceiling / 2 + rand() * ceiling / 2
@@ -0,0 +1,211 @@
+"""
+Roster import from CSV exports of the roster Sheet tabs.
+A directory holds teachers.csv, classes.csv, students.csv, parents.csv and
+enrollments.csv (any may be missing), with columns named after the model
+fields and one row per record keyed by `id`. Each file is streamed in chunks;
+every chunk is validated, diffed against the database with one lookup, and
+written with bulk INSERTs for new rows and executemany UPDATEs for changed
+ones. When enrollments.csv is present, active enrollments missing from it are
+deactivated with one set-based UPDATE, and every class whose roster changed
+gets its roster_version bumped once. The import runs in a single transaction.
+"""
+
+import csv
+import logging
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import Column, MetaData, String, Table, and_, insert, select, update
+from sqlalchemy.orm import Session
+from .mapping import RowMapper, TEACHERS, CLASSES, STUDENTS, PARENTS, ENROLLMENTS
+from .models import (
+    Teacher, Class, Student, Parent, Enrollment,
+    TeacherDB, ClassDB, StudentDB, ParentDB, EnrollmentDB, TermDB
+)
+from .storage import Database, _chunks
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+class RosterTab(NamedTuple):
+    """One roster Sheet tab and the table it is imported into."""
+    name: str
+    model: type
+    table: type
+    mapper: RowMapper
+    references: Dict[str, object]  # field -> column the value must exist in
+    managed: Tuple[str, ...] = ()  # columns maintained by the app, never imported
+
+
+# In dependency order, so references resolve against rows imported earlier in the same pass
+TABS = [
+    RosterTab('teachers', Teacher, TeacherDB, TEACHERS, {}),
+    RosterTab('classes', Class, ClassDB, CLASSES, {'term_id': TermDB.id, 'teacher_id': TeacherDB.id},
+              managed=('roster_version',)),
+    RosterTab('students', Student, StudentDB, STUDENTS, {}),
+    RosterTab('parents', Parent, ParentDB, PARENTS, {}),
+    # Enrollments refer to students by student code, as the email handlers do
+    RosterTab('enrollments', Enrollment, EnrollmentDB, ENROLLMENTS,
+              {'class_id': ClassDB.id, 'student_id': StudentDB.student_id, 'parent_id': ParentDB.id},
+              managed=('joined_at', 'left_at', 'active')),
+]
+
+
+def _seen_table(tab: str) -> Table:
+    """Temporary table of the ids imported for a tab, so the diff never holds them in memory."""
+    return Table(f"roster_import_{tab}", MetaData(), Column('id', String, primary_key=True), prefixes=['TEMPORARY'])
+
+
+class RosterImporter:
+    """Imports a directory of roster CSV exports in one streaming pass."""
+
+    def __init__(self, db: Database, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Initialize importer.
+
+        Args:
+            db: Database instance
+            chunk_size: Rows validated, diffed and written together
+        """
+        self.db = db
+        self.chunk_size = chunk_size
+
+    def import_directory(self, path: str, now: Optional[datetime] = None) -> Dict:
+        """
+        Import every tab CSV found in a directory.
+
+        Args:
+            path: Directory holding <tab>.csv files
+            now: Time recorded as joined_at/left_at of enrollment changes (default: utcnow)
+
+        Returns:
+            Counts per tab (inserted, updated, unchanged, invalid), enrollments
+            deactivated, classes whose roster_version was bumped, and the first
+            validation errors as {'tab', 'line', 'error'}
+        """
+        now = now or datetime.utcnow()
+        report = {'errors': []}
+        affected_classes: Set[str] = set()
+        with self.db.transaction() as uow:
+            session = uow.session
+            for tab in TABS:
+                file_path = os.path.join(path, f"{tab.name}.csv")
+                if not os.path.exists(file_path):
+                    continue
+                seen = _seen_table(tab.name)
+                seen.create(session.connection())
+                counts = Counter({'inserted': 0, 'updated': 0, 'unchanged': 0, 'invalid': 0})
+                with open(file_path, newline='', encoding='utf-8-sig') as f:
+                    for chunk in _chunks(enumerate(csv.DictReader(f), start=2), self.chunk_size):
+                        self._import_chunk(session, tab, seen, chunk, now, counts, report['errors'],
+                                           affected_classes)
+                report[tab.name] = dict(counts)
+                if tab.name == 'enrollments':
+                    report['enrollments_deactivated'] = self._deactivate_missing(session, seen, now,
+                                                                                 affected_classes)
+                seen.drop(session.connection())
+            report['classes_bumped'] = self.db.bump_roster_versions(affected_classes, session=session)
+        return report
+
+    @staticmethod
+    def _parse(tab: RosterTab, row: Dict, now: datetime) -> Tuple[BaseModel, Set[str]]:
+        """Validate one CSV row. Returns the model and the columns the row sets; raises ValidationError."""
+        fields = tab.model.model_fields
+        values = {
+            key.strip(): value.strip() if value.strip() else None
+            for key, value in row.items()
+            if key and key.strip() in fields and key.strip() not in tab.managed and value is not None
+        }
+        columns = set(values) - {'id'}
+        if tab.name == 'enrollments':
+            # Listed enrollments are active; joined_at is only set when the row is created
+            values.update(active=True, left_at=None, joined_at=now)
+            columns |= {'active', 'left_at'}
+        return tab.model(**{key: value for key, value in values.items() if value is not None}), columns
+
+    def _import_chunk(self, session: Session, tab: RosterTab, seen: Table, chunk: List[Tuple[int, Dict]],
+                      now: datetime, counts: Counter, errors: List[Dict], affected_classes: Set[str]) -> None:
+        parsed = []
+        chunk_ids = set()
+        for line, row in chunk:
+            try:
+                model, columns = self._parse(tab, row, now)
+            except ValidationError as e:
+                self._invalid(tab, line, '; '.join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+                                                   for err in e.errors()), counts, errors)
+                continue
+            if model.id in chunk_ids:
+                self._invalid(tab, line, f"duplicate id {model.id}", counts, errors)
+                continue
+            chunk_ids.add(model.id)
+            parsed.append((line, model, columns))
+
+        # Duplicates of ids from earlier chunks, and references to rows that don't exist
+        earlier = self.db.get_existing_keys(seen.c.id, chunk_ids, session=session)
+        known = {
+            field: self.db.get_existing_keys(column, {getattr(model, field) for _, model, _ in parsed}, session=session)
+            for field, column in tab.references.items()
+        }
+        valid = []
+        for line, model, columns in parsed:
+            if model.id in earlier:
+                self._invalid(tab, line, f"duplicate id {model.id}", counts, errors)
+                continue
+            missing = [f"{field} {getattr(model, field)} not found" for field in tab.references
+                       if getattr(model, field) not in known[field]]
+            if missing:
+                self._invalid(tab, line, '; '.join(missing), counts, errors)
+                continue
+            valid.append((model, columns))
+        if not valid:
+            return
+        session.execute(insert(seen), [{'id': model.id} for model, _ in valid])
+
+        existing = self.db.get_rows_by_ids(tab.table, (model.id for model, _ in valid), session=session)
+        new_rows, changed_rows = [], []
+        for model, columns in valid:
+            values = tab.mapper.to_values(model)
+            current = existing.get(model.id)
+            if current is None:
+                new_rows.append(values)
+                if tab.name == 'enrollments':
+                    affected_classes.add(model.class_id)
+                continue
+            changes = {column: values[column] for column in sorted(columns) if values[column] != current[column]}
+            if not changes:
+                counts['unchanged'] += 1
+                continue
+            changed_rows.append({'id': model.id, **changes})
+            if tab.name == 'enrollments':
+                affected_classes.update({model.class_id, current['class_id']})
+        # executemany needs the same keys in every row, so group updates by changed columns
+        by_columns: Dict[Tuple[str, ...], List[Dict]] = {}
+        for row in changed_rows:
+            by_columns.setdefault(tuple(row), []).append(row)
+        for rows in by_columns.values():
+            self.db.update_rows(tab.table, rows, session=session)
+        if new_rows:
+            self.db.bulk_insert(tab.table, new_rows, session=session)
+        counts['inserted'] += len(new_rows)
+        counts['updated'] += len(changed_rows)
+
+    @staticmethod
+    def _invalid(tab: RosterTab, line: int, error: str, counts: Counter, errors: List[Dict]) -> None:
+        counts['invalid'] += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'tab': tab.name, 'line': line, 'error': error})
+        logger.warning(f"Skipping {tab.name}.csv line {line}: {error}")
+
+    @staticmethod
+    def _deactivate_missing(session: Session, seen: Table, now: datetime, affected_classes: Set[str]) -> int:
+        """Deactivate active enrollments absent from the import, set-based. Returns the number deactivated."""
+        missing = and_(EnrollmentDB.active.is_(True), EnrollmentDB.id.not_in(select(seen.c.id)))
+        affected_classes.update(session.execute(select(EnrollmentDB.class_id).where(missing).distinct()).scalars())
+        return session.execute(
+            update(EnrollmentDB).where(missing).values(active=False, left_at=now)
+        ).rowcount
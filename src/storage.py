@@ -1,15 +1,47 @@
-import json
+import io
 import uuid
 import os
-from typing import Optional, List
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
+from typing import Optional, List, Dict, Set, Tuple, Iterable, Iterator, Callable
+from sqlalchemy import create_engine, event, text, insert, update, select, bindparam, and_, or_, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker, Session
 from .models import (
-    Assignment, Submission, Grade, EmailMessage, Student, Teacher, Class, Term, Enrollment, Parent,
-    AssignmentDB, SubmissionDB, GradeDB, EmailMessageDB, StudentDB, TeacherDB, ClassDB, TermDB, EnrollmentDB, ParentDB
+    Assignment, Submission, Grade, EmailMessage, Student, Teacher, Class, Term, Enrollment, Parent, OutboxMessage,
+    AssignmentDB, SubmissionDB, GradeDB, EmailMessageDB, StudentDB, TeacherDB, ClassDB, TermDB, EnrollmentDB, ParentDB,
+    CacheVersionDB, GmailSyncStateDB, ProcessedMessageDB, IngestionQueueDB, RawBlobDB, OutboxDB
+)
+from .mapping import (
+    ASSIGNMENTS, SUBMISSIONS, GRADES, EMAIL_MESSAGES, STUDENTS, TEACHERS, PARENTS, TERMS, CLASSES, ENROLLMENTS, OUTBOX
 )
 from datetime import datetime
 
+# Keep IN (...) lists well below SQLite's bound-parameter limit
+IN_CLAUSE_CHUNK_SIZE = 500
+# Rows per bulk_insert statement (or COPY) and commit
+BULK_INSERT_CHUNK_SIZE = 10000
+# Tables whose rows feed cached lookups (see _bump_table_version)
+CACHED_TABLES = ('teachers', 'classes')
+
+def _chunks(values: Iterable, size: int = IN_CLAUSE_CHUNK_SIZE):
+    """Yield successive lists of at most `size` values, consuming `values` lazily."""
+    iterator = iter(values)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _copy_field(value) -> str:
+    """Render a value for COPY ... (FORMAT csv): NULL unquoted, everything else quoted."""
+    if value is None:
+        return ''
+    text_value = value.isoformat(sep=' ') if isinstance(value, datetime) else str(value)
+    return '"' + text_value.replace('"', '""') + '"'
+
 class Database:
     def __init__(self, db_url: Optional[str] = None):
         if db_url is None:
@@ -22,6 +54,7 @@ class Database:
             raise ConnectionError(f"Failed to create database engine: {str(e)}. Check DATABASE_URL configuration.") from e
         
         self.SessionLocal = sessionmaker(bind=self.engine)
+        self._write_listeners: List[Callable[[str, str], None]] = []
         
         # Create tables with error handling
         from .models import Base
@@ -30,289 +63,515 @@ class Database:
         except Exception as e:
             raise ConnectionError(f"Failed to create database tables: {str(e)}. Ensure database is accessible.") from e
     
-    def save_assignment(self, assignment: Assignment) -> None:
+    @contextmanager
+    def _session(self, session: Optional[Session] = None) -> Iterator[Session]:
+        """Yield the caller's session as-is, or open a new one that commits on exit."""
+        if session is not None:
+            yield session
+            return
         with self.SessionLocal() as session:
-            db_assignment = AssignmentDB(
-                id=assignment.id,
-                code=assignment.code,
-                class_id=assignment.class_id,
-                title=assignment.title,
-                instructions=assignment.instructions,
-                deadline_at=assignment.deadline_at,
-                deadline_tz=assignment.deadline_tz,
-                created_by_teacher_id=assignment.created_by_teacher_id,
-                status=assignment.status,
-                grace_days=assignment.grace_days,
-                created_at=assignment.created_at
-            )
-            session.add(db_assignment)
+            yield session
             session.commit()
     
-    def get_assignment_by_code(self, code: str) -> Optional[Assignment]:
-        with self.SessionLocal() as session:
-            db_assignment = session.query(AssignmentDB).filter_by(code=code).first()
-            if not db_assignment:
+    def add_write_listener(self, listener: Callable[[str, str], None]) -> None:
+        """Register a callback invoked as listener(table, key) once a write to a cached lookup row commits."""
+        self._write_listeners.append(listener)
+    
+    def _notify_write(self, session: Session, table: str, key: str) -> None:
+        """
+        Notify write listeners when the session's transaction commits (never if it
+        rolls back). Notifying earlier, inside a caller's unit of work, would let a
+        concurrent lookup re-cache the old row after the invalidation.
+        """
+        def notify(session: Session) -> None:
+            for listener in self._write_listeners:
+                listener(table, key)
+        event.listen(session, 'after_commit', notify, once=True)
+    
+    def _bump_table_version(self, session: Session, table: str) -> None:
+        """Advance the shared change counter other workers poll to invalidate their caches."""
+        updated = session.query(CacheVersionDB).filter_by(table_name=table).update(
+            {CacheVersionDB.version: CacheVersionDB.version + 1}, synchronize_session=False
+        )
+        if not updated:
+            session.add(CacheVersionDB(table_name=table, version=1))
+    
+    def get_table_versions(self, session: Optional[Session] = None) -> Dict[str, int]:
+        """Get the change counter of every table that cached lookups depend on."""
+        with self._session(session) as session:
+            return dict(session.query(CacheVersionDB.table_name, CacheVersionDB.version).all())
+    
+    def get_gmail_sync_state(self, mailbox: str, session: Optional[Session] = None) -> Optional[Tuple[str, datetime]]:
+        """Get the (history_id, synced_at) checkpoint for a mailbox, or None before the first sync."""
+        with self._session(session) as session:
+            row = session.query(GmailSyncStateDB.history_id, GmailSyncStateDB.synced_at).filter_by(
+                mailbox=mailbox
+            ).first()
+            return tuple(row) if row else None
+    
+    def save_gmail_sync_state(self, mailbox: str, history_id: str, synced_at: datetime,
+                              session: Optional[Session] = None) -> None:
+        """Record the last Gmail historyId fully processed for a mailbox."""
+        with self._session(session) as session:
+            session.merge(GmailSyncStateDB(mailbox=mailbox, history_id=history_id, synced_at=synced_at))
+    
+    def get_processed_gmail_ids(self, gmail_ids: Iterable[str], session: Optional[Session] = None) -> Set[str]:
+        """Return the subset of Gmail message IDs already recorded as processed."""
+        found = set()
+        with self._session(session) as session:
+            for chunk in _chunks(set(gmail_ids)):
+                found.update(
+                    session.execute(
+                        select(ProcessedMessageDB.gmail_id).where(ProcessedMessageDB.gmail_id.in_(chunk))
+                    ).scalars()
+                )
+        return found
+    
+    def is_rfc_message_processed(self, rfc_message_id: str, session: Optional[Session] = None) -> bool:
+        """Check whether a message with this Message-ID header was already processed."""
+        with self._session(session) as session:
+            return session.execute(
+                select(ProcessedMessageDB.gmail_id).where(
+                    ProcessedMessageDB.rfc_message_id == rfc_message_id
+                ).limit(1)
+            ).first() is not None
+    
+    def mark_message_processed(self, gmail_id: str, rfc_message_id: Optional[str], processed_at: datetime,
+                               session: Optional[Session] = None) -> bool:
+        """Record a processed message. Returns False if either key was already recorded."""
+        with self._session(session) as session:
+            return self._insert_if_absent(session, ProcessedMessageDB, {
+                'gmail_id': gmail_id, 'rfc_message_id': rfc_message_id, 'processed_at': processed_at
+            })
+    
+    def delete_processed_messages_before(self, cutoff: datetime, session: Optional[Session] = None) -> int:
+        """Delete processed-message records older than cutoff. Returns the number deleted."""
+        with self._session(session) as session:
+            return session.query(ProcessedMessageDB).filter(
+                ProcessedMessageDB.processed_at < cutoff
+            ).delete(synchronize_session=False)
+    
+    def enqueue_notification(self, mailbox: str, history_id: str, enqueued_at: datetime,
+                             session: Optional[Session] = None) -> bool:
+        """Queue a Gmail notification. Returns False if the same one is already queued."""
+        with self._session(session) as session:
+            return self._insert_if_absent(session, IngestionQueueDB, {
+                'mailbox': mailbox, 'history_id': str(history_id), 'status': 'PENDING', 'attempts': 0,
+                'enqueued_at': enqueued_at, 'available_at': enqueued_at
+            }, ['mailbox', 'history_id'])
+    
+    def claim_notifications(self, now: datetime, lease_expired_before: datetime,
+                            exclude_mailboxes: Iterable[str] = ()) -> Optional[Tuple[str, str, List[Tuple[int, str, int]]]]:
+        """
+        Claim every ready notification of the mailbox with the oldest ready one.
+        
+        Ready means PENDING and past its backoff, or PROCESSING under a lease that
+        expired (its worker died). Returns (claim_token, mailbox, [(id, history_id, attempts)])
+        or None if nothing is ready.
+        """
+        ready = or_(
+            and_(IngestionQueueDB.status == 'PENDING', IngestionQueueDB.available_at <= now),
+            and_(IngestionQueueDB.status == 'PROCESSING', IngestionQueueDB.claimed_at < lease_expired_before),
+        )
+        with self._session() as session:
+            query = select(IngestionQueueDB.mailbox).where(ready)
+            exclude_mailboxes = list(exclude_mailboxes)
+            if exclude_mailboxes:
+                query = query.where(IngestionQueueDB.mailbox.notin_(exclude_mailboxes))
+            mailbox = session.execute(query.order_by(IngestionQueueDB.id).limit(1)).scalar()
+            if mailbox is None:
                 return None
-            return Assignment(
-                id=db_assignment.id,
-                code=db_assignment.code,
-                class_id=db_assignment.class_id,
-                title=db_assignment.title,
-                instructions=db_assignment.instructions,
-                deadline_at=db_assignment.deadline_at,
-                deadline_tz=db_assignment.deadline_tz,
-                created_by_teacher_id=db_assignment.created_by_teacher_id,
-                status=db_assignment.status,
-                grace_days=db_assignment.grace_days,
-                created_at=db_assignment.created_at
-            )
+            
+            # Conditional UPDATE + token: a concurrent claimer can't take the same rows
+            claim_token = str(uuid.uuid4())
+            session.query(IngestionQueueDB).filter(IngestionQueueDB.mailbox == mailbox, ready).update({
+                IngestionQueueDB.status: 'PROCESSING',
+                IngestionQueueDB.claimed_at: now,
+                IngestionQueueDB.claim_token: claim_token,
+                IngestionQueueDB.attempts: IngestionQueueDB.attempts + 1,
+            }, synchronize_session=False)
+            rows = session.execute(
+                select(IngestionQueueDB.id, IngestionQueueDB.history_id, IngestionQueueDB.attempts).where(
+                    IngestionQueueDB.claim_token == claim_token
+                )
+            ).all()
+        if not rows:
+            return None
+        return claim_token, mailbox, [tuple(row) for row in rows]
     
-    def get_all_assignments(self) -> List[Assignment]:
-        with self.SessionLocal() as session:
-            db_assignments = session.query(AssignmentDB).all()
-            return [
-                Assignment(
-                    id=assignment.id,
-                    code=assignment.code,
-                    class_id=assignment.class_id,
-                    title=assignment.title,
-                    instructions=assignment.instructions,
-                    deadline_at=assignment.deadline_at,
-                    deadline_tz=assignment.deadline_tz,
-                    created_by_teacher_id=assignment.created_by_teacher_id,
-                    status=assignment.status,
-                    grace_days=assignment.grace_days,
-                    created_at=assignment.created_at
+    def complete_notifications(self, claim_token: str, session: Optional[Session] = None) -> int:
+        """Remove the notifications held by a claim. Returns the number removed."""
+        with self._session(session) as session:
+            return session.query(IngestionQueueDB).filter(
+                IngestionQueueDB.claim_token == claim_token
+            ).delete(synchronize_session=False)
+    
+    def release_notifications(self, claim_token: str, available_at: datetime, error: str, max_attempts: int,
+                              session: Optional[Session] = None) -> int:
+        """
+        Return a failed claim's notifications to the queue, due again at available_at.
+        Notifications that have used max_attempts are parked as FAILED instead.
+        Returns the number parked as FAILED.
+        """
+        with self._session(session) as session:
+            held = session.query(IngestionQueueDB).filter(IngestionQueueDB.claim_token == claim_token)
+            failed = held.filter(IngestionQueueDB.attempts >= max_attempts).update({
+                IngestionQueueDB.status: 'FAILED',
+                IngestionQueueDB.claim_token: None,
+                IngestionQueueDB.last_error: error,
+            }, synchronize_session=False)
+            held.update({
+                IngestionQueueDB.status: 'PENDING',
+                IngestionQueueDB.available_at: available_at,
+                IngestionQueueDB.claim_token: None,
+                IngestionQueueDB.last_error: error,
+            }, synchronize_session=False)
+            return failed
+    
+    def get_ingestion_queue_stats(self, session: Optional[Session] = None) -> Dict[str, Dict]:
+        """Get {status: {'count': n, 'oldest_enqueued_at': datetime}} for queued notifications."""
+        with self._session(session) as session:
+            rows = session.execute(
+                select(IngestionQueueDB.status, func.count(), func.min(IngestionQueueDB.enqueued_at)).group_by(
+                    IngestionQueueDB.status
                 )
-                for assignment in db_assignments
-            ]
+            ).all()
+            return {status: {'count': count, 'oldest_enqueued_at': oldest} for status, count, oldest in rows}
     
-    def save_submission(self, submission: Submission) -> None:
-        with self.SessionLocal() as session:
-            db_submission = SubmissionDB(
-                id=submission.id,
-                assignment_id=submission.assignment_id,
-                student_id=submission.student_id,
-                received_at=submission.received_at,
-                on_time=submission.on_time,
-                status=submission.status
-            )
-            session.add(db_submission)
-            session.commit()
+    def enqueue_reply(self, message: OutboxMessage, session: Optional[Session] = None) -> bool:
+        """Queue an outbound reply. Returns False if a reply to the same Message-ID is already queued."""
+        values = OUTBOX.to_values(message)
+        if values['id'] is None:
+            del values['id']
+        with self._session(session) as session:
+            return self._insert_if_absent(session, OutboxDB, values, ['in_reply_to'] if message.in_reply_to else None)
     
-    def get_submission_by_assignment_and_student(self, assignment_id: str, student_id: str) -> Optional[Submission]:
-        with self.SessionLocal() as session:
-            db_submission = session.query(SubmissionDB).filter_by(
-                assignment_id=assignment_id, 
-                student_id=student_id
-            ).first()
-            if not db_submission:
+    def claim_outbox(self, now: datetime, lease_expired_before: datetime,
+                     limit: int) -> Optional[Tuple[str, List[OutboxMessage]]]:
+        """
+        Claim up to `limit` ready outbox messages, oldest first.
+        
+        Ready means PENDING and past its backoff, or SENDING under a lease that
+        expired (its worker died). Returns (claim_token, messages) or None if
+        nothing is ready.
+        """
+        ready = or_(
+            and_(OutboxDB.status == 'PENDING', OutboxDB.available_at <= now),
+            and_(OutboxDB.status == 'SENDING', OutboxDB.claimed_at < lease_expired_before),
+        )
+        with self._session() as session:
+            ids = session.execute(select(OutboxDB.id).where(ready).order_by(OutboxDB.id).limit(limit)).scalars().all()
+            if not ids:
                 return None
-            return Submission(
-                id=db_submission.id,
-                assignment_id=db_submission.assignment_id,
-                student_id=db_submission.student_id,
-                received_at=db_submission.received_at,
-                on_time=db_submission.on_time,
-                status=db_submission.status
+            
+            # Conditional UPDATE + token: a concurrent claimer can't take the same rows
+            claim_token = str(uuid.uuid4())
+            session.query(OutboxDB).filter(OutboxDB.id.in_(ids), ready).update({
+                OutboxDB.status: 'SENDING',
+                OutboxDB.claimed_at: now,
+                OutboxDB.claim_token: claim_token,
+                OutboxDB.attempts: OutboxDB.attempts + 1,
+            }, synchronize_session=False)
+            rows = session.execute(
+                select(*OUTBOX.columns).where(OutboxDB.claim_token == claim_token).order_by(OutboxDB.id)
+            ).all()
+        if not rows:
+            return None
+        return claim_token, [OUTBOX.from_row(row) for row in rows]
+    
+    def mark_outbox_sent(self, claim_token: str, gmail_message_ids: Dict[int, str], sent_at: datetime,
+                         session: Optional[Session] = None) -> int:
+        """Mark claimed messages as SENT with their Gmail IDs. Returns the number updated."""
+        updated = 0
+        with self._session(session) as session:
+            for outbox_id, gmail_message_id in gmail_message_ids.items():
+                updated += session.query(OutboxDB).filter(
+                    OutboxDB.id == outbox_id, OutboxDB.claim_token == claim_token
+                ).update({
+                    OutboxDB.status: 'SENT',
+                    OutboxDB.sent_at: sent_at,
+                    OutboxDB.gmail_message_id: gmail_message_id,
+                    OutboxDB.claim_token: None,
+                    OutboxDB.last_error: None,
+                }, synchronize_session=False)
+        return updated
+    
+    def release_outbox(self, claim_token: str, outbox_ids: Iterable[int], available_at: datetime, error: str,
+                       max_attempts: int, session: Optional[Session] = None) -> int:
+        """
+        Return claimed messages that failed to send to the queue, due again at available_at.
+        Messages that have used max_attempts (all of them, for max_attempts=0) are
+        dead-lettered as DEAD instead. Returns the number dead-lettered.
+        """
+        with self._session(session) as session:
+            held = session.query(OutboxDB).filter(
+                OutboxDB.claim_token == claim_token, OutboxDB.id.in_(list(outbox_ids))
             )
+            dead = held.filter(OutboxDB.attempts >= max_attempts).update({
+                OutboxDB.status: 'DEAD',
+                OutboxDB.claim_token: None,
+                OutboxDB.last_error: error,
+            }, synchronize_session=False)
+            held.update({
+                OutboxDB.status: 'PENDING',
+                OutboxDB.available_at: available_at,
+                OutboxDB.claim_token: None,
+                OutboxDB.last_error: error,
+            }, synchronize_session=False)
+            return dead
     
-    def get_submissions_by_assignment(self, assignment_id: str) -> List[Submission]:
-        with self.SessionLocal() as session:
-            db_submissions = session.query(SubmissionDB).filter_by(assignment_id=assignment_id).all()
-            return [
-                Submission(
-                    id=submission.id,
-                    assignment_id=submission.assignment_id,
-                    student_id=submission.student_id,
-                    received_at=submission.received_at,
-                    on_time=submission.on_time,
-                    status=submission.status
-                )
-                for submission in db_submissions
-            ]
+    def get_outbox_stats(self, session: Optional[Session] = None) -> Dict[str, Dict]:
+        """Get {status: {'count': n, 'oldest_available_at': datetime}} for outbox messages."""
+        with self._session(session) as session:
+            rows = session.execute(
+                select(OutboxDB.status, func.count(), func.min(OutboxDB.available_at)).group_by(OutboxDB.status)
+            ).all()
+            return {status: {'count': count, 'oldest_available_at': oldest} for status, count, oldest in rows}
     
-    def save_grade(self, grade: Grade) -> None:
+    def save_raw_blob(self, key: str, size: int, stored_size: int, compression: str, created_at: datetime,
+                      session: Optional[Session] = None) -> bool:
+        """Record an object written to the blob store. Returns False if it was already recorded."""
+        with self._session(session) as session:
+            return self._insert_if_absent(session, RawBlobDB, {
+                'key': key, 'size': size, 'stored_size': stored_size, 'compression': compression,
+                'created_at': created_at
+            })
+    
+    def get_raw_blob_stats(self, session: Optional[Session] = None) -> Dict:
+        """Get blob store totals: objects, uncompressed and stored bytes, and emails referencing them."""
+        with self._session(session) as session:
+            objects, size, stored_size = session.execute(
+                select(func.count(), func.coalesce(func.sum(RawBlobDB.size), 0),
+                       func.coalesce(func.sum(RawBlobDB.stored_size), 0))
+            ).one()
+            references = session.execute(select(func.count(EmailMessageDB.raw_blob_key))).scalar_one()
+            return {
+                'objects': objects,
+                'size': size,
+                'stored_size': stored_size,
+                'compression_ratio': round(size / stored_size, 3) if stored_size else None,
+                'email_messages': references,
+            }
+    
+    @contextmanager
+    def transaction(self) -> Iterator['UnitOfWork']:
+        """
+        Open a unit of work: every repository call made through it shares one
+        session and connection, and all writes commit together on exit (or
+        roll back together if the block raises).
+        """
         with self.SessionLocal() as session:
-            db_grade = GradeDB(
-                id=grade.id,
-                assignment_id=grade.assignment_id,
-                student_id=grade.student_id,
-                grade_value=grade.grade_value,
-                feedback_text=grade.feedback_text,
-                graded_at=grade.graded_at
+            try:
+                yield UnitOfWork(self, session)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+    
+    def save_assignment(self, assignment: Assignment, session: Optional[Session] = None) -> None:
+        with self._session(session) as session:
+            session.add(ASSIGNMENTS.to_db(assignment))
+    
+    def get_assignment_by_code(self, code: str, session: Optional[Session] = None) -> Optional[Assignment]:
+        with self._session(session) as session:
+            row = session.execute(
+                select(*ASSIGNMENTS.columns).where(AssignmentDB.code == code).limit(1)
+            ).first()
+            return ASSIGNMENTS.from_row(row) if row else None
+    
+    def get_all_assignments(self, session: Optional[Session] = None) -> List[Assignment]:
+        with self._session(session) as session:
+            rows = session.execute(select(*ASSIGNMENTS.columns))
+            return [ASSIGNMENTS.from_row(row) for row in rows]
+    
+    def save_submission(self, submission: Submission, session: Optional[Session] = None) -> None:
+        with self._session(session) as session:
+            session.add(SUBMISSIONS.to_db(submission))
+    
+    def insert_submission_if_absent(self, submission: Submission, session: Optional[Session] = None) -> bool:
+        """
+        Insert a submission unless one already exists for its (assignment_id, student_id).
+        
+        Uses a single conflict-aware INSERT backed by the unique index, so
+        concurrent deliveries of the same SUBMIT cannot both insert.
+        Returns True if the row was new, False if it was a duplicate.
+        """
+        with self._session(session) as session:
+            return self._insert_if_absent(
+                session, SubmissionDB, SUBMISSIONS.to_values(submission), ['assignment_id', 'student_id']
             )
-            session.add(db_grade)
-            session.commit()
     
-    def save_email_message(self, email: EmailMessage) -> None:
-        with self.SessionLocal() as session:
-            db_email = EmailMessageDB(
-                id=email.id,
-                direction=email.direction,
-                from_email=email.from_email,
-                to_emails=json.dumps(email.to_emails),
-                subject=email.subject,
-                message_id=email.message_id,
-                processed_at=email.processed_at,
-                parse_result=email.parse_result
+    def _insert_if_absent(self, session: Session, table: type, values: Dict,
+                          index_elements: Optional[List[str]] = None) -> bool:
+        """
+        INSERT a row unless it violates a unique constraint (only index_elements', if given).
+        Returns True if the row was inserted.
+        """
+        dialect = session.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+            stmt = dialect_insert(table).values(**values).on_conflict_do_nothing(index_elements=index_elements)
+            return session.execute(stmt).rowcount == 1
+        
+        # Other backends: rely on the unique index inside a savepoint
+        try:
+            with session.begin_nested():
+                session.execute(insert(table).values(**values))
+            return True
+        except IntegrityError:
+            return False
+    
+    def get_submission_by_assignment_and_student(self, assignment_id: str, student_id: str, session: Optional[Session] = None) -> Optional[Submission]:
+        with self._session(session) as session:
+            row = session.execute(
+                select(*SUBMISSIONS.columns).where(
+                    SubmissionDB.assignment_id == assignment_id,
+                    SubmissionDB.student_id == student_id
+                ).limit(1)
+            ).first()
+            return SUBMISSIONS.from_row(row) if row else None
+    
+    def get_submissions_by_assignment(self, assignment_id: str, session: Optional[Session] = None) -> List[Submission]:
+        with self._session(session) as session:
+            rows = session.execute(
+                select(*SUBMISSIONS.columns).where(SubmissionDB.assignment_id == assignment_id)
             )
-            session.add(db_email)
-            session.commit()
+            return [SUBMISSIONS.from_row(row) for row in rows]
+    
+    def save_grade(self, grade: Grade, session: Optional[Session] = None) -> None:
+        with self._session(session) as session:
+            session.add(GRADES.to_db(grade))
+    
+    def save_email_message(self, email: EmailMessage, session: Optional[Session] = None) -> None:
+        with self._session(session) as session:
+            session.add(EMAIL_MESSAGES.to_db(email))
+
+    def get_parse_results(self, message_ids: Iterable[str], session: Optional[Session] = None) -> Dict[str, Optional[str]]:
+        """Return parse_result by Message-ID for the given inbound emails that were recorded."""
+        results = {}
+        with self._session(session) as session:
+            for chunk in _chunks(set(message_ids)):
+                results.update(
+                    session.execute(
+                        select(EmailMessageDB.message_id, EmailMessageDB.parse_result).where(
+                            EmailMessageDB.message_id.in_(chunk)
+                        )
+                    ).all()
+                )
+        return results
+
+    def get_email_messages_page(self, since: datetime, until: datetime, limit: int,
+                                after: Optional[Tuple[datetime, str]] = None, direction: str = 'IN',
+                                session: Optional[Session] = None) -> Tuple[List[EmailMessage], Optional[Tuple[datetime, str]]]:
+        """
+        Get one keyset page of the email log in [since, until), ordered by (processed_at, id).
+
+        Returns:
+            (page, next_key) where next_key is passed as `after` for the next
+            page, or None when this is the last page
+        """
+        stmt = select(*EMAIL_MESSAGES.columns).where(
+            EmailMessageDB.processed_at >= since,
+            EmailMessageDB.processed_at < until,
+            EmailMessageDB.direction == direction
+        )
+        if after is not None:
+            after_processed_at, after_id = after
+            stmt = stmt.where(or_(
+                EmailMessageDB.processed_at > after_processed_at,
+                and_(EmailMessageDB.processed_at == after_processed_at, EmailMessageDB.id > after_id)
+            ))
+        # Fetch one extra row to learn whether another page exists
+        stmt = stmt.order_by(EmailMessageDB.processed_at, EmailMessageDB.id).limit(limit + 1)
+
+        with self._session(session) as session:
+            rows = session.execute(stmt).all()
+
+        page = [EMAIL_MESSAGES.from_row(row) for row in rows[:limit]]
+        next_key = None
+        if len(rows) > limit:
+            next_key = (page[-1].processed_at, page[-1].id)
+        return page, next_key
 
     # Core model methods
-    def save_student(self, student: Student) -> None:
-        with self.SessionLocal() as session:
-            db_student = StudentDB(
-                id=student.id,
-                student_id=student.student_id,
-                first_name=student.first_name,
-                last_name=student.last_name,
-                email=student.email,
-                status=student.status
-            )
-            session.add(db_student)
-            session.commit()
+    def save_student(self, student: Student, session: Optional[Session] = None) -> None:
+        with self._session(session) as session:
+            session.add(STUDENTS.to_db(student))
 
-    def get_student_by_id(self, student_id: str) -> Optional[Student]:
-        with self.SessionLocal() as session:
-            db_student = session.query(StudentDB).filter_by(student_id=student_id).first()
-            if not db_student:
-                return None
-            return Student(
-                id=db_student.id,
-                student_id=db_student.student_id,
-                first_name=db_student.first_name,
-                last_name=db_student.last_name,
-                email=db_student.email,
-                status=db_student.status
-            )
+    def get_student_by_id(self, student_id: str, session: Optional[Session] = None) -> Optional[Student]:
+        with self._session(session) as session:
+            row = session.execute(
+                select(*STUDENTS.columns).where(StudentDB.student_id == student_id).limit(1)
+            ).first()
+            return STUDENTS.from_row(row) if row else None
 
-    def save_teacher(self, teacher: Teacher) -> None:
-        with self.SessionLocal() as session:
-            db_teacher = TeacherDB(
-                id=teacher.id,
-                email=teacher.email,
-                first_name=teacher.first_name,
-                last_name=teacher.last_name,
-                status=teacher.status
-            )
-            session.add(db_teacher)
-            session.commit()
+    def save_teacher(self, teacher: Teacher, session: Optional[Session] = None) -> None:
+        with self._session(session) as session:
+            session.add(TEACHERS.to_db(teacher))
+            self._bump_table_version(session, 'teachers')
+            self._notify_write(session, 'teachers', teacher.email)
 
-    def get_teacher_by_email(self, email: str) -> Optional[Teacher]:
-        with self.SessionLocal() as session:
-            db_teacher = session.query(TeacherDB).filter_by(email=email).first()
-            if not db_teacher:
-                return None
-            return Teacher(
-                id=db_teacher.id,
-                email=db_teacher.email,
-                first_name=db_teacher.first_name,
-                last_name=db_teacher.last_name,
-                status=db_teacher.status
-            )
+    def get_teacher_by_email(self, email: str, session: Optional[Session] = None) -> Optional[Teacher]:
+        with self._session(session) as session:
+            row = session.execute(
+                select(*TEACHERS.columns).where(TeacherDB.email == email).limit(1)
+            ).first()
+            return TEACHERS.from_row(row) if row else None
 
-    def save_class(self, class_obj: Class) -> None:
-        with self.SessionLocal() as session:
-            db_class = ClassDB(
-                id=class_obj.id,
-                term_id=class_obj.term_id,
-                name=class_obj.name,
-                subject=class_obj.subject,
-                teacher_id=class_obj.teacher_id,
-                roster_version=class_obj.roster_version,
-                status=class_obj.status
-            )
-            session.add(db_class)
-            session.commit()
+    def save_class(self, class_obj: Class, session: Optional[Session] = None) -> None:
+        with self._session(session) as session:
+            session.add(CLASSES.to_db(class_obj))
+            self._bump_table_version(session, 'classes')
+            self._notify_write(session, 'classes', class_obj.name)
 
-    def get_class_by_name(self, name: str) -> Optional[Class]:
-        with self.SessionLocal() as session:
-            db_class = session.query(ClassDB).filter_by(name=name).first()
-            if not db_class:
-                return None
-            return Class(
-                id=db_class.id,
-                term_id=db_class.term_id,
-                name=db_class.name,
-                subject=db_class.subject,
-                teacher_id=db_class.teacher_id,
-                roster_version=db_class.roster_version,
-                status=db_class.status
-            )
+    def get_class_by_name(self, name: str, session: Optional[Session] = None) -> Optional[Class]:
+        with self._session(session) as session:
+            row = session.execute(
+                select(*CLASSES.columns).where(ClassDB.name == name).limit(1)
+            ).first()
+            return CLASSES.from_row(row) if row else None
 
-    def get_class_by_id(self, class_id: str) -> Optional[Class]:
-        with self.SessionLocal() as session:
+    def get_class_by_id(self, class_id: str, session: Optional[Session] = None) -> Optional[Class]:
+        with self._session(session) as session:
+            row = session.execute(
+                select(*CLASSES.columns).where(ClassDB.id == class_id).limit(1)
+            ).first()
+            return CLASSES.from_row(row) if row else None
+
+    def bump_roster_version(self, class_id: str, session: Optional[Session] = None) -> Optional[int]:
+        """Increment a class's roster_version. Returns the new version or None if the class doesn't exist."""
+        with self._session(session) as session:
             db_class = session.query(ClassDB).filter_by(id=class_id).first()
             if not db_class:
                 return None
-            return Class(
-                id=db_class.id,
-                term_id=db_class.term_id,
-                name=db_class.name,
-                subject=db_class.subject,
-                teacher_id=db_class.teacher_id,
-                roster_version=db_class.roster_version,
-                status=db_class.status
-            )
+            db_class.roster_version = ClassDB.roster_version + 1
+            session.flush()
+            session.refresh(db_class, ['roster_version'])
+            self._bump_table_version(session, 'classes')
+            self._notify_write(session, 'classes', db_class.name)
+            return db_class.roster_version
 
-    def save_term(self, term: Term) -> None:
-        with self.SessionLocal() as session:
-            db_term = TermDB(
-                id=term.id,
-                name=term.name.value,
-                year=term.year,
-                start_date=term.start_date,
-                end_date=term.end_date
-            )
-            session.add(db_term)
-            session.commit()
+    def save_term(self, term: Term, session: Optional[Session] = None) -> None:
+        with self._session(session) as session:
+            session.add(TERMS.to_db(term))
 
-    def save_parent(self, parent: Parent) -> None:
-        with self.SessionLocal() as session:
-            db_parent = ParentDB(
-                id=parent.id,
-                email=parent.email,
-                first_name=parent.first_name,
-                last_name=parent.last_name,
-                status=parent.status
-            )
-            session.add(db_parent)
-            session.commit()
+    def save_parent(self, parent: Parent, session: Optional[Session] = None) -> None:
+        with self._session(session) as session:
+            session.add(PARENTS.to_db(parent))
 
-    def save_enrollment(self, enrollment: Enrollment) -> None:
-        with self.SessionLocal() as session:
-            db_enrollment = EnrollmentDB(
-                id=enrollment.id,
-                class_id=enrollment.class_id,
-                student_id=enrollment.student_id,
-                parent_id=enrollment.parent_id,
-                active=enrollment.active,
-                joined_at=enrollment.joined_at,
-                left_at=enrollment.left_at
-            )
-            session.add(db_enrollment)
-            session.commit()
+    def save_enrollment(self, enrollment: Enrollment, session: Optional[Session] = None) -> None:
+        with self._session(session) as session:
+            session.add(ENROLLMENTS.to_db(enrollment))
 
-    def get_enrollments_by_class(self, class_id: str) -> List[Enrollment]:
-        with self.SessionLocal() as session:
-            db_enrollments = session.query(EnrollmentDB).filter_by(class_id=class_id, active=True).all()
-            return [
-                Enrollment(
-                    id=enrollment.id,
-                    class_id=enrollment.class_id,
-                    student_id=enrollment.student_id,
-                    parent_id=enrollment.parent_id,
-                    active=enrollment.active,
-                    joined_at=enrollment.joined_at,
-                    left_at=enrollment.left_at
-                )
-                for enrollment in db_enrollments
-            ]
+    def get_enrollments_by_class(self, class_id: str, session: Optional[Session] = None) -> List[Enrollment]:
+        with self._session(session) as session:
+            rows = session.execute(
+                select(*ENROLLMENTS.columns).where(EnrollmentDB.class_id == class_id, EnrollmentDB.active == True)
+            )
+            return [ENROLLMENTS.from_row(row) for row in rows]
 
-    def is_student_enrolled_in_class(self, student_id: str, class_id: str) -> bool:
-        with self.SessionLocal() as session:
+    def is_student_enrolled_in_class(self, student_id: str, class_id: str, session: Optional[Session] = None) -> bool:
+        with self._session(session) as session:
             enrollment = session.query(EnrollmentDB).filter_by(
                 student_id=student_id, 
                 class_id=class_id, 
@@ -320,60 +579,262 @@ class Database:
             ).first()
             return enrollment is not None
 
-    def get_all_assignments_with_classes(self) -> List[tuple[Assignment, Optional[str]]]:
+    def get_all_assignments_with_classes(self, session: Optional[Session] = None) -> List[tuple[Assignment, Optional[str]]]:
         """Get all assignments with their class names in a single query."""
-        with self.SessionLocal() as session:
-            results = session.query(AssignmentDB, ClassDB.name).outerjoin(
-                ClassDB, AssignmentDB.class_id == ClassDB.id
-            ).all()
-            
-            return [
-                (
-                    Assignment(
-                        id=assignment.id,
-                        code=assignment.code,
-                        class_id=assignment.class_id,
-                        title=assignment.title,
-                        instructions=assignment.instructions,
-                        deadline_at=assignment.deadline_at,
-                        deadline_tz=assignment.deadline_tz,
-                        created_by_teacher_id=assignment.created_by_teacher_id,
-                        status=assignment.status,
-                        grace_days=assignment.grace_days,
-                        created_at=assignment.created_at
-                    ),
-                    class_name
+        with self._session(session) as session:
+            rows = session.execute(
+                select(*ASSIGNMENTS.columns, ClassDB.name).outerjoin(
+                    ClassDB, AssignmentDB.class_id == ClassDB.id
                 )
-                for assignment, class_name in results
-            ]
+            )
+            return [(ASSIGNMENTS.from_row(row), row[-1]) for row in rows]
+    
+    def get_assignments_page(self, limit: int, after: Optional[Tuple[datetime, str]] = None,
+                             class_id: Optional[str] = None, term_id: Optional[str] = None,
+                             status: Optional[str] = None, deadline_from: Optional[datetime] = None,
+                             deadline_to: Optional[datetime] = None,
+                             session: Optional[Session] = None) -> Tuple[List[tuple[Assignment, Optional[str]]], Optional[Tuple[datetime, str]]]:
+        """
+        Get one keyset page of assignments with their class names, ordered by (deadline_at, id).
+        
+        Args:
+            limit: Maximum number of assignments to return
+            after: (deadline_at, id) of the last assignment on the previous page
+            class_id, term_id, status: Optional equality filters
+            deadline_from, deadline_to: Optional inclusive deadline range
+        
+        Returns:
+            (page, next_key) where next_key is passed as `after` for the next
+            page, or None when this is the last page
+        """
+        stmt = select(*ASSIGNMENTS.columns, ClassDB.name).outerjoin(
+            ClassDB, AssignmentDB.class_id == ClassDB.id
+        )
+        if after is not None:
+            after_deadline, after_id = after
+            stmt = stmt.where(or_(
+                AssignmentDB.deadline_at > after_deadline,
+                and_(AssignmentDB.deadline_at == after_deadline, AssignmentDB.id > after_id)
+            ))
+        if class_id is not None:
+            stmt = stmt.where(AssignmentDB.class_id == class_id)
+        if term_id is not None:
+            stmt = stmt.where(ClassDB.term_id == term_id)
+        if status is not None:
+            stmt = stmt.where(AssignmentDB.status == status)
+        if deadline_from is not None:
+            stmt = stmt.where(AssignmentDB.deadline_at >= deadline_from)
+        if deadline_to is not None:
+            stmt = stmt.where(AssignmentDB.deadline_at <= deadline_to)
+        # Fetch one extra row to learn whether another page exists
+        stmt = stmt.order_by(AssignmentDB.deadline_at, AssignmentDB.id).limit(limit + 1)
+        
+        with self._session(session) as session:
+            rows = session.execute(stmt).all()
+        
+        page = [(ASSIGNMENTS.from_row(row), row[-1]) for row in rows[:limit]]
+        next_key = None
+        if len(rows) > limit:
+            last = page[-1][0]
+            next_key = (last.deadline_at, last.id)
+        return page, next_key
     
-    def get_assignment_with_class_by_code(self, code: str) -> Optional[tuple[Assignment, Optional[str]]]:
+    def get_assignment_with_class_by_code(self, code: str, session: Optional[Session] = None) -> Optional[tuple[Assignment, Optional[str]]]:
         """Get assignment with class name in a single query."""
-        with self.SessionLocal() as session:
-            result = session.query(AssignmentDB, ClassDB.name).outerjoin(
-                ClassDB, AssignmentDB.class_id == ClassDB.id
-            ).filter(AssignmentDB.code == code).first()
+        with self._session(session) as session:
+            row = session.execute(
+                select(*ASSIGNMENTS.columns, ClassDB.name).outerjoin(
+                    ClassDB, AssignmentDB.class_id == ClassDB.id
+                ).where(AssignmentDB.code == code).limit(1)
+            ).first()
             
-            if not result:
+            if not row:
                 return None
             
-            assignment, class_name = result
-            return (
-                Assignment(
-                    id=assignment.id,
-                    code=assignment.code,
-                    class_id=assignment.class_id,
-                    title=assignment.title,
-                    instructions=assignment.instructions,
-                    deadline_at=assignment.deadline_at,
-                    deadline_tz=assignment.deadline_tz,
-                    created_by_teacher_id=assignment.created_by_teacher_id,
-                    status=assignment.status,
-                    grace_days=assignment.grace_days,
-                    created_at=assignment.created_at
-                ),
-                class_name
+            return (ASSIGNMENTS.from_row(row), row[-1])
+
+    # Bulk layer used by EmailProcessor.process_emails
+    def get_assignments_by_codes(self, codes: Iterable[str], session: Optional[Session] = None) -> Dict[str, Assignment]:
+        """Get assignments for many codes with grouped IN (...) queries."""
+        result = {}
+        with self._session(session) as session:
+            for chunk in _chunks(set(codes)):
+                for row in session.execute(select(*ASSIGNMENTS.columns).where(AssignmentDB.code.in_(chunk))):
+                    assignment = ASSIGNMENTS.from_row(row)
+                    result[assignment.code] = assignment
+        return result
+
+    def get_students_by_ids(self, student_ids: Iterable[str], session: Optional[Session] = None) -> Dict[str, Student]:
+        """Get students for many student IDs with grouped IN (...) queries."""
+        result = {}
+        with self._session(session) as session:
+            for chunk in _chunks(set(student_ids)):
+                for row in session.execute(select(*STUDENTS.columns).where(StudentDB.student_id.in_(chunk))):
+                    student = STUDENTS.from_row(row)
+                    result[student.student_id] = student
+        return result
+
+    def get_active_enrollment_pairs(self, student_ids: Iterable[str], class_ids: Iterable[str], session: Optional[Session] = None) -> Set[Tuple[str, str]]:
+        """Get the (student_id, class_id) pairs with an active enrollment."""
+        class_ids = list(set(class_ids))
+        pairs = set()
+        if not class_ids:
+            return pairs
+        with self._session(session) as session:
+            for chunk in _chunks(set(student_ids)):
+                rows = session.query(EnrollmentDB.student_id, EnrollmentDB.class_id).filter(
+                    EnrollmentDB.student_id.in_(chunk),
+                    EnrollmentDB.class_id.in_(class_ids),
+                    EnrollmentDB.active == True
+                )
+                pairs.update((student_id, class_id) for student_id, class_id in rows)
+        return pairs
+
+    def get_submissions_by_assignments_and_students(self, assignment_ids: Iterable[str], student_ids: Iterable[str], session: Optional[Session] = None) -> Dict[Tuple[str, str], Submission]:
+        """Get existing submissions keyed by (assignment_id, student_id)."""
+        assignment_ids = list(set(assignment_ids))
+        result = {}
+        if not assignment_ids:
+            return result
+        with self._session(session) as session:
+            for chunk in _chunks(set(student_ids)):
+                rows = session.execute(
+                    select(*SUBMISSIONS.columns).where(
+                        SubmissionDB.assignment_id.in_(assignment_ids),
+                        SubmissionDB.student_id.in_(chunk)
+                    )
+                )
+                for row in rows:
+                    submission = SUBMISSIONS.from_row(row)
+                    result[(submission.assignment_id, submission.student_id)] = submission
+        return result
+
+    def save_batch(self, assignments: Iterable[Assignment] = (), submissions: Iterable[Submission] = (),
+                   grades: Iterable[Grade] = (), email_messages: Iterable[EmailMessage] = (),
+                   replies: Iterable[OutboxMessage] = (), session: Optional[Session] = None) -> None:
+        """Write assignments, submissions, grades, email messages and queued replies in one transaction."""
+        with self._session(session) as session:
+            session.add_all(ASSIGNMENTS.to_db(assignment) for assignment in assignments)
+            # Flush assignments first: SubmissionDB/GradeDB declare no ORM-level FKs,
+            # so the unit of work would not otherwise order them after their parent
+            session.flush()
+            session.add_all(SUBMISSIONS.to_db(submission) for submission in submissions)
+            session.add_all(GRADES.to_db(grade) for grade in grades)
+            session.add_all(EMAIL_MESSAGES.to_db(email) for email in email_messages)
+            for reply in replies:
+                self.enqueue_reply(reply, session=session)
+
+    def bulk_insert(self, table: type, rows: Iterable[Dict], chunk_size: int = BULK_INSERT_CHUNK_SIZE,
+                    session: Optional[Session] = None) -> int:
+        """
+        Insert rows of column values in chunks, one statement per chunk.
+        
+        Rows are consumed lazily, so a generator of any length runs in constant
+        memory. PostgreSQL (psycopg2) loads each chunk with COPY; other backends
+        use an executemany INSERT. Every row must have the first row's keys, and
+        no per-row write listeners run.
+        
+        Args:
+            table: ORM table class, e.g. StudentDB
+            rows: Dicts of column name -> database value
+            chunk_size: Rows per chunk
+            session: Caller's session to write in; without one, each chunk is committed
+        
+        Returns:
+            Number of rows inserted
+        """
+        inserted = 0
+        owns_session = session is None
+        with self._session(session) as session:
+            for chunk in _chunks(rows, chunk_size):
+                conn = session.connection()
+                if conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2':
+                    self._copy_rows(conn, table, chunk)
+                else:
+                    conn.execute(insert(table), chunk)
+                if owns_session:
+                    session.commit()
+                inserted += len(chunk)
+            if inserted and table.__tablename__ in CACHED_TABLES:
+                self._bump_table_version(session, table.__tablename__)
+        return inserted
+    
+    def update_rows(self, table: type, rows: Iterable[Dict], chunk_size: int = BULK_INSERT_CHUNK_SIZE,
+                    session: Optional[Session] = None) -> int:
+        """
+        Update rows by primary key `id` with executemany UPDATEs, one per chunk.
+        
+        Every row holds 'id' plus the same columns to set. Like bulk_insert, no
+        per-row write listeners run. Returns the number of rows given.
+        """
+        updated = 0
+        with self._session(session) as session:
+            for chunk in _chunks(rows, chunk_size):
+                columns = [column for column in chunk[0] if column != 'id']
+                stmt = update(table).where(table.id == bindparam('_id')).values(
+                    {column: bindparam(column) for column in columns}
+                )
+                session.connection().execute(stmt, [
+                    {'_id': row['id'], **{column: row[column] for column in columns}} for row in chunk
+                ])
+                updated += len(chunk)
+            if updated and table.__tablename__ in CACHED_TABLES:
+                self._bump_table_version(session, table.__tablename__)
+        return updated
+    
+    def get_rows_by_ids(self, table: type, ids: Iterable[str], session: Optional[Session] = None) -> Dict[str, Dict]:
+        """Return the rows with these primary key ids as {id: {column: value}}."""
+        columns = table.__table__.columns
+        rows = {}
+        with self._session(session) as session:
+            for chunk in _chunks(set(ids)):
+                for row in session.execute(select(*columns).where(table.id.in_(chunk))).mappings():
+                    rows[row['id']] = dict(row)
+        return rows
+    
+    def get_existing_keys(self, column, values: Iterable, session: Optional[Session] = None) -> Set:
+        """Return the subset of values present in a column, e.g. StudentDB.student_id."""
+        found = set()
+        with self._session(session) as session:
+            for chunk in _chunks(set(values)):
+                found.update(session.execute(select(column).where(column.in_(chunk))).scalars())
+        return found
+    
+    def bump_roster_versions(self, class_ids: Iterable[str], session: Optional[Session] = None) -> int:
+        """Increment roster_version of every given class once, set-based. Returns the number of classes bumped."""
+        bumped = 0
+        with self._session(session) as session:
+            for chunk in _chunks(set(class_ids)):
+                bumped += session.execute(
+                    update(ClassDB).where(ClassDB.id.in_(chunk)).values(roster_version=ClassDB.roster_version + 1)
+                ).rowcount
+            if bumped:
+                self._bump_table_version(session, 'classes')
+        return bumped
+    
+    @staticmethod
+    def _copy_rows(conn, table: type, rows: List[Dict]) -> None:
+        """Load rows with COPY FROM STDIN through the raw psycopg2 connection."""
+        columns = list(rows[0])
+        quote = conn.dialect.identifier_preparer.quote
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(','.join(_copy_field(row[column]) for column in columns))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {quote(table.__tablename__)} ({', '.join(quote(column) for column in columns)}) "
+                f"FROM STDIN WITH (FORMAT csv)",
+                buffer
             )
+        finally:
+            cursor.close()
+    
+    def batch(self, assignment_codes: Iterable[str], student_ids: Iterable[str]) -> 'BatchContext':
+        """Prefetch rows for a batch of emails and return a write-buffering context."""
+        return BatchContext(self, assignment_codes, student_ids)
 
     def test_connection(self) -> bool:
         """Test database connection by executing a simple query."""
@@ -383,3 +844,101 @@ class Database:
                 return True
         except Exception:
             return False
+
+
+class UnitOfWork:
+    """
+    Database facade bound to one session, returned by Database.transaction().
+    
+    Any Database repository method can be called on it; the shared session is
+    passed through so the calls run in a single transaction.
+    """
+    
+    def __init__(self, db: Database, session: Session):
+        self.db = db
+        self.session = session
+    
+    def __getattr__(self, name: str):
+        return partial(getattr(self.db, name), session=self.session)
+
+
+class BatchContext:
+    """
+    Read view over rows prefetched for a batch of emails that buffers writes.
+    
+    Exposes the subset of Database methods used by the email handlers, so
+    they run unchanged against it. Lookups are answered from the grouped
+    prefetch plus the batch's own pending writes; nothing is written until
+    commit(), which saves everything in one transaction.
+    """
+    
+    def __init__(self, db: Database, assignment_codes: Iterable[str], student_ids: Iterable[str]):
+        self.db = db
+        student_ids = set(student_ids)
+        with db.transaction() as uow:
+            self._assignments = uow.get_assignments_by_codes(assignment_codes)
+            self._students = uow.get_students_by_ids(student_ids)
+            self._prefetched_class_ids = {a.class_id for a in self._assignments.values()}
+            self._enrollments = uow.get_active_enrollment_pairs(student_ids, self._prefetched_class_ids)
+            self._submissions = uow.get_submissions_by_assignments_and_students(
+                [a.id for a in self._assignments.values()], student_ids
+            )
+        self.pending_assignments: List[Assignment] = []
+        self.pending_submissions: List[Submission] = []
+        self.pending_grades: List[Grade] = []
+        self.pending_email_messages: List[EmailMessage] = []
+        self.pending_replies: List[OutboxMessage] = []
+    
+    def get_teacher_by_email(self, email: str) -> Optional[Teacher]:
+        return self.db.get_teacher_by_email(email)
+    
+    def get_class_by_name(self, name: str) -> Optional[Class]:
+        return self.db.get_class_by_name(name)
+    
+    def get_assignment_by_code(self, code: str) -> Optional[Assignment]:
+        return self._assignments.get(code)
+    
+    def get_student_by_id(self, student_id: str) -> Optional[Student]:
+        return self._students.get(student_id)
+    
+    def is_student_enrolled_in_class(self, student_id: str, class_id: str) -> bool:
+        if class_id not in self._prefetched_class_ids:
+            # Assignment created earlier in this batch; its class was not prefetched
+            return self.db.is_student_enrolled_in_class(student_id, class_id)
+        return (student_id, class_id) in self._enrollments
+    
+    def get_submission_by_assignment_and_student(self, assignment_id: str, student_id: str) -> Optional[Submission]:
+        return self._submissions.get((assignment_id, student_id))
+    
+    def save_assignment(self, assignment: Assignment) -> None:
+        self._assignments[assignment.code] = assignment
+        self.pending_assignments.append(assignment)
+    
+    def save_submission(self, submission: Submission) -> None:
+        self._submissions[(submission.assignment_id, submission.student_id)] = submission
+        self.pending_submissions.append(submission)
+    
+    def insert_submission_if_absent(self, submission: Submission) -> bool:
+        if (submission.assignment_id, submission.student_id) in self._submissions:
+            return False
+        self.save_submission(submission)
+        return True
+    
+    def save_grade(self, grade: Grade) -> None:
+        self.pending_grades.append(grade)
+    
+    def save_email_message(self, email: EmailMessage) -> None:
+        self.pending_email_messages.append(email)
+    
+    def enqueue_reply(self, message: OutboxMessage) -> None:
+        self.pending_replies.append(message)
+    
+    def commit(self) -> None:
+        """Write all buffered rows in a single transaction."""
+        self.db.save_batch(
+            assignments=self.pending_assignments,
+            submissions=self.pending_submissions,
+            grades=self.pending_grades,
+            email_messages=self.pending_email_messages,
+            replies=self.pending_replies
+        )
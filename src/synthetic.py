@@ -0,0 +1,163 @@
+"""
+Synthetic school roster and email traffic for load tests and benchmarks.
+SyntheticSchool generates teachers, classes and enrolled students, writes
+them to a Database, and produces a stream of ASSIGN/SUBMIT/GRADE/RETURN and
+unknown-command emails that are valid against that roster: submissions refer
+to assignments created earlier in the stream, grades to earlier submissions.
+The stream can be delivered to a FakeGmailService mailbox.
+"""
+
+import random
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from .models import Student, Teacher, Class, Term, Parent, Enrollment
+from .storage import Database
+
+DEFAULT_MIX = {'ASSIGN': 0.05, 'SUBMIT': 0.6, 'GRADE': 0.25, 'RETURN': 0.05, 'UNKNOWN': 0.05}
+TO_ADDRESS = 'assignments@example.com'
+
+
+class SyntheticEmail(NamedTuple):
+    """One generated inbound email."""
+    command: str
+    from_email: str
+    subject: str
+    body: str
+    message_id: str
+
+    def as_kwargs(self) -> Dict:
+        """Keyword arguments for EmailProcessor.process_email."""
+        return {'email_content': self.body, 'from_email': self.from_email, 'to_emails': [TO_ADDRESS],
+                'subject': self.subject, 'message_id': self.message_id}
+
+    def as_mime(self) -> bytes:
+        """RFC 822 bytes, e.g. for FakeGmailService.add_message."""
+        mime = MIMEText(self.body)
+        mime['From'] = self.from_email
+        mime['To'] = TO_ADDRESS
+        mime['Subject'] = self.subject
+        mime['Message-ID'] = self.message_id
+        return mime.as_bytes()
+
+
+class SyntheticSchool:
+    """Deterministic (per seed) roster of teachers, classes and enrolled students."""
+
+    def __init__(self, teachers: int = 5, classes_per_teacher: int = 2, students_per_class: int = 25,
+                 seed: int = 0):
+        """
+        Initialize school.
+
+        Args:
+            teachers: Number of teachers
+            classes_per_teacher: Classes taught by each teacher
+            students_per_class: Students enrolled in each class (each student is in one class)
+            seed: Seed for the roster and the email stream
+        """
+        self.seed = seed
+        self.term = Term(id="term-synthetic", name="FALL", year=2025,
+                         start_date=datetime(2025, 9, 1), end_date=datetime(2025, 12, 19))
+        self.teachers = [
+            Teacher(id=f"teacher-{t:04d}", email=f"teacher{t:04d}@school.example.com",
+                    first_name="Teacher", last_name=f"{t:04d}")
+            for t in range(teachers)
+        ]
+        self._teachers_by_id = {teacher.id: teacher for teacher in self.teachers}
+        # Assignment codes are the first 8 characters of the class name, so keep them unique
+        self.classes = [
+            Class(id=f"class-{c:04d}", term_id=self.term.id, name=f"{c:04d} Synthetic",
+                  teacher_id=self.teachers[c // classes_per_teacher].id)
+            for c in range(teachers * classes_per_teacher)
+        ]
+        self.students: List[Student] = []
+        self.parents: List[Parent] = []
+        self.enrollments: List[Enrollment] = []
+        self.students_by_class: Dict[str, List[str]] = {}
+        joined_at = datetime(2025, 9, 1)
+        for c, class_obj in enumerate(self.classes):
+            roster = []
+            for s in range(students_per_class):
+                n = c * students_per_class + s
+                student = Student(id=f"student-{n:06d}", student_id=f"STU{n:06d}", first_name="Student",
+                                  last_name=f"{n:06d}", email=f"stu{n:06d}@school.example.com")
+                parent = Parent(id=f"parent-{n:06d}", email=f"parent{n:06d}@example.com")
+                self.students.append(student)
+                self.parents.append(parent)
+                self.enrollments.append(Enrollment(id=f"enrollment-{n:06d}", class_id=class_obj.id,
+                                                   student_id=student.student_id, parent_id=parent.id,
+                                                   joined_at=joined_at))
+                roster.append(student.student_id)
+            self.students_by_class[class_obj.id] = roster
+
+    def populate(self, db: Database) -> None:
+        """Write the roster to a database."""
+        db.save_term(self.term)
+        for teacher in self.teachers:
+            db.save_teacher(teacher)
+        for class_obj in self.classes:
+            db.save_class(class_obj)
+        for student, parent, enrollment in zip(self.students, self.parents, self.enrollments):
+            db.save_student(student)
+            db.save_parent(parent)
+            db.save_enrollment(enrollment)
+
+    def emails(self, count: int, mix: Optional[Dict[str, float]] = None) -> Iterator[SyntheticEmail]:
+        """
+        Yield `count` emails with commands drawn from `mix` (command -> weight).
+
+        A command with nothing to refer to yet is replaced by the one that
+        creates it: SUBMIT becomes ASSIGN until an assignment exists, and
+        GRADE/RETURN become SUBMIT until an ungraded submission exists.
+        """
+        rng = random.Random(self.seed)
+        mix = mix or DEFAULT_MIX
+        commands, weights = zip(*mix.items())
+        assignments: List[Tuple[str, Class]] = []
+        deadlines = {class_obj.id: 0 for class_obj in self.classes}
+        submitted: Dict[Tuple[str, str], Class] = {}  # ungraded (code, student_id) -> class
+        pending_students = {}  # code -> students yet to submit
+
+        for n in range(count):
+            command = rng.choices(commands, weights)[0]
+            if command in ('GRADE', 'RETURN') and not submitted:
+                command = 'SUBMIT'
+            if command == 'SUBMIT' and not any(pending_students.values()):
+                command = 'ASSIGN'
+            message_id = f"<synthetic-{self.seed}-{n}@example.com>"
+
+            if command == 'ASSIGN':
+                class_obj = rng.choice(self.classes)
+                teacher = self._teachers_by_id[class_obj.teacher_id]
+                deadline = datetime(2025, 9, 1) + timedelta(days=deadlines[class_obj.id])
+                deadlines[class_obj.id] += 1
+                code = f"{class_obj.name.replace(' ', '').upper()[:8]}-{deadline.strftime('%m%d')}"
+                assignments.append((code, class_obj))
+                pending_students[code] = list(self.students_by_class[class_obj.id])
+                rng.shuffle(pending_students[code])
+                yield SyntheticEmail(
+                    command, teacher.email, f"ASSIGN Essay {n}",
+                    f"Title: Essay {n}\nClass: {class_obj.name}\nDeadline: {deadline:%Y-%m-%d} 23:59 CT\n"
+                    f"Instructions: Write about topic {n}.\n",
+                    message_id
+                )
+            elif command == 'SUBMIT':
+                code, class_obj = rng.choice([(c, k) for c, k in assignments if pending_students[c]])
+                student_id = pending_students[code].pop()
+                submitted[(code, student_id)] = class_obj
+                yield SyntheticEmail(
+                    command, f"stu{student_id[3:]}@school.example.com", f"SUBMIT {code}",
+                    f"StudentID: {student_id}\n\nHere is my essay.\n", message_id
+                )
+            elif command in ('GRADE', 'RETURN'):
+                (code, student_id), class_obj = submitted.popitem()
+                teacher = self._teachers_by_id[class_obj.teacher_id]
+                grade = rng.choice(['A', 'A-', 'B+', 'B', 'C'])
+                yield SyntheticEmail(
+                    command, teacher.email, f"{command} {code} {student_id}",
+                    f"Grade: {grade}\nFeedback: Synthetic feedback {n}.\n", message_id
+                )
+            else:
+                yield SyntheticEmail('UNKNOWN', rng.choice(self.students).email or TO_ADDRESS,
+                                     f"Question {n}", "When is the essay due?\n", message_id)
+
@@ -254,56 +254,129 @@ function displayStatus(data) {
     resultDiv.className = 'result info';
 }
 
-// Load all assignments
+// Load all assignments, one page at a time as the list is scrolled
+const ASSIGNMENTS_PAGE_SIZE = 50;
+let assignmentsCursor = null;
+let assignmentsRequest = null;  // AbortController of the page load in flight
+let assignmentsGeneration = 0;  // bumped on every reset; older page loads are ignored
+let assignmentsObserver = null;
+
+function renderAssignmentItem(assignment) {
+    const itemDiv = document.createElement('div');
+    itemDiv.className = 'assignment-item';
+    
+    const codeDiv = document.createElement('div');
+    codeDiv.className = 'assignment-code';
+    codeDiv.textContent = assignment.code;
+    
+    const titleH4 = document.createElement('h4');
+    titleH4.textContent = assignment.title;
+    
+    const classP = document.createElement('p');
+    classP.innerHTML = '<strong>Class:</strong> ';
+    classP.appendChild(document.createTextNode(assignment.class_name));
+    
+    const dueP = document.createElement('p');
+    dueP.innerHTML = '<strong>Due:</strong> ';
+    dueP.appendChild(document.createTextNode(`${new Date(assignment.deadline_at).toLocaleString()} ${assignment.deadline_tz}`));
+    
+    const statusP = document.createElement('p');
+    statusP.innerHTML = '<strong>Status:</strong> ';
+    statusP.appendChild(document.createTextNode(assignment.status));
+    
+    itemDiv.appendChild(codeDiv);
+    itemDiv.appendChild(titleH4);
+    itemDiv.appendChild(classP);
+    itemDiv.appendChild(dueP);
+    itemDiv.appendChild(statusP);
+    return itemDiv;
+}
+
 async function loadAllAssignments() {
+    // Start over from the first page, abandoning any page still loading
+    assignmentsGeneration++;
+    if (assignmentsRequest) {
+        assignmentsRequest.abort();
+        assignmentsRequest = null;
+    }
+    assignmentsCursor = null;
+    if (assignmentsObserver) {
+        assignmentsObserver.disconnect();
+        assignmentsObserver = null;
+    }
+    const resultDiv = document.getElementById('allAssignments');
+    resultDiv.innerHTML = '';
+    await loadNextAssignmentsPage(true);
+}
+
+async function loadNextAssignmentsPage(firstPage = false) {
+    if (assignmentsRequest) {
+        return;
+    }
+    const generation = assignmentsGeneration;
+    const request = new AbortController();
+    assignmentsRequest = request;
+    
     try {
-        const response = await fetch('/api/assignments');
+        const params = new URLSearchParams({ limit: ASSIGNMENTS_PAGE_SIZE });
+        if (assignmentsCursor) {
+            params.set('cursor', assignmentsCursor);
+        }
+        const response = await fetch(`/api/assignments?${params}`, { signal: request.signal });
+        if (!response.ok) {
+            const result = await response.json().catch(() => ({}));
+            throw new Error(result.detail || `${response.status} ${response.statusText}`);
+        }
         const assignments = await response.json();
+        if (generation !== assignmentsGeneration) {
+            return;
+        }
+        assignmentsCursor = response.headers.get('X-Next-Cursor');
         
-        if (assignments.length === 0) {
+        if (firstPage && assignments.length === 0) {
             showResult('allAssignments', 'No assignments found.', 'info');
             return;
         }
         
         const container = document.createDocumentFragment();
         assignments.forEach(assignment => {
-            const itemDiv = document.createElement('div');
-            itemDiv.className = 'assignment-item';
-            
-            const codeDiv = document.createElement('div');
-            codeDiv.className = 'assignment-code';
-            codeDiv.textContent = assignment.code;
-            
-            const titleH4 = document.createElement('h4');
-            titleH4.textContent = assignment.title;
-            
-            const classP = document.createElement('p');
-            classP.innerHTML = '<strong>Class:</strong> ';
-            classP.appendChild(document.createTextNode(assignment.class_name));
-            
-            const dueP = document.createElement('p');
-            dueP.innerHTML = '<strong>Due:</strong> ';
-            dueP.appendChild(document.createTextNode(`${new Date(assignment.deadline_at).toLocaleString()} ${assignment.deadline_tz}`));
-            
-            const statusP = document.createElement('p');
-            statusP.innerHTML = '<strong>Status:</strong> ';
-            statusP.appendChild(document.createTextNode(assignment.status));
-            
-            itemDiv.appendChild(codeDiv);
-            itemDiv.appendChild(titleH4);
-            itemDiv.appendChild(classP);
-            itemDiv.appendChild(dueP);
-            itemDiv.appendChild(statusP);
-            
-            container.appendChild(itemDiv);
+            container.appendChild(renderAssignmentItem(assignment));
         });
         
         const resultDiv = document.getElementById('allAssignments');
-        resultDiv.innerHTML = '';
+        const oldSentinel = document.getElementById('assignmentsSentinel');
+        if (oldSentinel) {
+            oldSentinel.remove();
+        }
         resultDiv.appendChild(container);
         resultDiv.className = 'result info';
+        
+        // Fetch the next page when the end of the list scrolls into view
+        if (assignmentsCursor) {
+            const sentinel = document.createElement('div');
+            sentinel.id = 'assignmentsSentinel';
+            resultDiv.appendChild(sentinel);
+            if (!assignmentsObserver) {
+                assignmentsObserver = new IntersectionObserver(entries => {
+                    if (entries.some(entry => entry.isIntersecting)) {
+                        loadNextAssignmentsPage();
+                    }
+                });
+            }
+            assignmentsObserver.observe(sentinel);
+        } else if (assignmentsObserver) {
+            assignmentsObserver.disconnect();
+            assignmentsObserver = null;
+        }
     } catch (error) {
-        showResult('allAssignments', `Error: ${error.message}`, 'error');
+        // A reset aborted or superseded this load; the new one owns the list
+        if (generation === assignmentsGeneration) {
+            showResult('allAssignments', `Error: ${error.message}`, 'error');
+        }
+    } finally {
+        if (assignmentsRequest === request) {
+            assignmentsRequest = null;
+        }
     }
 }
 
@@ -0,0 +1,8 @@
+import os
+import pytest
+from src.storage import Database
+
+@pytest.fixture
+def db(tmp_path):
+    """Fixture providing a scratch database."""
+    return Database(f"sqlite:///{os.path.join(tmp_path, 'test.db')}")
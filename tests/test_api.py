@@ -169,3 +169,91 @@ def test_get_assignment_status():
     assert "assignment" in data
     assert "submissions" in data
     assert data["assignment"]["code"] == "MATH7-0120"
+
+def test_list_assignments_keyset_pagination():
+    """Test paging through a filtered assignment list with the next-cursor header."""
+    from src.api import db
+    from src.models import Assignment
+    
+    unique_id = str(int(time.time() * 1000))[-6:]
+    class_id = f"api-page-class-{unique_id}"
+    db.save_class(Class(id=class_id, term_id="api-test-term-1", name=f"Paging {unique_id}", teacher_id="api-test-teacher-1"))
+    for i in range(5):
+        db.save_assignment(Assignment(
+            id=f"page-{unique_id}-{i}",
+            code=f"PAGE{unique_id}-{i:04d}",
+            class_id=class_id,
+            title=f"Paged {i}",
+            deadline_at=datetime(2025, 3, 1 + i, 23, 59),
+            created_by_teacher_id="api-test-teacher-1",
+            status="CLOSED" if i == 4 else "SCHEDULED",
+            created_at=datetime.utcnow()
+        ))
+    
+    codes = []
+    cursor = None
+    while True:
+        params = {"class_id": class_id, "status": "SCHEDULED", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/assignments", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert isinstance(page, list)
+        assert len(page) <= 2
+        codes.extend(item["code"] for item in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    
+    assert codes == [f"PAGE{unique_id}-{i:04d}" for i in range(4)]
+    
+    response = client.get("/api/assignments", params={
+        "class_id": class_id, "deadline_from": "2025-03-02T00:00:00", "deadline_to": "2025-03-03T23:59:59"
+    })
+    assert [item["code"] for item in response.json()] == [f"PAGE{unique_id}-0001", f"PAGE{unique_id}-0002"]
+    
+    response = client.get("/api/assignments", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_saturated_pool_returns_503(monkeypatch):
+    """Test requests are shed with 503 once the DB pool is saturated, and metrics are exposed."""
+    from src import api
+    from src.executor import ExecutorSaturatedError
+    
+    async def saturated(fn, *args, **kwargs):
+        raise ExecutorSaturatedError("db pool is saturated")
+    
+    monkeypatch.setattr(api.db_pool, "run", saturated)
+    response = client.get("/api/assignments")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    monkeypatch.undo()
+    
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    metrics = response.json()
+    assert set(metrics["pools"]) == {"db", "processing"}
+    assert metrics["pools"]["db"]["completed"] >= 1
+    assert "hits" in metrics["processor_cache"]
+
+def test_raw_blobs_require_admin_token(monkeypatch, tmp_path):
+    """Test raw MIME is only served with the admin bearer token, and never when no token is configured."""
+    from src import api
+    from src.blob_store import LocalBlobStore, iter_chunks
+    store = LocalBlobStore(str(tmp_path))
+    key = store.put(iter_chunks(b"Subject: SUBMIT ENG7-0115\n\nStudentID: STU001\n")).key
+    monkeypatch.setattr(api, "blob_store", store)
+
+    monkeypatch.setattr(api.settings, "admin_token", "")
+    assert client.get(f"/api/blobs/{key}", headers={"Authorization": "Bearer "}).status_code == 403
+
+    monkeypatch.setattr(api.settings, "admin_token", "s3cret")
+    assert client.get(f"/api/blobs/{key}").status_code == 401
+    assert client.get(f"/api/blobs/{key}", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+    headers = {"Authorization": "Bearer s3cret"}
+    response = client.get(f"/api/blobs/{key}", headers=headers)
+    assert response.status_code == 200
+    assert response.content == b"Subject: SUBMIT ENG7-0115\n\nStudentID: STU001\n"
+    assert client.get(f"/api/blobs/{'0' * 64}", headers=headers).status_code == 404
@@ -0,0 +1,26 @@
+import pytest
+from src.bench import run_benchmark, parse_mix, percentile
+
+def test_percentile_uses_nearest_rank():
+    """Test percentiles pick an observed value by nearest rank."""
+    values = [float(n) for n in range(1, 101)]
+    assert (percentile(values, 50), percentile(values, 95), percentile(values, 99)) == (50.0, 95.0, 99.0)
+    assert percentile([], 50) == 0.0
+
+def test_parse_mix_rejects_unknown_commands():
+    """Test the mix spec is parsed into weights and unknown commands are rejected."""
+    assert parse_mix("submit=0.7, GRADE=0.3") == {'SUBMIT': 0.7, 'GRADE': 0.3}
+    with pytest.raises(ValueError):
+        parse_mix("DELETE=1")
+
+def test_benchmark_reports_each_command():
+    """Test the report covers every replayed command with latencies and query counts."""
+    report = run_benchmark(emails=40, teachers=1, students_per_class=5, seed=2)
+
+    assert report['emails'] == 40 and report['errors'] == 0
+    assert sum(stats['emails'] for stats in report['commands'].values()) == 40
+    assert {'ASSIGN', 'SUBMIT', 'GRADE'} <= set(report['commands'])
+    for stats in report['commands'].values():
+        assert 0 < stats['p50_ms'] <= stats['p95_ms'] <= stats['p99_ms']
+        assert stats['queries_per_email'] >= 1
+    assert report['emails_per_second'] > 0
@@ -0,0 +1,77 @@
+import hashlib
+import io
+import os
+import tempfile
+import pytest
+from email.mime.text import MIMEText
+from src.blob_store import BlobNotFoundError, LocalBlobStore, archive_raw_mime, iter_chunks, iter_file
+from src.gmail_client import GmailClient
+from src.gmail_fake import FakeGmailService
+from src.gmail_ingestion import GmailIngestionService
+from src.models import EmailMessageDB
+from src.processor import EmailProcessor
+
+@pytest.fixture
+def store():
+    """Fixture providing a blob store in a scratch directory."""
+    with tempfile.TemporaryDirectory() as root:
+        yield LocalBlobStore(root)
+
+def _raw_email(index: int) -> bytes:
+    mime = MIMEText("Student: STU001\n" + "Essay text. " * 200, 'plain')
+    mime['From'] = 'student@example.com'
+    mime['To'] = 'assignments@example.com'
+    mime['Subject'] = 'SUBMIT ENG7-0115'
+    mime['Message-ID'] = f'<submit-{index}@example.com>'
+    return mime.as_bytes()
+
+def test_put_is_content_addressed_and_compressed(store):
+    """Test objects are keyed by SHA-256, stored once, compressed, and read back intact."""
+    content = _raw_email(1)
+    first = store.put(iter_chunks(content, chunk_size=100))
+    second = store.put(iter_file(io.BytesIO(content)))
+
+    assert first.key == hashlib.sha256(content).hexdigest()
+    assert first.created and not second.created
+    assert second.key == first.key
+    assert first.size == len(content)
+    assert first.stored_size < first.size
+    assert store.get(first.key) == content
+    assert b''.join(store.iter_content(first.key, chunk_size=64)) == content
+    assert sum(len(files) for _, _, files in os.walk(store.root)) == 1
+
+def test_unknown_or_malformed_keys_are_not_found(store):
+    """Test reads of missing keys fail cleanly and keys never escape the store root."""
+    assert not store.exists('0' * 64)
+    assert not store.exists('../../etc/passwd')
+    with pytest.raises(BlobNotFoundError):
+        store.get('0' * 64)
+
+def test_raw_blob_report(store, db):
+    """Test archived objects are counted once in the size/compression report."""
+    assert db.get_raw_blob_stats() == {'objects': 0, 'size': 0, 'stored_size': 0,
+                                       'compression_ratio': None, 'email_messages': 0}
+    for content in (_raw_email(1), _raw_email(1), _raw_email(2)):
+        archive_raw_mime(store, db, iter_chunks(content))
+
+    stats = db.get_raw_blob_stats()
+    assert stats['objects'] == 2
+    assert stats['size'] == len(_raw_email(1)) + len(_raw_email(2))
+    assert stats['compression_ratio'] > 1
+
+def test_ingestion_archives_raw_mime(store, db):
+    """Test ingested messages are archived and their audit rows reference the blob."""
+    service = FakeGmailService()
+    ingestion = GmailIngestionService(GmailClient(service=service), db, EmailProcessor(db), blob_store=store)
+    start = service.history_id
+    content = _raw_email(1)
+    service.add_message(content)
+
+    result = ingestion.process_history(start)
+
+    assert result['processed_count'] == 1
+    key = hashlib.sha256(content).hexdigest()
+    assert store.get(key) == content
+    with db.SessionLocal() as session:
+        assert session.query(EmailMessageDB.raw_blob_key).scalar() == key
+    assert db.get_raw_blob_stats()['email_messages'] == 1
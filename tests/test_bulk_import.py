@@ -0,0 +1,90 @@
+import pytest
+import mailbox
+from email.mime.text import MIMEText
+from src.processor import EmailProcessor
+from src.bulk_import import iter_directory, iter_maildir, parse_email_bytes, process_mailbox, PARSE_ERROR
+from src.synthetic import SyntheticSchool
+
+@pytest.fixture
+def school(db):
+    """Fixture providing a small synthetic roster written to the database."""
+    school = SyntheticSchool(teachers=1, students_per_class=5, seed=3)
+    school.populate(db)
+    return school
+
+def test_parse_email_bytes_handles_folded_headers_and_mime():
+    """Test folded/encoded headers are unfolded and the text part of a multipart body is used."""
+    raw = (b"From: Teacher <teacher@example.com>\r\nTo: assignments@example.com\r\n"
+           b"Subject: =?utf-8?q?SUBMIT?=\r\n ENG7-0115\r\nMIME-Version: 1.0\r\n"
+           b"Content-Type: multipart/alternative; boundary=b\r\n\r\n"
+           b"--b\r\nContent-Type: text/html\r\n\r\n<p>html</p>\r\n"
+           b"--b\r\nContent-Type: text/plain\r\n\r\nStudentID: STU001\r\n--b--\r\n")
+
+    email = parse_email_bytes(raw, "msg-1")
+
+    assert email['subject'] == "SUBMIT ENG7-0115"
+    assert email['email_content'] == "StudentID: STU001"
+    assert email['message_id'] == "<msg-1@bulk-import>"
+
+def test_iter_directory_reads_only_eml_files(tmp_path):
+    """Test checkpoints, databases, editor temp files and hidden files are not read as email."""
+    for name in ("b.eml", "sub/a.EML", ".process-checkpoint.json", "assignments.db", "b.eml~", ".c.eml",
+                 ".git/d.eml", "notes.txt"):
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_bytes(b"Subject: HELLO\n\n")
+
+    assert [key for key, _ in iter_directory(str(tmp_path))] == ["b.eml", "sub/a.EML"]
+
+def test_iter_maildir_orders_by_delivery_time(tmp_path):
+    """Test Maildir keys are ordered numerically, so 99999 microseconds comes before 100000."""
+    box = mailbox.Maildir(str(tmp_path / "maildir"))
+    box.close()
+    for n, name in enumerate(["1700000000.M100000P7Q2.host", "1700000000.M99999P7Q1.host", "999999999.M5P7Q3.host"]):
+        (tmp_path / "maildir" / "new" / name).write_bytes(b"Subject: %d\n\n" % n)
+
+    assert [key for key, _ in iter_maildir(str(tmp_path / "maildir"))] == [
+        "999999999.M5P7Q3.host", "1700000000.M99999P7Q1.host", "1700000000.M100000P7Q2.host"]
+
+@pytest.mark.parametrize('kind', ['mbox', 'maildir'])
+def test_process_mailbox_keeps_order_and_reports_results(db, school, kind, tmp_path):
+    """Test an export is processed in order across parser processes, with results by parse_result."""
+    emails = list(school.emails(40))
+    path = str(tmp_path / kind)
+    box = mailbox.mbox(path) if kind == 'mbox' else mailbox.Maildir(path)
+    for email in emails:
+        box.add(email.as_mime())
+    box.add(b"Subject: not an email\n\n")
+    box.close()
+
+    summary = process_mailbox(kind, path, EmailProcessor(db), db, workers=2, batch_size=7)
+
+    expected = {'ASSIGN': 'ASSIGNMENT_CREATED', 'SUBMIT': 'SUBMISSION_RECEIVED', 'GRADE': 'GRADE_RECEIVED',
+                'RETURN': 'GRADE_RECEIVED', 'UNKNOWN': 'UNKNOWN_COMMAND'}
+    results = {}
+    for email in emails:
+        results[expected[email.command]] = results.get(expected[email.command], 0) + 1
+    results['UNKNOWN_COMMAND'] = results.get('UNKNOWN_COMMAND', 0) + 1  # the message without a command
+    assert summary['processed'] == 41
+    assert summary['results'] == results
+    assert PARSE_ERROR not in summary['results']
+
+def test_resume_skips_committed_messages(db, school, tmp_path):
+    """Test a rerun with resume starts after the last committed batch."""
+    source = tmp_path / "export"
+    source.mkdir()
+    for n, email in enumerate(school.emails(12)):
+        (source / f"{n:03d}.eml").write_bytes(email.as_mime())
+    checkpoint = str(tmp_path / "checkpoint.json")
+
+    first = process_mailbox('dir', str(source), EmailProcessor(db), db, batch_size=5, checkpoint_path=checkpoint)
+    mime = MIMEText("When is it due?")
+    mime['Subject'] = "Question"
+    (source / "100.eml").write_bytes(mime.as_bytes())
+    second = process_mailbox('dir', str(source), EmailProcessor(db), db, batch_size=5,
+                             checkpoint_path=checkpoint, resume=True)
+
+    assert (first['processed'], first['skipped']) == (12, 0)
+    assert (second['processed'], second['skipped']) == (1, 12)
+    assert second['results'] == {'UNKNOWN_COMMAND': 1}
+    with pytest.raises(ValueError):
+        process_mailbox('dir', str(tmp_path), EmailProcessor(db), db, checkpoint_path=checkpoint, resume=True)
@@ -0,0 +1,158 @@
+import pytest
+import tempfile
+import os
+from datetime import datetime
+from src.cache import LookupCache, VersionPoller
+from src.storage import Database
+from src.processor import EmailProcessor
+from src.models import Teacher, Class, Term
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def test_lru_eviction_and_counters():
+    """Test least recently used entries are evicted and counted."""
+    cache = LookupCache(max_size=2)
+    cache.get_or_load("a", lambda: 1)
+    cache.get_or_load("b", lambda: 2)
+    assert cache.get_or_load("a", lambda: 99) == 1  # hit, "a" is now most recent
+    cache.get_or_load("c", lambda: 3)  # evicts "b"
+    
+    assert cache.get_or_load("b", lambda: 22) == 22
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 4
+    assert stats['evictions'] == 2
+    assert stats['size'] == 2
+
+def test_ttl_and_negative_ttl():
+    """Test found and None results expire on their own TTLs."""
+    clock = FakeClock()
+    cache = LookupCache(ttl=60, negative_ttl=5, clock=clock)
+    cache.get_or_load("found", lambda: "x")
+    cache.get_or_load("missing", lambda: None)
+    
+    clock.now = 10
+    assert cache.get_or_load("found", lambda: "y") == "x"
+    assert cache.get_or_load("missing", lambda: "now exists") == "now exists"
+    
+    clock.now = 61
+    assert cache.get_or_load("found", lambda: "y") == "y"
+    assert cache.stats()['expirations'] == 2
+
+def test_negative_ttl_zero_skips_none():
+    """Test negative_ttl=0 never caches None results."""
+    cache = LookupCache(negative_ttl=0)
+    cache.get_or_load("missing", lambda: None)
+    assert len(cache) == 0
+
+def test_processor_cache_invalidated_on_teacher_and_class_writes():
+    """Test a teacher/class created after a negative lookup is seen immediately."""
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp:
+        db_path = f"sqlite:///{tmp.name}"
+    
+    try:
+        db = Database(db_path)
+        processor = EmailProcessor(db, cache=LookupCache(negative_ttl=3600))
+        assignment_email = "Title: Essay\nClass: English 7\nDeadline: 2025-01-15 23:59 CT"
+        
+        def send(message_id):
+            return processor.process_email(assignment_email, "teacher@test.com", ["a@test.com"], "ASSIGN", message_id)
+        
+        assert "not authorized" in send("msg-1")
+        
+        db.save_term(Term(id="term-1", name="FALL", year=2024,
+                          start_date=datetime(2024, 9, 1), end_date=datetime(2024, 12, 15)))
+        db.save_teacher(Teacher(id="teacher-1", email="teacher@test.com", first_name="Jane", last_name="Smith"))
+        assert "Class 'English 7' not found" in send("msg-2")
+        
+        db.save_class(Class(id="class-1", term_id="term-1", name="English 7", teacher_id="teacher-1"))
+        assert "created successfully" in send("msg-3")
+        
+        # Roster version bumps also drop the cached class
+        assert db.bump_roster_version("class-1") == 2
+        assert processor._validate_class_exists("English 7", db).roster_version == 2
+        
+    finally:
+        if os.path.exists(db_path.replace("sqlite:///", "")):
+            os.unlink(db_path.replace("sqlite:///", ""))
+
+def test_write_listeners_run_only_after_commit():
+    """Test writes inside a unit of work notify listeners on commit, and never when it rolls back."""
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp:
+        db_path = f"sqlite:///{tmp.name}"
+    
+    try:
+        db = Database(db_path)
+        notified = []
+        db.add_write_listener(lambda table, key: notified.append((table, key)))
+        
+        with db.transaction() as uow:
+            db.save_teacher(Teacher(id="teacher-1", email="teacher@test.com", first_name="Jane", last_name="Smith"),
+                            session=uow.session)
+            assert notified == []
+        assert notified == [("teachers", "teacher@test.com")]
+        
+        with pytest.raises(RuntimeError):
+            with db.transaction() as uow:
+                db.save_teacher(Teacher(id="teacher-2", email="other@test.com", first_name="Al", last_name="Lee"),
+                                session=uow.session)
+                raise RuntimeError("rolled back")
+        assert notified == [("teachers", "teacher@test.com")]
+        
+    finally:
+        if os.path.exists(db_path.replace("sqlite:///", "")):
+            os.unlink(db_path.replace("sqlite:///", ""))
+
+def test_version_poller_reports_changed_tables():
+    """Test poller rate-limits reads and reports tables whose version moved."""
+    clock = FakeClock()
+    versions = {'teachers': 1}
+    poller = VersionPoller(lambda: dict(versions), interval_ms=500, clock=clock)
+    
+    assert poller.poll() == set()  # baseline
+    versions['teachers'] = 2
+    versions['classes'] = 1
+    assert poller.poll() == set()  # not due yet
+    assert poller.polls == 1
+    
+    clock.now = 0.5
+    assert poller.poll() == {'teachers', 'classes'}
+    clock.now = 1.0
+    assert poller.poll() == set()
+
+def test_cache_coherent_across_processors():
+    """Test a teacher added through another worker's Database is picked up."""
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp:
+        db_path = f"sqlite:///{tmp.name}"
+    
+    try:
+        worker_a = Database(db_path)
+        worker_b = Database(db_path)
+        clock = FakeClock()
+        processor = EmailProcessor(
+            worker_a,
+            cache=LookupCache(negative_ttl=3600, clock=clock),
+            version_poller=VersionPoller(worker_a.get_table_versions, interval_ms=100, clock=clock)
+        )
+        
+        def send(message_id):
+            return processor.process_email("Title: Essay\nClass: English 7\nDeadline: 2025-01-15 23:59 CT",
+                                           "teacher@test.com", ["a@test.com"], "ASSIGN", message_id)
+        
+        assert "not authorized" in send("msg-1")
+        
+        # Written by another worker: no local write listener fires
+        worker_b.save_teacher(Teacher(id="teacher-1", email="teacher@test.com", first_name="Jane", last_name="Smith"))
+        assert "not authorized" in send("msg-2")  # poll not due yet
+        
+        clock.now = 1.0
+        assert "Class 'English 7' not found" in send("msg-3")
+        
+    finally:
+        if os.path.exists(db_path.replace("sqlite:///", "")):
+            os.unlink(db_path.replace("sqlite:///", ""))
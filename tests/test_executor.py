@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import pytest
+from src.executor import BlockingExecutor, ExecutorSaturatedError, KeyedExecutor
+
+def test_run_offloads_to_worker_thread():
+    """Test calls run off the event loop thread and return their result."""
+    pool = BlockingExecutor("test", max_workers=2, max_queue=0)
+    loop_thread = threading.get_ident()
+    
+    async def main():
+        return await pool.run(lambda x, y=0: (threading.get_ident(), x + y), 1, y=2)
+    
+    try:
+        worker_thread, value = asyncio.run(main())
+        assert value == 3
+        assert worker_thread != loop_thread
+        stats = pool.stats()
+        assert stats['submitted'] == 1
+        assert stats['completed'] == 1
+        assert stats['failed'] == 0
+    finally:
+        pool.shutdown()
+
+def test_run_rejects_when_saturated():
+    """Test calls beyond max_workers + max_queue are rejected and counted."""
+    pool = BlockingExecutor("test", max_workers=1, max_queue=1)
+    release = threading.Event()
+    
+    async def main():
+        blocked = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorSaturatedError):
+            await pool.run(lambda: None)
+        assert pool.stats()['queued'] + pool.stats()['active'] == 2
+        release.set()
+        await asyncio.gather(*blocked)
+    
+    try:
+        asyncio.run(main())
+        stats = pool.stats()
+        assert stats['rejected'] == 1
+        assert stats['completed'] == 2
+        assert stats['peak_in_flight'] == 2
+    finally:
+        pool.shutdown()
+
+def test_cancelled_caller_keeps_slot_until_call_finishes():
+    """Test a call whose awaiting coroutine is cancelled still counts against the limit until it ends."""
+    pool = BlockingExecutor("test", max_workers=1, max_queue=0)
+    started = threading.Event()
+    release = threading.Event()
+    
+    def blocking():
+        started.set()
+        release.wait()
+    
+    async def main():
+        request = asyncio.ensure_future(pool.run(blocking))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        request.cancel()  # e.g. the client disconnected
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        with pytest.raises(ExecutorSaturatedError):
+            await pool.run(lambda: None)
+        assert pool.stats()['active'] == 1 and pool.stats()['queued'] == 0
+        release.set()
+        await asyncio.get_running_loop().run_in_executor(None, lambda: pool.shutdown(wait=True))
+    
+    asyncio.run(main())
+    stats = pool.stats()
+    assert (stats['active'], stats['queued'], stats['completed']) == (0, 0, 1)
+
+def test_run_propagates_errors():
+    """Test exceptions from the call reach the awaiting coroutine."""
+    pool = BlockingExecutor("test", max_workers=1, max_queue=0)
+    
+    def boom():
+        raise ValueError("boom")
+    
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(pool.run(boom))
+        assert pool.stats()['failed'] == 1
+    finally:
+        pool.shutdown()
+
+def test_keyed_executor_orders_tasks_sharing_a_key():
+    """Test tasks with a common key run in submission order while others run in parallel."""
+    events = []
+    lock = threading.Lock()
+    first_started = threading.Event()
+    release_first = threading.Event()
+
+    def task(name, block=False):
+        if block:
+            first_started.set()
+            assert release_first.wait(5)
+        with lock:
+            events.append(name)
+        return name
+
+    with KeyedExecutor("test", max_workers=4, max_in_flight=10) as pool:
+        first = pool.submit(["sender:a"], task, "a1", block=True)
+        assert first_started.wait(5)
+        second = pool.submit(["sender:a"], task, "a2")
+        # No key in common with the blocked a1, so it runs right away
+        third = pool.submit(["sender:b", "assignment:X"], task, "b1")
+        unrelated = pool.submit(["sender:c"], task, "c1")
+        assert unrelated.result(timeout=5) == "c1"
+        assert third.result(timeout=5) == "b1"
+        release_first.set()
+        assert [f.result(timeout=5) for f in (first, second)] == ["a1", "a2"]
+        # Shares keys with both b1 and a2
+        fourth = pool.submit(["assignment:X", "sender:a"], task, "a3")
+        assert fourth.result(timeout=5) == "a3"
+
+    assert events.index("a1") < events.index("a2") < events.index("a3")
+    assert events.index("c1") < events.index("a1")
+
+def test_keyed_executor_chains_dependencies_across_keys():
+    """Test a task holding two keys waits for the latest task of each."""
+    order = []
+    gate = threading.Event()
+
+    def slow(name):
+        gate.wait(5)
+        order.append(name)
+
+    with KeyedExecutor("test", max_workers=4, max_in_flight=10) as pool:
+        pool.submit(["sender:teacher", "assignment:ENG7-0115"], slow, "assign")
+        submit = pool.submit(["sender:student", "assignment:ENG7-0115"], order.append, "submit")
+        gate.set()
+        submit.result(timeout=5)
+
+    assert order == ["assign", "submit"]
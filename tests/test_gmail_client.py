@@ -0,0 +1,65 @@
+import base64
+import pytest
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from src.gmail_client import GmailClient
+
+@pytest.fixture
+def gmail():
+    """GmailClient without API credentials; parsing needs no service."""
+    return GmailClient.__new__(GmailClient)
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+def _full_payload(mime) -> dict:
+    """Build the format='full' payload Gmail would return for a MIME message."""
+    headers = [{'name': name, 'value': value} for name, value in mime.items()]
+    if mime.is_multipart():
+        parts = [
+            {'mimeType': part.get_content_type(), 'body': {'data': _b64(part.get_payload(decode=True))}}
+            for part in mime.get_payload()
+        ]
+        return {'headers': headers, 'mimeType': mime.get_content_type(), 'body': {}, 'parts': parts}
+    return {'headers': headers, 'mimeType': mime.get_content_type(),
+            'body': {'data': _b64(mime.get_payload(decode=True))}}
+
+def _message(multipart: bool):
+    if multipart:
+        mime = MIMEMultipart('alternative')
+        mime.attach(MIMEText("Student: STU001\n", 'plain'))
+        mime.attach(MIMEText("<p>Student: STU001</p>", 'html'))
+    else:
+        mime = MIMEText("Student: STU001\n", 'plain')
+    mime['From'] = 'student@example.com'
+    mime['To'] = 'assignments@example.com'
+    mime['Subject'] = 'SUBMIT ENG7-0115'
+    mime['Date'] = 'Wed, 15 Jan 2025 10:00:00 +0000'
+    mime['Message-ID'] = '<submit-1@example.com>'
+    return mime
+
+@pytest.mark.parametrize("multipart", [False, True])
+def test_parse_raw_message_matches_full_format(gmail, multipart):
+    """Test local MIME parsing produces the same dict as parsing the format='full' payload."""
+    mime = _message(multipart)
+    raw_mime = mime.as_bytes()
+    full = {'id': 'msg-1', 'threadId': 'thread-1', 'payload': _full_payload(mime)}
+    raw = {'id': 'msg-1', 'threadId': 'thread-1', 'raw': _b64(raw_mime)}
+
+    parsed = gmail.parse_raw_message(raw, raw_mime)
+    assert parsed == gmail.parse_message(full)
+    assert parsed['body'] == "Student: STU001"
+    assert parsed['email_message_id'] == '<submit-1@example.com>'
+
+def test_parse_raw_message_decodes_headers_and_falls_back_to_html(gmail):
+    """Test encoded-word subjects are decoded and HTML-only bodies are used."""
+    mime = MIMEText("<p>Hi</p>", 'html', 'utf-8')
+    mime['From'] = 'teacher@example.com'
+    mime['Subject'] = '=?utf-8?q?ASSIGN_caf=C3=A9?='
+    raw_mime = mime.as_bytes()
+
+    parsed = gmail.parse_raw_message({'id': 'msg-2'}, raw_mime)
+    assert parsed['subject'] == 'ASSIGN café'
+    assert parsed['body'] == '<p>Hi</p>'
+    assert parsed['to'] is None
+    assert 'email_message_id' not in parsed
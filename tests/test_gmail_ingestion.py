@@ -0,0 +1,305 @@
+import pytest
+import threading
+import time
+from datetime import datetime
+from email.mime.text import MIMEText
+from sqlalchemy.exc import OperationalError
+from src.models import Class, Teacher, Term
+from src.processor import EmailProcessor
+from src.gmail_client import GmailClient
+from src.gmail_ingestion import GmailIngestionService
+from src.gmail_fake import FakeGmailService
+
+def _raw_email(index: int) -> bytes:
+    mime = MIMEText(f"Student: STU{index:03d}\n", 'plain')
+    mime['From'] = f'student{index}@example.com'
+    mime['To'] = 'assignments@example.com'
+    mime['Subject'] = 'SUBMIT ENG7-0115'
+    mime['Message-ID'] = f'<submit-{index}@example.com>'
+    return mime.as_bytes()
+
+@pytest.fixture
+def fake_gmail():
+    """Fixture providing a fake Gmail service and a client bound to it."""
+    service = FakeGmailService()
+    return service, GmailClient(service=service, user_email='assignments@example.com')
+
+@pytest.fixture
+def ingestion(fake_gmail, db):
+    """Fixture providing an ingestion service over the fake Gmail client."""
+    return GmailIngestionService(fake_gmail[1], db, EmailProcessor(db), fetch_batch_size=50)
+
+def test_get_messages_batch_uses_one_round_trip_per_chunk(fake_gmail):
+    """Test batch fetches chunk ids, dedupe them, and report per-message errors."""
+    service, client = fake_gmail
+    ids = [service.add_message(_raw_email(i)) for i in range(5)]
+
+    results = list(client.get_messages_batch(ids + [ids[0], 'missing'], batch_size=2))
+
+    assert [message_id for message_id, _, _ in results] == ids + ['missing']
+    assert all(message['id'] == message_id for message_id, message, error in results[:5])
+    assert results[-1][1] is None
+    assert results[-1][2].resp.status == 404
+    assert service.round_trips == 3
+    assert service.calls['messages.get'] == 6
+
+def test_process_history_fetches_in_batches(fake_gmail, ingestion):
+    """Test a history burst is fetched with batch requests instead of one call per message."""
+    service, _ = fake_gmail
+    start = service.history_id
+    for i in range(90):
+        service.add_message(_raw_email(i))
+
+    result = ingestion.process_history(start)
+
+    assert result['status'] == 'success'
+    assert result['processed_count'] == 90
+    assert result['errors'] == []
+    # One history.list call plus ceil(90 / 50) batch requests
+    assert service.round_trips == 1 + 2
+    assert service.calls['messages.get'] == 90
+
+    # Already-processed messages are not fetched again
+    assert ingestion.process_history(start)['processed_count'] == 0
+    assert service.calls['messages.get'] == 90
+
+def test_process_history_follows_pages_and_resumes_from_checkpoint(fake_gmail, db):
+    """Test every history page is processed, checkpointed, and resumed after a restart."""
+    service, client = fake_gmail
+    start = service.history_id
+    for i in range(60):
+        service.add_message(_raw_email(i))
+
+    ingestion = GmailIngestionService(client, db, EmailProcessor(db), history_page_size=25)
+    result = ingestion.process_history(start)
+    assert result['processed_count'] == 60
+    assert service.calls['history.list'] == 3
+    assert db.get_gmail_sync_state('assignments@example.com')[0] == service.history_id
+
+    # A fresh instance (no in-memory dedup) only sees messages after the stored checkpoint
+    for i in range(60, 65):
+        service.add_message(_raw_email(i))
+    restarted = GmailIngestionService(client, db, EmailProcessor(db), history_page_size=25)
+    result = restarted.process_history(service.history_id)
+    assert result['processed_count'] == 5
+    assert result['history_id'] == service.history_id
+
+    # Redelivered notification at or before the checkpoint makes no API calls
+    calls = sum(service.calls.values())
+    assert restarted.process_history(service.history_id)['processed_count'] == 0
+    assert sum(service.calls.values()) == calls
+
+def test_process_history_checkpoints_before_failed_page(fake_gmail, db):
+    """Test a page with a transient failure is not checkpointed, so it is retried next sync."""
+    service, client = fake_gmail
+    start = service.history_id
+    for i in range(10):
+        service.add_message(_raw_email(i))
+
+    ingestion = GmailIngestionService(client, db, FlakyProcessor(db, fail_at=7), history_page_size=5)
+    result = ingestion.process_history(start)
+
+    assert result['processed_count'] == 9
+    assert len(result['errors']) == 1
+    # Checkpoint stops at the last record of the first page (messages 0-4)
+    assert db.get_gmail_sync_state('assignments@example.com')[0] == str(int(start) + 5)
+
+def test_permanent_failures_do_not_hold_the_checkpoint(fake_gmail, db):
+    """Test messages that can never succeed are marked processed, so later messages and the checkpoint go through."""
+    service, client = fake_gmail
+    start = service.history_id
+    db.save_term(Term(id="term-1", name="FALL", year=2024,
+                      start_date=datetime(2024, 9, 1), end_date=datetime(2024, 12, 15)))
+    db.save_teacher(Teacher(id="teacher-1", email="teacher@example.com", first_name="Jane", last_name="Smith"))
+    db.save_class(Class(id="class-1", term_id="term-1", name="English 7", teacher_id="teacher-1"))
+    assign_body = "Title: Essay\nClass: English 7\nDeadline: 2025-01-15 23:59 CT\n"
+    EmailProcessor(db).process_email(assign_body, 'teacher@example.com', ['assignments@example.com'],
+                                     'ASSIGN', '<assign-0@example.com>')
+    service.add_message(_command_email('teacher@example.com', 'ASSIGN', assign_body, 0))  # duplicate code
+    deleted = service.add_message(_raw_email(1))
+    service.delete_message(deleted)  # 404 on fetch
+    for i in range(2, 12):
+        service.add_message(_command_email(f'student{i}@example.com', 'HELLO', "Hi", i))
+
+    ingestion = GmailIngestionService(client, db, EmailProcessor(db), history_page_size=5)
+    result = ingestion.process_history(start)
+
+    assert [message['status'] for message in result['messages']] == ['failed', 'failed'] + ['processed'] * 10
+    assert (len(result['failed']), result['errors']) == (2, [])
+    assert db.get_gmail_sync_state('assignments@example.com')[0] == service.history_id
+    assert ingestion.full_resync()['messages'] == []  # all recorded as processed
+
+def test_process_history_falls_back_to_full_resync(fake_gmail, db):
+    """Test an expired history ID triggers a messages.list resync from the checkpoint time."""
+    service, client = fake_gmail
+    start = service.history_id
+    service.add_message(_raw_email(0))
+    ingestion = GmailIngestionService(client, db, EmailProcessor(db))
+    assert ingestion.process_history(start)['processed_count'] == 1
+
+    service.expire_history()
+    for i in range(1, 4):
+        service.add_message(_raw_email(i))
+    result = ingestion.process_history(service.history_id)
+
+    assert result['resync'] is True
+    assert result['processed_count'] == 3
+    assert result['errors'] == []
+    assert db.get_gmail_sync_state('assignments@example.com')[0] == service.history_id
+
+def test_redelivery_is_skipped_across_instances(fake_gmail, db):
+    """Test processed messages are recognised by Gmail ID and Message-ID after a restart."""
+    service, client = fake_gmail
+    first = service.add_message(_raw_email(1))
+    assert GmailIngestionService(client, db, EmailProcessor(db)).process_message(first)['status'] == 'processed'
+
+    restarted = GmailIngestionService(client, db, EmailProcessor(db))
+    calls = service.calls['messages.get']
+    assert restarted.process_message(first)['status'] == 'duplicate'
+    assert service.calls['messages.get'] == calls
+
+    # Same email (same Message-ID) delivered again under a new Gmail ID
+    copy = service.add_message(_raw_email(1))
+    assert restarted.process_message(copy)['status'] == 'duplicate'
+    assert restarted.processed.is_processed(copy)
+
+def test_notification_is_queued_and_processed_by_worker(fake_gmail, db):
+    """Test the webhook path only records the notification; the queue worker ingests."""
+    import base64
+    import json
+    from src.ingestion_queue import IngestionQueue
+
+    service, client = fake_gmail
+    start = service.history_id
+    ingestion = GmailIngestionService(client, db, EmailProcessor(db))
+    db.save_gmail_sync_state(ingestion.mailbox, start, datetime.utcnow())
+    ingestion.queue = IngestionQueue(db, ingestion.process_history)
+    service.add_message(_raw_email(1))
+
+    data = base64.b64encode(json.dumps({'emailAddress': 'assignments@example.com',
+                                        'historyId': service.history_id}).encode()).decode()
+    result = ingestion.handle_pubsub_notification({'message': {'data': data}})
+
+    assert result == {'status': 'queued', 'history_id': service.history_id}
+    assert service.calls['messages.get'] == 0
+    assert ingestion.queue.drain_once()
+    assert service.calls['messages.get'] == 1
+    assert ingestion.queue.stats()['completed'] == 1
+
+class RecordingProcessor:
+    """Processor stand-in that records call order and peak concurrency."""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def process_email(self, email_content, from_email, to_emails, subject, message_id, raw_blob_key=None,
+                      enqueue_reply=False):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delays.get(subject.split()[0], 0.01))
+        with self._lock:
+            self.active -= 1
+            self.calls.append(subject)
+        return "ok"
+
+def _command_email(sender: str, subject: str, body: str, index: int) -> bytes:
+    mime = MIMEText(body, 'plain')
+    mime['From'] = sender
+    mime['To'] = 'assignments@example.com'
+    mime['Subject'] = subject
+    mime['Message-ID'] = f'<cmd-{index}@example.com>'
+    return mime.as_bytes()
+
+def test_concurrent_mode_keeps_related_messages_in_order(fake_gmail, db):
+    """Test parallel processing never lets a SUBMIT overtake its ASSIGN or a sender's earlier email."""
+    service, client = fake_gmail
+    start = service.history_id
+    assign_body = "Title: Essay\nClass: English 7\nDeadline: 2025-01-15 23:59 CT\n"
+    service.add_message(_command_email('teacher@example.com', 'ASSIGN', assign_body, 0))
+    for i in range(1, 7):
+        service.add_message(_command_email(f'student{i}@example.com', 'SUBMIT ENGLISH7-0115', f"Student: STU{i:03d}", i))
+    for i in range(7, 13):
+        service.add_message(_command_email(f'other{i}@example.com', f'SUBMIT MATH-{i:04d}', "Student: STU001", i))
+
+    processor = RecordingProcessor(delays={'ASSIGN': 0.2})
+    ingestion = GmailIngestionService(client, db, processor, fetch_batch_size=5, workers=4)
+    result = ingestion.process_history(start)
+
+    assert result['processed_count'] == 13
+    assert processor.calls.index('ASSIGN') < min(
+        i for i, subject in enumerate(processor.calls) if subject == 'SUBMIT ENGLISH7-0115'
+    )
+    # Unrelated submissions ran alongside the slow ASSIGN
+    assert processor.peak > 1
+    assert processor.calls.index('ASSIGN') > processor.calls.index('SUBMIT MATH-0007')
+    timings = [message['timing_ms'] for message in result['messages']]
+    assert len(timings) == 13
+    assert all(set(timing) == {'fetch', 'queued', 'process'} for timing in timings)
+
+def test_own_and_automatic_mail_is_skipped(fake_gmail, db):
+    """Test mail from the mailbox's own address or marked Auto-Submitted is recorded but never processed."""
+    service, client = fake_gmail
+    start = service.history_id
+    service.add_message(_command_email('Assignments <assignments@example.com>', 'SUBMIT ENG7-0115', "StudentID: STU001", 1))
+    auto_reply = _command_email('student2@example.com', 'Out of office', "Back Monday", 2)
+    service.add_message(auto_reply.replace(b'Subject:', b'Auto-Submitted: auto-replied\nSubject:'))
+    service.add_message(_raw_email(3))
+    processor = RecordingProcessor()
+    ingestion = GmailIngestionService(client, db, processor)
+
+    result = ingestion.process_history(start)
+
+    assert [message['status'] for message in result['messages']] == ['skipped', 'skipped', 'processed']
+    assert processor.calls == ['SUBMIT ENG7-0115']
+    assert result['history_id'] == service.history_id
+    assert ingestion.process_history()['processed_count'] == 0
+
+class FlakyProcessor(EmailProcessor):
+    """EmailProcessor whose call number `fail_at` fails once with a transient DB error."""
+
+    def __init__(self, db, fail_at=0):
+        super().__init__(db)
+        self.calls = 0
+        self.fail_at = fail_at
+
+    def process_email(self, *args, **kwargs):
+        self.calls += 1
+        if self.calls == self.fail_at + 1:
+            raise OperationalError("INSERT INTO email_messages", {}, Exception("database is locked"))
+        return super().process_email(*args, **kwargs)
+
+def test_failed_processing_holds_checkpoint_until_retried(fake_gmail, db):
+    """Test a message that was fetched but failed processing is retried next sync, not skipped."""
+    service, client = fake_gmail
+    start = service.history_id
+    for i in range(3):
+        service.add_message(_raw_email(i))
+    ingestion = GmailIngestionService(client, db, FlakyProcessor(db))
+
+    first = ingestion.process_history(start)
+    assert (first['processed_count'], len(first['errors'])) == (2, 1)
+    assert db.get_gmail_sync_state('assignments@example.com') is None
+
+    second = ingestion.process_history(start)
+    assert (second['processed_count'], second['errors']) == (1, [])
+    assert db.get_gmail_sync_state('assignments@example.com')[0] == service.history_id
+
+def test_message_processed_but_not_marked_is_not_stuck(fake_gmail, db):
+    """Test a message logged before a crash, but never marked processed, is recorded as a duplicate on retry."""
+    service, client = fake_gmail
+    start = service.history_id
+    service.add_message(_raw_email(1))
+    EmailProcessor(db).process_email("Student: STU001", 'student1@example.com', ['assignments@example.com'],
+                                     'SUBMIT ENG7-0115', '<submit-1@example.com>')
+    ingestion = GmailIngestionService(client, db, EmailProcessor(db))
+
+    result = ingestion.process_history(start)
+
+    assert [message['status'] for message in result['messages']] == ['duplicate']
+    assert result['errors'] == []
+    assert result['history_id'] == service.history_id
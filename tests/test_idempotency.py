@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from src.storage import Database
+from src.idempotency import ProcessedMessageStore
+
+def _count_queries(db: Database):
+    queries = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    return queries
+
+def test_processed_keys_survive_restart(db):
+    """Test records are shared through the database, not process memory."""
+    store = ProcessedMessageStore(db)
+    assert store.mark_processed("gmail-1", "<a@example.com>") is True
+    assert store.mark_processed("gmail-1", "<a@example.com>") is False
+
+    restarted = ProcessedMessageStore(db)
+    assert restarted.is_processed("gmail-1")
+    assert restarted.is_rfc_processed("<a@example.com>")
+    assert not restarted.is_processed("gmail-2")
+    assert restarted.filter_unprocessed(["gmail-2", "gmail-1", "gmail-3"]) == ["gmail-2", "gmail-3"]
+
+def test_same_message_id_under_new_gmail_id(db):
+    """Test an email redelivered under another Gmail ID is recorded for that ID too."""
+    store = ProcessedMessageStore(db)
+    store.mark_processed("gmail-1", "<a@example.com>")
+
+    assert store.mark_processed("gmail-2", "<a@example.com>") is True
+    assert ProcessedMessageStore(db).is_processed("gmail-2")
+
+def test_front_cache_skips_queries_for_known_keys(db):
+    """Test repeat checks of processed keys are answered without a query."""
+    store = ProcessedMessageStore(db)
+    store.mark_processed("gmail-1", "<a@example.com>")
+
+    queries = _count_queries(db)
+    assert store.is_processed("gmail-1")
+    assert store.is_rfc_processed("<a@example.com>")
+    assert store.filter_unprocessed(["gmail-1"]) == []
+    assert queries == []
+
+def test_compaction_drops_keys_past_retention(db):
+    """Test compaction deletes old records and runs at most once per interval."""
+    now = [0.0]
+    store = ProcessedMessageStore(db, retention=timedelta(days=1), compact_interval=60, clock=lambda: now[0])
+    db.mark_message_processed("old", "<old@example.com>", datetime.utcnow() - timedelta(days=2))
+    store.mark_processed("new", "<new@example.com>")
+
+    assert store.maybe_compact() == 0
+    now[0] = 61
+    assert store.maybe_compact() == 1
+    assert store.stats()['compacted'] == 1
+    assert not store.is_processed("old")
+    assert store.is_processed("new")
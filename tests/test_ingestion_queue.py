@@ -0,0 +1,65 @@
+import threading
+from datetime import datetime, timedelta
+from src.ingestion_queue import IngestionQueue
+
+def test_notifications_for_a_mailbox_coalesce(db):
+    """Test queued notifications are handled by one sync at the newest history ID."""
+    calls = []
+    queue = IngestionQueue(db, lambda history_id: calls.append(history_id) or {'status': 'success'})
+
+    assert queue.enqueue("me", "1005")
+    assert queue.enqueue("me", "1012")
+    assert not queue.enqueue("me", "1012")  # Pub/Sub redelivery
+    assert queue.enqueue("me", "998")
+    assert queue.stats()['depth'] == 3
+
+    assert queue.drain_once()
+    assert not queue.drain_once()
+    assert calls == ["1012"]
+    stats = queue.stats()
+    assert stats['depth'] == 0
+    assert stats['completed'] == 3
+    assert stats['coalesced'] == 1
+
+def test_failed_sync_is_retried_with_backoff_then_parked(db):
+    """Test failures return to the queue after a backoff and become FAILED after max_attempts."""
+    queue = IngestionQueue(db, lambda history_id: {'status': 'error', 'error': 'Gmail unavailable'},
+                           max_attempts=2, backoff_base=60)
+    queue.enqueue("me", "1001")
+
+    assert queue.drain_once()
+    stats = queue.stats()
+    assert stats['pending'] == 1
+    assert stats['retried'] == 1
+    assert not queue.drain_once()  # still backing off
+
+    # Past the backoff the second attempt fails and the notification is parked
+    later = datetime.utcnow() + timedelta(minutes=5)
+    claim = db.claim_notifications(later, later - queue.lease)
+    assert claim is not None
+    db.release_notifications(claim[0], later, 'Gmail unavailable', queue.max_attempts)
+    assert queue.stats()['failed'] == 1
+    assert queue.stats()['depth'] == 0
+
+def test_expired_claim_is_reclaimed(db):
+    """Test notifications held by a dead worker are claimable once the lease expires."""
+    db.enqueue_notification("me", "1001", datetime.utcnow())
+    now = datetime.utcnow()
+    assert db.claim_notifications(now, now - timedelta(minutes=5)) is not None
+    assert db.claim_notifications(now, now - timedelta(minutes=5)) is None
+
+    later = now + timedelta(minutes=10)
+    token, mailbox, rows = db.claim_notifications(later, later - timedelta(minutes=5))
+    assert mailbox == "me"
+    assert rows == [(rows[0][0], "1001", 2)]
+
+def test_workers_drain_in_background(db):
+    """Test started workers pick up newly queued notifications without polling delay."""
+    done = threading.Event()
+    queue = IngestionQueue(db, lambda history_id: done.set() or {'status': 'success'}, poll_interval=30)
+    queue.start()
+    try:
+        queue.enqueue("me", "1001")
+        assert done.wait(5)
+    finally:
+        queue.stop(timeout=5)
@@ -0,0 +1,102 @@
+import pytest
+from datetime import datetime
+from email import message_from_bytes
+from email.mime.text import MIMEText
+from src.storage import Database
+from src.processor import EmailProcessor
+from src.gmail_client import GmailClient
+from src.gmail_ingestion import GmailIngestionService
+from src.gmail_fake import FakeGmailService
+from src.outbox import OutboxSender
+from src.rate_limit import QuotaLimiter
+
+@pytest.fixture
+def fake_gmail():
+    """Fixture providing a fake Gmail service and a client that never sleeps between retries."""
+    service = FakeGmailService()
+    limiter = QuotaLimiter(units_per_second=1e6, max_retries=1, sleep=lambda seconds: None)
+    return service, GmailClient(service=service, limiter=limiter)
+
+def _email(n: int, subject: str = "SUBMIT ENG7-0115") -> dict:
+    return {'email_content': "StudentID: STU001", 'from_email': f"student{n}@example.com",
+            'to_emails': ["assignments@example.com"], 'subject': subject, 'message_id': f"<msg-{n}@example.com>"}
+
+def _statuses(db: Database) -> dict:
+    return {status: entry['count'] for status, entry in db.get_outbox_stats().items()}
+
+def test_replies_are_queued_with_the_email(db):
+    """Test replies to commands are queued in the email's transaction, once per incoming message."""
+    processor = EmailProcessor(db)
+    reply = processor.process_email(**_email(1), enqueue_reply=True)
+    processor.process_emails([_email(2), _email(3), _email(4, subject="HELLO")], enqueue_replies=True)
+    processor.process_email(**_email(5))  # replies are opt-in per call
+    with pytest.raises(Exception):
+        processor.process_email(**_email(1), enqueue_reply=True)  # duplicate message_id rolls back, queueing nothing
+
+    # Nothing is queued for the unknown command
+    assert _statuses(db) == {'PENDING': 3}
+    now = datetime.utcnow()
+    _, messages = db.claim_outbox(now, now, limit=10)
+    assert [(m.to_email, m.subject, m.in_reply_to) for m in messages] == [
+        ("student1@example.com", "Re: SUBMIT ENG7-0115", "<msg-1@example.com>"),
+        ("student2@example.com", "Re: SUBMIT ENG7-0115", "<msg-2@example.com>"),
+        ("student3@example.com", "Re: SUBMIT ENG7-0115", "<msg-3@example.com>"),
+    ]
+    assert messages[0].body == reply
+
+def test_sender_sends_batches_as_threaded_replies(db, fake_gmail):
+    """Test queued replies go out in batch requests and are marked SENT."""
+    service, client = fake_gmail
+    EmailProcessor(db).process_emails([_email(n) for n in range(5)], enqueue_replies=True)
+    sender = OutboxSender(db, client, batch_size=3)
+
+    assert sender.drain_once() == 3
+    assert sender.drain_once() == 2
+    assert sender.drain_once() == 0
+
+    assert service.round_trips == 2
+    assert len(service.sent) == 5
+    sent = message_from_bytes(service.sent[0]['raw'])
+    assert sent['To'] == "student0@example.com"
+    assert sent['In-Reply-To'] == "<msg-0@example.com>"
+    assert _statuses(db) == {'SENT': 5}
+    assert sender.stats()['sent_total'] == 5
+
+def test_failed_sends_are_retried_then_dead_lettered(db, fake_gmail):
+    """Test transient failures back off and retry, and exhausted or permanent failures go DEAD."""
+    service, client = fake_gmail
+    EmailProcessor(db).process_emails([_email(1), _email(2)], enqueue_replies=True)
+    sender = OutboxSender(db, client, max_attempts=2, backoff_base=0)
+
+    service.inject_errors('messages.send', status=503, count=1, reason='Backend Error')
+    service.inject_errors('messages.send', status=400, count=1, reason='Invalid To header')
+    sender.drain_once()
+    assert _statuses(db) == {'PENDING': 1, 'DEAD': 1}
+
+    service.inject_errors('messages.send', status=503, count=1, reason='Backend Error')
+    sender.drain_once()
+    assert _statuses(db) == {'DEAD': 2}
+    stats = sender.stats()
+    assert (stats['retried'], stats['dead_total'], stats['sent_total']) == (1, 2, 0)
+    assert service.sent == []
+
+def test_own_replies_are_not_answered_on_the_next_sync(db, fake_gmail):
+    """Test sent replies come back through history labelled SENT and are skipped, so they are never answered."""
+    service, client = fake_gmail
+    ingestion = GmailIngestionService(client, db, EmailProcessor(db), enqueue_replies=True)
+    sender = OutboxSender(db, client)
+    start = service.history_id
+    mime = MIMEText("StudentID: STU001")
+    mime['From'], mime['To'], mime['Subject'] = "student1@example.com", "assignments@example.com", "SUBMIT ENG7-0115"
+    mime['Message-ID'] = "<msg-1@example.com>"
+    service.add_message(mime.as_bytes())
+
+    assert ingestion.process_history(start)['processed_count'] == 1
+    assert sender.drain_once() == 1
+
+    second = ingestion.process_history()
+    assert second['processed_count'] == 0
+    assert [message['status'] for message in second['messages']] == ['skipped']
+    assert second['history_id'] == service.history_id
+    assert sender.drain_once() == 0
+    assert len(service.sent) == 1
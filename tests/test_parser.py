@@ -1,6 +1,9 @@
 import pytest
 from datetime import datetime
-from src.parser import parse_assignment_email, parse_submission_email, parse_return_email
+from src.parser import (
+    parse_assignment_email, parse_submission_email, parse_grade_email, parse_return_email,
+    tokenize_email, EXTRACTORS
+)
 
 def test_parse_assignment_valid():
     """Test valid assignment email parsing."""
@@ -52,3 +55,56 @@ def test_parse_return_valid():
     assert assignment_code == "ENG7-0115"
     assert student_id == "STU001"
     assert grade_data['grade'] == "A-"
+
+def test_tokenize_email_single_pass():
+    """Test tokenizer reads subject verb, arguments and body fields."""
+    tokens = tokenize_email("Grade: B+\nFeedback: Nice: clear argument", "grade eng7-0115 stu001")
+    assert tokens.command == "GRADE"
+    assert tokens.args == ["ENG7-0115", "STU001"]
+    assert tokens.fields == {"grade": "B+", "feedback": "Nice: clear argument"}
+
+def test_extractors_reject_other_commands():
+    """Test each extractor only accepts its own subject verb."""
+    tokens = tokenize_email("StudentID: STU001", "SUBMIT ENG7-0115")
+    assert EXTRACTORS["SUBMIT"](tokens) == ("ENG7-0115", "STU001")
+    assert EXTRACTORS["ASSIGN"](tokens) is None
+    assert EXTRACTORS["GRADE"](tokens) is None
+    assert EXTRACTORS["RETURN"](tokens) is None
+    assert "HELLO" not in EXTRACTORS
+
+def test_parse_grade_and_submit_missing_fields():
+    """Test GRADE without grade and SUBMIT without StudentID are rejected."""
+    assert parse_grade_email("Feedback: ok", "GRADE ENG7-0115 STU001") is None
+    assert parse_grade_email("Grade: A", "GRADE ENG7-0115") is None
+    assert parse_submission_email("Here is my essay.", "SUBMIT ENG7-0115") is None
+    assert parse_submission_email("StudentID: STU001", "SUBMIT") is None
+
+def test_assignment_code_of():
+    """Test the assignment code is derived for ASSIGN and read from the subject otherwise."""
+    from src.parser import assignment_code_of
+    body = "Title: Essay\nClass: English 7\nDeadline: 2025-01-15 23:59 CT"
+    assert assignment_code_of(tokenize_email(body, "ASSIGN")) == "ENGLISH7-0115"
+    assert assignment_code_of(tokenize_email("Student: STU001", "SUBMIT eng7-0115")) == "ENG7-0115"
+    assert assignment_code_of(tokenize_email("", "HELLO there")) is None
+    assert assignment_code_of(tokenize_email("Title: Essay", "ASSIGN")) is None
+
+def test_verb_must_end_at_whitespace():
+    """Test subjects whose first word only starts with a verb are not that command, as before tokenizing."""
+    assert parse_submission_email("StudentID: STU001", "SUBMIT2 ENG7-0115") is None
+    assert parse_submission_email("StudentID: STU001", "SUBMIT: ENG7-0115") is None
+    assert parse_submission_email("StudentID: STU001", " SUBMIT ENG7-0115") is None
+    assert parse_grade_email("Grade: A", "GRADES ENG7-0115 STU001") is None
+    assert parse_submission_email("StudentID: STU001", "SUBMIT\tENG7-0115") == ("ENG7-0115", "STU001")
+    assert tokenize_email("", "GRADE").command == "GRADE"
+    # ASSIGN alone keeps prefix matching
+    body = "Title: Essay\nClass: English 7\nDeadline: 2025-01-15 23:59 CT"
+    assert parse_assignment_email(body, "ASSIGNMENT") is not None
+    assert parse_assignment_email(body, " Assign: essay") is not None
+
+def test_repeated_fields_keep_original_precedence():
+    """Test the first StudentID line wins, while other repeated fields keep the last value."""
+    assert parse_submission_email("StudentID: STU001\nStudentID: STU999", "SUBMIT ENG7-0115") == \
+        ("ENG7-0115", "STU001")
+    assert parse_submission_email("StudentID:\nStudentID: STU999", "SUBMIT ENG7-0115") is None
+    grade = parse_grade_email("Grade: B\nGrade: A-", "GRADE ENG7-0115 STU001")
+    assert grade['grade_value'] == "A-"
@@ -123,3 +123,65 @@ def test_email_processing(test_database_with_data):
     assert "Grade recorded" in response
     assert "STU001" in response
     assert "A-" in response
+
+def test_process_emails_batch(test_database_with_data):
+    """Test batch processing resolves lookups in bulk and commits once."""
+    db = test_database_with_data
+    processor = EmailProcessor(db)
+    
+    processor.process_email(
+        email_content="Title: Test Assignment\nClass: English 7\nDeadline: 2025-01-15 23:59 CT",
+        from_email="teacher@test.com",
+        to_emails=["assignments@test.com"],
+        subject="ASSIGN",
+        message_id="msg-200"
+    )
+    
+    batch = [
+        {"email_content": "StudentID: STU001", "from_email": "student@test.com",
+         "to_emails": ["assignments@test.com"], "subject": "SUBMIT ENGLISH7-0115", "message_id": "msg-201"},
+        {"email_content": "StudentID: STU001", "from_email": "student@test.com",
+         "to_emails": ["assignments@test.com"], "subject": "SUBMIT ENGLISH7-0115", "message_id": "msg-202"},
+        {"email_content": "StudentID: STU999", "from_email": "student@test.com",
+         "to_emails": ["assignments@test.com"], "subject": "SUBMIT ENGLISH7-0115", "message_id": "msg-203"},
+        {"email_content": "Grade: B+", "from_email": "teacher@test.com",
+         "to_emails": ["assignments@test.com"], "subject": "GRADE ENGLISH7-0115 STU001", "message_id": "msg-204"},
+        {"email_content": "Hello", "from_email": "someone@test.com",
+         "to_emails": ["assignments@test.com"], "subject": "HELLO", "message_id": "msg-205"},
+    ]
+    
+    responses = processor.process_emails(batch)
+    
+    assert len(responses) == 5
+    assert "Submission received" in responses[0]
+    assert "already received" in responses[1]
+    assert "Student STU999 not found" in responses[2]
+    assert "Grade recorded" in responses[3]
+    assert "Unknown command" in responses[4]
+    
+    assignment = db.get_assignment_by_code("ENGLISH7-0115")
+    assert len(db.get_submissions_by_assignment(assignment.id)) == 1
+
+def test_process_emails_batch_falls_back_on_commit_failure(test_database_with_data):
+    """Test a failing batch commit is replayed one email at a time."""
+    db = test_database_with_data
+    processor = EmailProcessor(db)
+    
+    batch = [
+        {"email_content": "Title: Batch Assignment\nClass: English 7\nDeadline: 2025-02-01 23:59 CT",
+         "from_email": "teacher@test.com", "to_emails": ["assignments@test.com"],
+         "subject": "ASSIGN", "message_id": "msg-300"},
+        {"email_content": "StudentID: STU001", "from_email": "student@test.com",
+         "to_emails": ["assignments@test.com"], "subject": "SUBMIT ENGLISH7-0201", "message_id": "msg-301"},
+        # Duplicate message_id violates the email_messages unique constraint
+        {"email_content": "Hello", "from_email": "someone@test.com",
+         "to_emails": ["assignments@test.com"], "subject": "HELLO", "message_id": "msg-301"},
+    ]
+    
+    responses = processor.process_emails(batch)
+    
+    assert "created successfully" in responses[0]
+    assert "Submission received" in responses[1]
+    assert responses[2].startswith("Error:")
+    assignment = db.get_assignment_by_code("ENGLISH7-0201")
+    assert len(db.get_submissions_by_assignment(assignment.id)) == 1
@@ -0,0 +1,124 @@
+import pytest
+import tempfile
+import os
+import inspect
+from datetime import datetime
+from sqlalchemy import event
+from src.storage import Database
+from src.models import Assignment, Submission, Grade, Student, Teacher, Class, Term, Parent, Enrollment, EnrollmentDB, StudentDB
+
+# Tables that grow with traffic or school size; a full scan of these is a regression
+LARGE_TABLES = {'assignments', 'submissions', 'grades', 'email_messages', 'enrollments', 'students',
+                'processed_messages'}
+
+# Methods that intentionally read a whole table
+FULL_LISTING_METHODS = {'get_all_assignments', 'get_all_assignments_with_classes'}
+
+# Every Database query method, with arguments that exercise its hot path
+QUERY_CALLS = {
+    'get_assignment_by_code': ("ENG7-0115",),
+    'get_submission_by_assignment_and_student': ("assignment-1", "STU001"),
+    'get_submissions_by_assignment': ("assignment-1",),
+    'get_student_by_id': ("STU001",),
+    'get_teacher_by_email': ("teacher@example.com",),
+    'get_class_by_name': ("English 7",),
+    'get_class_by_id': ("class-1",),
+    'get_enrollments_by_class': ("class-1",),
+    'is_student_enrolled_in_class': ("STU001", "class-1"),
+    'get_assignment_with_class_by_code': ("ENG7-0115",),
+    'get_assignments_by_codes': (["ENG7-0115", "ENG7-0116"],),
+    'get_students_by_ids': (["STU001", "STU002"],),
+    'get_active_enrollment_pairs': (["STU001"], ["class-1"]),
+    'get_submissions_by_assignments_and_students': (["assignment-1"], ["STU001"]),
+    'get_table_versions': (),
+    'bump_roster_version': ("class-1",),
+    'get_assignments_page': (50,),
+    'get_gmail_sync_state': ("assignments@example.com",),
+    'get_processed_gmail_ids': (["18c2f0a1b2c3d4e5"],),
+    'is_rfc_message_processed': ("<submit-1@example.com>",),
+    'get_ingestion_queue_stats': (),
+    'get_raw_blob_stats': (),
+    'get_outbox_stats': (),
+    'get_parse_results': (["<submit-1@example.com>"],),
+    'get_email_messages_page': (datetime(2024, 1, 1), datetime(2030, 1, 1), 100),
+    'get_rows_by_ids': (EnrollmentDB, ["enrollment-1"]),
+    'get_existing_keys': (StudentDB.student_id, ["STU001"]),
+}
+
+def _is_query_method(name: str) -> bool:
+    return not name.startswith('_') and name.startswith(('get_', 'is_'))
+
+@pytest.fixture
+def planned_db():
+    """Fixture providing a small database with one row per table."""
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp:
+        db_path = f"sqlite:///{tmp.name}"
+
+    try:
+        db = Database(db_path)
+        db.save_term(Term(id="term-1", name="FALL", year=2024,
+                          start_date=datetime(2024, 9, 1), end_date=datetime(2024, 12, 15)))
+        db.save_teacher(Teacher(id="teacher-1", email="teacher@example.com", first_name="Jane", last_name="Smith"))
+        db.save_class(Class(id="class-1", term_id="term-1", name="English 7", teacher_id="teacher-1"))
+        db.save_student(Student(id="student-1", student_id="STU001", first_name="John", last_name="Doe"))
+        db.save_parent(Parent(id="parent-1", email="parent@example.com"))
+        db.save_enrollment(Enrollment(id="enrollment-1", class_id="class-1", student_id="STU001",
+                                      parent_id="parent-1", joined_at=datetime.utcnow()))
+        db.save_assignment(Assignment(id="assignment-1", code="ENG7-0115", class_id="class-1", title="Essay",
+                                      deadline_at=datetime(2025, 1, 15, 23, 59), created_by_teacher_id="teacher-1",
+                                      created_at=datetime.utcnow()))
+        db.save_submission(Submission(id="sub-1", assignment_id="assignment-1", student_id="STU001",
+                                      received_at=datetime.utcnow(), on_time=True))
+        db.save_grade(Grade(id="grade-1", assignment_id="assignment-1", student_id="STU001",
+                            grade_value="A", graded_at=datetime.utcnow()))
+        yield db
+    finally:
+        if os.path.exists(db_path.replace("sqlite:///", "")):
+            os.unlink(db_path.replace("sqlite:///", ""))
+
+def _capture_statements(db: Database, call):
+    """Run call() and return the (sql, params) of every data-reading statement it issued."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        call()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+def _full_scans(db: Database, statement: str, parameters) -> list:
+    """Return the large tables EXPLAIN QUERY PLAN reports as fully scanned."""
+    with db.engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        # "SCAN t USING INDEX i" walks an index in ORDER BY order and stops at LIMIT;
+        # only a bare "SCAN t" reads the whole table
+        if detail.startswith('SCAN ') and 'USING' not in detail:
+            table = detail.split()[1]
+            if table in LARGE_TABLES:
+                scans.append(detail)
+    return scans
+
+def test_every_query_method_is_planned():
+    """Test new Database query methods get added to the plan check."""
+    query_methods = {name for name, _ in inspect.getmembers(Database, inspect.isfunction) if _is_query_method(name)}
+    missing = query_methods - set(QUERY_CALLS) - FULL_LISTING_METHODS
+    assert not missing, f"Add these Database methods to QUERY_CALLS: {sorted(missing)}"
+
+@pytest.mark.parametrize("method_name", sorted(QUERY_CALLS))
+def test_query_method_uses_index(planned_db, method_name):
+    """Test each query method avoids full scans of large tables."""
+    method = getattr(planned_db, method_name)
+    statements = _capture_statements(planned_db, lambda: method(*QUERY_CALLS[method_name]))
+    assert statements, f"{method_name} issued no queries"
+
+    for statement, parameters in statements:
+        scans = _full_scans(planned_db, statement, parameters)
+        assert not scans, f"{method_name} fully scans {scans}:\n{statement}"
@@ -0,0 +1,99 @@
+import pytest
+from email.mime.text import MIMEText
+from googleapiclient.errors import HttpError
+from src.gmail_client import GmailClient
+from src.gmail_fake import FakeGmailService
+from src.rate_limit import QuotaLimiter, TokenBucket
+
+class FakeClock:
+    """Monotonic clock that sleep() advances, recording every sleep."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def fake_gmail():
+    return FakeGmailService()
+
+@pytest.fixture
+def gmail(fake_gmail, clock):
+    limiter = QuotaLimiter(units_per_second=250, max_retries=3, clock=clock, sleep=clock.sleep)
+    return GmailClient(service=fake_gmail, limiter=limiter)
+
+def _add_message(fake_gmail, n: int) -> str:
+    mime = MIMEText("Student: STU001\n")
+    mime['From'] = 'student@example.com'
+    mime['Subject'] = f'SUBMIT ENG7-0115 #{n}'
+    return fake_gmail.add_message(mime.as_bytes())
+
+def test_token_bucket_waits_for_refill(clock):
+    """Test a drained bucket blocks for exactly the time needed to refill."""
+    bucket = TokenBucket(rate=10, clock=clock, sleep=clock.sleep)
+    assert bucket.acquire(10) == 0
+    assert bucket.acquire(5) == pytest.approx(0.5)
+    assert clock.now == pytest.approx(0.5)
+
+def test_quota_units_throttle_calls(gmail, fake_gmail, clock):
+    """Test message gets are metered at 5 units each against the 250 units/sec budget."""
+    message_id = _add_message(fake_gmail, 1)
+    for _ in range(60):
+        gmail.get_message(message_id, format='minimal')
+
+    stats = gmail.stats()
+    assert stats['calls'] == 60 and stats['units'] == 300
+    assert stats['throttled'] == 10  # first 50 calls fit the burst
+    assert clock.now == pytest.approx(0.2)
+
+def test_retries_429_honoring_retry_after(gmail, fake_gmail, clock):
+    """Test a throttled call is retried after the server's Retry-After delay."""
+    message_id = _add_message(fake_gmail, 1)
+    fake_gmail.inject_errors('messages.get', status=429, count=2, retry_after=3)
+
+    assert gmail.get_message(message_id, format='minimal')['id'] == message_id
+    assert fake_gmail.calls['messages.get'] == 3
+    assert clock.sleeps == [3.0, 3.0]
+    assert gmail.stats()['retried'] == 2 and gmail.stats()['throttled'] == 2
+
+def test_gives_up_after_max_retries_and_never_retries_404(gmail, fake_gmail):
+    """Test retries are bounded and non-transient errors fail immediately."""
+    message_id = _add_message(fake_gmail, 1)
+    fake_gmail.inject_errors('messages.get', status=503, count=4, reason='Service Unavailable')
+    with pytest.raises(HttpError):
+        gmail.get_message(message_id)
+    assert fake_gmail.calls['messages.get'] == 4
+    assert gmail.stats()['failed'] == 1
+
+    with pytest.raises(HttpError):
+        gmail.get_message('missing')
+    assert fake_gmail.calls['messages.get'] == 5
+
+def test_batch_retries_only_throttled_calls(gmail, fake_gmail, clock):
+    """Test calls rejected inside a batch are re-batched while the rest are kept."""
+    ids = [_add_message(fake_gmail, n) for n in range(5)]
+    fake_gmail.inject_errors('messages.get', status=429, count=2)
+
+    results = list(gmail.get_messages_batch(ids))
+    assert [message_id for message_id, _, _ in results] == ids
+    assert all(message is not None and error is None for _, message, error in results)
+    assert fake_gmail.calls['messages.get'] == 7
+    assert fake_gmail.round_trips == 2
+    assert gmail.stats()['retried'] == 1
+
+def test_token_bucket_charges_oversized_requests_as_debt(clock):
+    """Test a request larger than the bucket waits for a full bucket and delays later callers."""
+    bucket = TokenBucket(rate=10, clock=clock, sleep=clock.sleep)
+    bucket.acquire(10)
+    assert bucket.acquire(25) == pytest.approx(1.0)
+    assert bucket.acquire(1) == pytest.approx(1.6)
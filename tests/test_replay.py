@@ -0,0 +1,58 @@
+import pytest
+import os
+from datetime import datetime, timedelta
+from src.storage import Database
+from src.processor import EmailProcessor
+from src.blob_store import LocalBlobStore, archive_raw_mime
+from src.replay import export_trace, load_trace, replay_trace
+from src.synthetic import SyntheticSchool
+
+def _database(tmp_path, name: str) -> Database:
+    return Database(f"sqlite:///{os.path.join(tmp_path, name)}")
+
+@pytest.fixture
+def school():
+    """Fixture providing a small synthetic roster."""
+    return SyntheticSchool(teachers=1, students_per_class=5, seed=5)
+
+@pytest.fixture
+def production(tmp_path, school):
+    """Fixture providing a database whose email log has 30 processed emails with archived raw MIME."""
+    db = _database(tmp_path, "production.db")
+    store = LocalBlobStore(os.path.join(tmp_path, "blobs"))
+    school.populate(db)
+    processor = EmailProcessor(db)
+    for email in school.emails(30):
+        blob = archive_raw_mime(store, db, [email.as_mime()])
+        processor.process_email(**email.as_kwargs(), raw_blob_key=blob.key)
+    return db, store
+
+def test_export_writes_time_ordered_window_with_bodies(tmp_path, production):
+    """Test the trace holds the window's inbound emails in processing order, with bodies from the blob store."""
+    db, store = production
+    path = os.path.join(tmp_path, "trace.jsonl.gz")
+    now = datetime.utcnow()
+
+    assert export_trace(db, path, now - timedelta(hours=1), now + timedelta(minutes=1), store) == \
+        {'records': 30, 'with_body': 30}
+    records = list(load_trace(path))
+    assert [record['at'] for record in records] == sorted(record['at'] for record in records)
+    assert records[0]['body'].startswith("Title: Essay 0")
+    assert export_trace(db, path, now + timedelta(minutes=1), now + timedelta(hours=1)) == \
+        {'records': 0, 'with_body': 0}
+
+def test_replay_reproduces_parse_results_on_fresh_database(tmp_path, production, school):
+    """Test replaying against a fresh roster-only database yields the recorded parse_result distribution."""
+    db, store = production
+    path = os.path.join(tmp_path, "trace.jsonl.gz")
+    export_trace(db, path, datetime.utcnow() - timedelta(hours=1), datetime.utcnow(), store)
+    fresh = _database(tmp_path, "fresh.db")
+    school.populate(fresh)
+
+    report = replay_trace(path, EmailProcessor(fresh), fresh, speed=0, workers=3)
+
+    assert (report['emails'], report['errors'], report['mismatched']) == (30, 0, 0)
+    assert all(counts['delta'] == 0 for counts in report['parse_results'].values())
+    assert report['parse_results']['SUBMISSION_RECEIVED']['replayed'] > 0
+    with pytest.raises(ValueError):
+        replay_trace(path, EmailProcessor(fresh), fresh, speed=-1)
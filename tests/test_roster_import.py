@@ -0,0 +1,94 @@
+import pytest
+import os
+from datetime import datetime
+from src.storage import Database
+from src.models import Term
+from src.roster_import import RosterImporter
+
+def _write(directory, tab: str, lines):
+    with open(os.path.join(directory, f"{tab}.csv"), 'w', newline='') as f:
+        f.write('\n'.join(lines) + '\n')
+
+@pytest.fixture
+def db(tmp_path):
+    """Fixture providing a database with one term."""
+    db = Database(f"sqlite:///{os.path.join(tmp_path, 'roster.db')}")
+    db.save_term(Term(id="term-1", name="FALL", year=2024,
+                      start_date=datetime(2024, 9, 1), end_date=datetime(2024, 12, 15)))
+    return db
+
+@pytest.fixture
+def roster(tmp_path):
+    """Fixture providing a roster export with two classes and three enrollments."""
+    directory = os.path.join(tmp_path, "roster")
+    os.makedirs(directory)
+    _write(directory, 'teachers', ["id,email,first_name,last_name",
+                                   "teacher-1,jane@example.com,Jane,Smith"])
+    _write(directory, 'classes', ["id,term_id,name,subject,teacher_id",
+                                  "class-1,term-1,English 7,English,teacher-1",
+                                  "class-2,term-1,Math 7,,teacher-1"])
+    _write(directory, 'students', ["id,student_id,first_name,last_name,email",
+                                   "student-1,STU001,Ann,Lee,",
+                                   "student-2,STU002,Bo,Kim,bo@example.com"])
+    _write(directory, 'parents', ["id,email,first_name,last_name",
+                                  "parent-1,parent1@example.com,Pat,Lee",
+                                  "parent-2,parent2@example.com,,"])
+    _write(directory, 'enrollments', ["id,class_id,student_id,parent_id",
+                                      "enrollment-1,class-1,STU001,parent-1",
+                                      "enrollment-2,class-1,STU002,parent-2",
+                                      "enrollment-3,class-2,STU001,parent-1"])
+    return directory
+
+def _versions(db):
+    return {class_id: db.get_class_by_id(class_id).roster_version for class_id in ("class-1", "class-2")}
+
+def test_import_inserts_roster_and_reimport_is_unchanged(db, roster):
+    """Test a first import inserts every row and importing the same export again changes nothing."""
+    report = RosterImporter(db, chunk_size=2).import_directory(roster)
+
+    assert report['enrollments'] == {'inserted': 3, 'updated': 0, 'unchanged': 0, 'invalid': 0}
+    assert report['students']['inserted'] == 2 and report['errors'] == []
+    assert db.get_student_by_id("STU001").email is None
+    assert len(db.get_enrollments_by_class("class-1")) == 2
+    assert _versions(db) == {"class-1": 2, "class-2": 2}
+
+    again = RosterImporter(db, chunk_size=2).import_directory(roster)
+    assert all(again[tab]['unchanged'] == count
+               for tab, count in (('teachers', 1), ('classes', 2), ('students', 2), ('enrollments', 3)))
+    assert (again['enrollments_deactivated'], again['classes_bumped']) == (0, 0)
+    assert _versions(db) == {"class-1": 2, "class-2": 2}
+
+def test_reimport_updates_and_deactivates_with_one_version_bump(db, roster):
+    """Test changed rows are updated, missing enrollments deactivated and each affected class bumped once."""
+    RosterImporter(db).import_directory(roster)
+    _write(roster, 'students', ["id,student_id,first_name,last_name,email",
+                                "student-1,STU001,Annie,Lee,",
+                                "student-2,STU002,Bo,Kim,bo@example.com"])
+    _write(roster, 'enrollments', ["id,class_id,student_id,parent_id",
+                                   "enrollment-1,class-1,STU001,parent-2"])
+
+    report = RosterImporter(db).import_directory(roster)
+
+    assert report['students'] == {'inserted': 0, 'updated': 1, 'unchanged': 1, 'invalid': 0}
+    assert report['enrollments'] == {'inserted': 0, 'updated': 1, 'unchanged': 0, 'invalid': 0}
+    assert report['enrollments_deactivated'] == 2
+    assert report['classes_bumped'] == 2
+    assert _versions(db) == {"class-1": 3, "class-2": 3}
+    assert db.get_student_by_id("STU001").first_name == "Annie"
+    active = [enrollment for enrollment in db.get_enrollments_by_class("class-1") if enrollment.active]
+    assert [(e.id, e.parent_id) for e in active] == [("enrollment-1", "parent-2")]
+
+def test_invalid_and_duplicate_rows_are_reported_and_skipped(db, roster):
+    """Test rows failing validation, references or uniqueness are skipped with their line numbers."""
+    _write(roster, 'enrollments', ["id,class_id,student_id,parent_id",
+                                   "enrollment-1,class-1,STU001,parent-1",
+                                   "enrollment-2,class-9,STU002,parent-2",
+                                   "enrollment-3,class-2,,parent-1",
+                                   "enrollment-1,class-2,STU002,parent-2"])
+
+    report = RosterImporter(db, chunk_size=2).import_directory(roster)
+
+    assert report['enrollments'] == {'inserted': 1, 'updated': 0, 'unchanged': 0, 'invalid': 3}
+    assert [(error['line'], error['error'].split(' ')[0]) for error in report['errors']] == \
+        [(3, 'class_id'), (4, 'student_id:'), (5, 'duplicate')]
+    assert _versions(db) == {"class-1": 2, "class-2": 1}
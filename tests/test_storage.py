@@ -250,3 +250,140 @@ def test_performance_improvement():
     finally:
         if os.path.exists(db_path.replace("sqlite:///", "")):
             os.unlink(db_path.replace("sqlite:///", ""))
+
+def test_transaction_shares_session_and_rolls_back():
+    """Test unit-of-work writes commit together or not at all."""
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp:
+        db_path = f"sqlite:///{tmp.name}"
+    
+    try:
+        db = Database(db_path)
+        
+        submission = Submission(
+            id="sub-1",
+            assignment_id="assignment-1",
+            student_id="STU001",
+            received_at=datetime.utcnow(),
+            on_time=True
+        )
+        
+        # A failure after the submission write leaves nothing behind
+        with pytest.raises(RuntimeError):
+            with db.transaction() as uow:
+                uow.save_submission(submission)
+                # Reads in the same unit of work see the pending write
+                assert uow.get_submission_by_assignment_and_student("assignment-1", "STU001") is not None
+                raise RuntimeError("crash before audit row")
+        assert db.get_submission_by_assignment_and_student("assignment-1", "STU001") is None
+        
+        with db.transaction() as uow:
+            uow.save_submission(submission)
+        assert db.get_submission_by_assignment_and_student("assignment-1", "STU001") is not None
+        
+    finally:
+        if os.path.exists(db_path.replace("sqlite:///", "")):
+            os.unlink(db_path.replace("sqlite:///", ""))
+
+def test_insert_submission_if_absent():
+    """Test conflict-aware insert reports new vs duplicate submissions."""
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp:
+        db_path = f"sqlite:///{tmp.name}"
+    
+    try:
+        db = Database(db_path)
+        
+        def make_submission(submission_id):
+            return Submission(
+                id=submission_id,
+                assignment_id="assignment-1",
+                student_id="STU001",
+                received_at=datetime.utcnow(),
+                on_time=True
+            )
+        
+        assert db.insert_submission_if_absent(make_submission("sub-1")) is True
+        assert db.insert_submission_if_absent(make_submission("sub-2")) is False
+        
+        submissions = db.get_submissions_by_assignment("assignment-1")
+        assert [s.id for s in submissions] == ["sub-1"]
+        
+        # The unique index also rejects a plain duplicate insert
+        with pytest.raises(Exception):
+            db.save_submission(make_submission("sub-3"))
+        
+    finally:
+        if os.path.exists(db_path.replace("sqlite:///", "")):
+            os.unlink(db_path.replace("sqlite:///", ""))
+
+def test_row_mapper_matches_validated_models():
+    """Test the trusted-row fast path builds the same models as validation."""
+    from src.mapping import ASSIGNMENTS, EMAIL_MESSAGES, TERMS
+    from src.models import EmailMessage
+    
+    assignment = Assignment(
+        id="test-123",
+        code="ENG7-0115",
+        class_id="class-1",
+        title="Test Assignment",
+        deadline_at=datetime(2025, 1, 15, 23, 59),
+        created_by_teacher_id="teacher-1",
+        created_at=datetime(2025, 1, 1)
+    )
+    row = tuple(ASSIGNMENTS.to_values(assignment).values()) + ("English 7",)
+    mapped = ASSIGNMENTS.from_row(row)
+    assert mapped == assignment
+    assert mapped.model_dump() == assignment.model_dump()
+    
+    email = EmailMessage(
+        id="email-1",
+        direction="IN",
+        from_email="a@example.com",
+        to_emails=["b@example.com", "c@example.com"],
+        subject="SUBMIT ENG7-0115",
+        message_id="msg-1@example.com",
+        processed_at=datetime(2025, 1, 1)
+    )
+    values = EMAIL_MESSAGES.to_values(email)
+    assert values['to_emails'] == '["b@example.com", "c@example.com"]'
+    assert EMAIL_MESSAGES.from_row(tuple(values.values())) == email
+    
+    term = Term(id="term-1", name="FALL", year=2024, start_date=datetime(2024, 9, 1), end_date=datetime(2024, 12, 15))
+    assert TERMS.to_values(term)['name'] == "FALL"
+    assert TERMS.from_row(tuple(TERMS.to_values(term).values())) == term
+
+def test_bulk_insert_streams_chunks():
+    """Test bulk inserts consume a generator in chunks and bump cached-table versions once."""
+    from src.models import StudentDB, TeacherDB
+    from src.storage import _copy_field
+    
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp:
+        db_path = f"sqlite:///{tmp.name}"
+    
+    try:
+        db = Database(db_path)
+        consumed = []
+        
+        def students():
+            for n in range(25):
+                consumed.append(n)
+                yield {'id': f"STU{n:03d}", 'student_id': f"STU{n:03d}", 'first_name': "Student",
+                       'last_name': f"{n:03d}", 'email': None, 'status': 'ACTIVE'}
+        
+        assert db.bulk_insert(StudentDB, students(), chunk_size=10) == 25
+        assert consumed == list(range(25))
+        assert db.get_student_by_id("STU024").last_name == "024"
+        assert db.get_students_by_ids(["STU000", "STU010"]).keys() == {"STU000", "STU010"}
+        
+        versions = db.get_table_versions()
+        db.bulk_insert(TeacherDB, [{'id': "teacher-1", 'email': "t@example.com", 'first_name': "Jane",
+                                    'last_name': "Smith", 'status': 'ACTIVE'}])
+        assert db.get_table_versions()['teachers'] == versions.get('teachers', 0) + 1
+        assert db.bulk_insert(TeacherDB, []) == 0
+        
+        # COPY (FORMAT csv) rendering: NULL is unquoted, everything else quoted and escaped
+        assert [_copy_field(value) for value in (None, "", 'say "hi"', True, datetime(2025, 1, 2, 3, 4))] == \
+            ['', '""', '"say ""hi"""', '"True"', '"2025-01-02 03:04:00"']
+        
+    finally:
+        if os.path.exists(db_path.replace("sqlite:///", "")):
+            os.unlink(db_path.replace("sqlite:///", ""))
@@ -0,0 +1,38 @@
+from collections import Counter
+from src.processor import EmailProcessor
+from src.gmail_client import GmailClient
+from src.gmail_fake import FakeGmailService
+from src.rate_limit import QuotaLimiter
+from src.synthetic import SyntheticSchool
+
+def test_synthetic_stream_is_valid_against_its_roster(db):
+    """Test every generated ASSIGN/SUBMIT/GRADE email succeeds against the populated roster."""
+    school = SyntheticSchool(teachers=2, students_per_class=5, seed=7)
+    school.populate(db)
+    emails = list(school.emails(60))
+
+    assert emails == list(SyntheticSchool(teachers=2, students_per_class=5, seed=7).emails(60))
+    assert len({email.message_id for email in emails}) == 60
+    processor = EmailProcessor(db)
+    outcomes = Counter()
+    for email in emails:
+        outcomes[email.command, processor.process_email(**email.as_kwargs()).split(' ')[0]] += 1
+
+    assert set(outcomes) <= {('ASSIGN', 'Assignment'), ('SUBMIT', 'Submission'), ('GRADE', 'Grade'),
+                             ('RETURN', 'Grade'), ('UNKNOWN', 'Unknown')}
+    assert outcomes['SUBMIT', 'Submission'] > outcomes['GRADE', 'Grade'] > 0
+
+def test_fake_gmail_watch_and_random_failures():
+    """Test watch returns the mailbox historyId and random failures are retried by the client."""
+    service = FakeGmailService(latency=lambda: 0.001, error_rate=0.3, seed=1)
+    client = GmailClient(service=service, user_email='assignments@example.com',
+                         limiter=QuotaLimiter(units_per_second=1e6, max_retries=10, sleep=lambda seconds: None))
+    ids = [service.add_message(email.as_mime()) for email in SyntheticSchool(teachers=1).emails(10)]
+
+    watch = client.setup_watch('projects/test/topics/gmail')
+    assert watch['historyId'] == service.history_id
+    assert service.watch_request['topicName'] == 'projects/test/topics/gmail'
+
+    results = list(client.get_messages_batch(ids))
+    assert [error for _, _, error in results] == [None] * 10
+    assert client.stats()['retried'] > 0